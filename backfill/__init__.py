@@ -0,0 +1,24 @@
+"""Bulk re-extraction of stored document images, e.g. after a prompt or model change.
+
+    python -m backfill archive/ --output runs/2024-06.jsonl --workers 2
+    python -m backfill manifest.csv --output runs/next.jsonl --diff runs/2024-06.jsonl
+"""
+from .sources import list_images, load_image, scan_directory, read_manifest
+from .writers import JsonlWriter, ParquetWriter, open_writer, read_records, completed_keys
+from .runner import Backfill, Progress, diff_fields, extract_batch
+
+__all__ = [
+    'Backfill',
+    'JsonlWriter',
+    'ParquetWriter',
+    'Progress',
+    'completed_keys',
+    'diff_fields',
+    'extract_batch',
+    'list_images',
+    'load_image',
+    'open_writer',
+    'read_manifest',
+    'read_records',
+    'scan_directory'
+]
@@ -0,0 +1,101 @@
+"""Re-extract an archive of document images.
+
+    python -m backfill archive/ --output runs/new.jsonl --workers 2 --batch-size 8
+    python -m backfill manifest.jsonl --doc-type log_card --output runs/new.parquet
+    python -m backfill archive/ --output runs/new.jsonl --resume --diff runs/old.jsonl
+
+The source is a directory (typed by --doc-type or laid out as
+<dir>/<doc_type>/...) or a JSONL/CSV manifest with `path` and `doc_type`.
+Outputs ending in .parquet, or existing directories, get Parquet parts;
+anything else is JSONL.
+"""
+import os
+import sys
+import json
+import argparse
+import logging
+from typing import List, Optional
+
+from dotenv import load_dotenv
+
+from .sources import DOCUMENT_TYPES, list_images
+from .writers import open_writer, read_records, completed_keys
+from .runner import Backfill
+
+logger = logging.getLogger(__name__)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Re-extract stored document images in bulk")
+    parser.add_argument('source', help="Image directory, or a JSONL/CSV manifest")
+    parser.add_argument('--output', required=True, help="JSONL file, or .parquet directory")
+    parser.add_argument('--doc-type', choices=DOCUMENT_TYPES + ('license',),
+                        help="Document type for images the source doesn't type")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Model processes, each loading its own copy of the model (0 runs in-process)")
+    parser.add_argument('--batch-size', type=int, default=8, help="Images handed to a worker at a time")
+    parser.add_argument('--io-threads', type=int, default=4, help="Threads reading images ahead of the model")
+    parser.add_argument('--resume', action='store_true', help="Skip images already in --output")
+    parser.add_argument('--diff', help="Earlier output to compare extracted fields against")
+    parser.add_argument('--rows-per-part', type=int, default=500, help="Records per Parquet part file")
+    parser.add_argument('--backend', choices=('transformers', 'stub'), help="Model backend, overriding MODEL_BACKEND")
+    parser.add_argument('--progress-interval', type=float, default=10.0, help="Seconds between progress lines")
+    parser.add_argument('--summary', help="Write the run summary as JSON to this file")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    load_dotenv()
+    # Never reach out to the Hub; the model must already be cached locally
+    os.environ.setdefault('HF_HUB_OFFLINE', '1')
+    os.environ.setdefault('TRANSFORMERS_OFFLINE', '1')
+    if args.backend:
+        os.environ['MODEL_BACKEND'] = args.backend
+
+    if os.path.exists(args.output) and not args.resume:
+        logger.error(f"{args.output} already exists; pass --resume to continue it")
+        return 1
+
+    done = completed_keys(args.output) if args.resume else set()
+    tasks = list_images(args.source, args.doc_type, skip=done)
+    if done:
+        print(f"Resuming: {len(done)} images already done, {len(tasks)} to go", file=sys.stderr)
+    if not tasks:
+        print("Nothing to do", file=sys.stderr)
+        return 0
+
+    previous = None
+    if args.diff:
+        previous = {record['key']: record for record in read_records(args.diff)}
+
+    try:
+        writer = open_writer(args.output, args.rows_per_part)
+    except RuntimeError as e:
+        logger.error(str(e))
+        return 1
+
+    backfill = Backfill(
+        writer,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        io_threads=args.io_threads,
+        previous=previous,
+        progress_interval=args.progress_interval
+    )
+    summary = backfill.run(tasks)
+
+    print(f"\n{summary['images']} images in {summary['elapsed_seconds']:.1f}s "
+          f"({summary['images_per_second']:.2f} images/sec), {summary['failed']} failed")
+    if 'diff' in summary:
+        diff = summary['diff']
+        print(f"Against {args.diff}: {diff['changed_images']} images changed, {diff['new_images']} not in it")
+        for field, count in diff['changed_fields'].items():
+            print(f"  {field:<30} {count}")
+
+    if args.summary:
+        with open(args.summary, 'w') as f:
+            json.dump(summary, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
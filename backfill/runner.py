@@ -0,0 +1,241 @@
+import os
+import sys
+import time
+import logging
+import multiprocessing
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from model.validators import parse_formatted_text, is_missing
+from .sources import load_image
+
+logger = logging.getLogger(__name__)
+
+
+def init_worker(threads: int):
+    """Per-process setup: one generate call at a time with this worker's share of the cores"""
+    os.environ['INFERENCE_CONCURRENCY'] = '1'
+    os.environ['INFERENCE_THREADS'] = str(threads)
+    logging.basicConfig(level=logging.WARNING)
+
+
+def extract_batch(batch: List[Dict]) -> List[Dict]:
+    """Run a batch of images of one document type through its processor.
+
+    Runs inside a pool process; the processor (and the model behind it) is
+    loaded on the first batch and reused for the rest.
+    """
+    from model.document_processor import DocumentProcessorFactory
+
+    processor = DocumentProcessorFactory.get_processor(batch[0]['doc_type'])
+    records = []
+    for item in batch:
+        start = time.perf_counter()
+        record = {'key': item['key'], 'path': item['path'], 'doc_type': item['doc_type'], 'sha1': item.get('sha1')}
+        try:
+            result = processor.process_image(item['data'])
+            text, raw_text = result if isinstance(result, tuple) else (result, None)
+            fields = parse_formatted_text(text)
+            missing = processor.missing_fields(processor.validate_fields(text)) if fields else []
+            record.update({
+                'success': bool(fields) and not missing,
+                'fields': {field: value for field, value in fields.items() if not is_missing(value)},
+                'missing': missing,
+                'text': text,
+                'raw_text': raw_text,
+                # Processors report failures as plain text with no fields in it
+                'error': None if fields else text
+            })
+        except Exception as e:
+            logger.error(f"Failed on {item['key']}: {str(e)}")
+            record.update({'success': False, 'fields': {}, 'missing': [], 'error': str(e)})
+        record['seconds'] = round(time.perf_counter() - start, 3)
+        record['processed_at'] = time.time()
+        records.append(record)
+    return records
+
+
+def prefetch(tasks: Iterable[Dict], threads: int, depth: int) -> Iterator[Dict]:
+    """Read and header-check images on a thread pool, at most `depth` ahead of
+    the consumer, yielding them in input order"""
+    with ThreadPoolExecutor(max_workers=threads, thread_name_prefix='backfill-read') as pool:
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.submit(load_image, task))
+            if len(pending) >= depth:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def batches(items: Iterable[Dict], batch_size: int, on_rejected: Callable[[Dict], None]) -> Iterator[List[Dict]]:
+    """Group readable images into same-type batches; unreadable ones go to `on_rejected`"""
+    open_batches: Dict[str, List[Dict]] = {}
+    for item in items:
+        if 'data' not in item:
+            on_rejected(item)
+            continue
+        batch = open_batches.setdefault(item['doc_type'], [])
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield open_batches.pop(item['doc_type'])
+    for batch in open_batches.values():
+        yield batch
+
+
+def diff_fields(previous: Dict[str, str], current: Dict[str, str]) -> Dict[str, List[Optional[str]]]:
+    """Fields whose value changed, appeared or disappeared, as [old, new]"""
+    def normalize(value):
+        return ' '.join(str(value).split()).casefold() if value is not None else None
+
+    changed = {}
+    for field in sorted(set(previous) | set(current)):
+        old, new = previous.get(field), current.get(field)
+        if normalize(old) != normalize(new):
+            changed[field] = [old, new]
+    return changed
+
+
+def format_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    hours, remainder = divmod(seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    return f"{hours}h{minutes:02d}m{seconds:02d}s" if hours else f"{minutes}m{seconds:02d}s"
+
+
+class Progress:
+    """Throughput and ETA, printed at most every `interval` seconds"""
+
+    def __init__(self, total: int, interval: float = 10.0, stream=None):
+        self.total = total
+        self.interval = interval
+        self.stream = stream or sys.stderr
+        self.done = 0
+        self.failed = 0
+        self.start = time.perf_counter()
+        self._last_report = self.start
+
+    @property
+    def rate(self) -> float:
+        elapsed = time.perf_counter() - self.start
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+    def eta(self) -> Optional[float]:
+        rate = self.rate
+        return (self.total - self.done) / rate if rate > 0 else None
+
+    def update(self, records: List[Dict]):
+        self.done += len(records)
+        self.failed += sum(1 for record in records if not record.get('success'))
+        now = time.perf_counter()
+        if now - self._last_report >= self.interval:
+            self._last_report = now
+            self.report()
+
+    def report(self):
+        eta = self.eta()
+        print(
+            f"{self.done}/{self.total} images ({self.failed} failed), {self.rate:.2f} images/sec, "
+            f"ETA {format_duration(eta) if eta is not None else '?'}",
+            file=self.stream, flush=True
+        )
+
+
+class Backfill:
+    """Re-extract an archive of document images.
+
+    Images are read and header-checked on `io_threads` threads, a bounded
+    distance ahead of the model; readable ones are grouped into same-type
+    batches and run on `workers` processes, each holding its own copy of the
+    model. Records are written as each batch completes, so --resume can pick
+    up where an interrupted run stopped. With `previous` records (an earlier
+    run's output) each record also carries the fields that changed.
+    """
+
+    def __init__(self, writer, workers: int = 1, batch_size: int = 8, io_threads: int = 4,
+                 previous: Optional[Dict[str, Dict]] = None, progress_interval: float = 10.0):
+        self.writer = writer
+        self.workers = workers
+        self.batch_size = batch_size
+        self.io_threads = io_threads
+        self.previous = previous
+        self.progress_interval = progress_interval
+        self.change_counts = Counter()
+        self.changed_images = 0
+        self.new_images = 0
+
+    def _annotate(self, records: List[Dict]):
+        if self.previous is None:
+            return
+        for record in records:
+            previous = self.previous.get(record['key'])
+            if previous is None:
+                self.new_images += 1
+                continue
+            changed = diff_fields(previous.get('fields') or {}, record.get('fields') or {})
+            record['changed'] = changed
+            if changed:
+                self.changed_images += 1
+                self.change_counts.update(changed.keys())
+
+    def _emit(self, records: List[Dict], progress: Progress):
+        self._annotate(records)
+        self.writer.write(records)
+        progress.update(records)
+
+    def _rejected(self, item: Dict, progress: Progress):
+        self._emit([{
+            'key': item['key'], 'path': item['path'], 'doc_type': item['doc_type'], 'sha1': item.get('sha1'),
+            'success': False, 'fields': {}, 'missing': [], 'error': item.get('error'),
+            'seconds': 0.0, 'processed_at': time.time()
+        }], progress)
+
+    def run(self, tasks: List[Dict]) -> Dict:
+        progress = Progress(len(tasks), self.progress_interval)
+        # Keep every worker busy with one batch queued behind it, and read no
+        # further ahead than that
+        in_flight_limit = max(1, self.workers) * 2
+        depth = in_flight_limit * self.batch_size
+        items = prefetch(tasks, self.io_threads, depth)
+        work = batches(items, self.batch_size, lambda item: self._rejected(item, progress))
+
+        try:
+            if self.workers <= 0:
+                # In-process, mainly for the stub backend and debugging
+                for batch in work:
+                    self._emit(extract_batch(batch), progress)
+            else:
+                threads = max(1, (os.cpu_count() or 1) // self.workers)
+                # Spawned rather than forked so torch's thread pools start clean
+                context = multiprocessing.get_context('spawn')
+                with ProcessPoolExecutor(self.workers, mp_context=context, initializer=init_worker,
+                                         initargs=(threads,)) as pool:
+                    in_flight = set()
+                    for batch in work:
+                        in_flight.add(pool.submit(extract_batch, batch))
+                        if len(in_flight) >= in_flight_limit:
+                            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                            for future in done:
+                                self._emit(future.result(), progress)
+                    for future in in_flight:
+                        self._emit(future.result(), progress)
+        finally:
+            self.writer.close()
+        progress.report()
+        return self.summary(progress)
+
+    def summary(self, progress: Progress) -> Dict:
+        summary = {
+            'images': progress.done,
+            'failed': progress.failed,
+            'elapsed_seconds': time.perf_counter() - progress.start,
+            'images_per_second': progress.rate
+        }
+        if self.previous is not None:
+            summary['diff'] = {
+                'changed_images': self.changed_images,
+                'new_images': self.new_images,
+                'changed_fields': dict(self.change_counts.most_common())
+            }
+        return summary
@@ -0,0 +1,98 @@
+import os
+import csv
+import json
+import hashlib
+import logging
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+
+from model.document_image import DocumentImage
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+DOCUMENT_TYPES = ('id_card', 'drivers_license', 'log_card')
+# Directory names used in older archives
+DOC_TYPE_ALIASES = {'license': 'drivers_license', 'ic': 'id_card', 'nric': 'id_card'}
+
+
+def normalize_doc_type(doc_type: Optional[str]) -> Optional[str]:
+    if not doc_type:
+        return None
+    doc_type = doc_type.strip().lower()
+    doc_type = DOC_TYPE_ALIASES.get(doc_type, doc_type)
+    return doc_type if doc_type in DOCUMENT_TYPES else None
+
+
+def scan_directory(root: str, doc_type: Optional[str] = None) -> Iterator[Dict]:
+    """Images under `root`, typed by --doc-type or by their first sub-directory
+    (the `<root>/<doc_type>/...` layout the samples use)"""
+    for directory, subdirs, filenames in os.walk(root):
+        subdirs.sort()
+        for filename in sorted(filenames):
+            if os.path.splitext(filename)[1].lower() not in IMAGE_EXTENSIONS:
+                continue
+            path = os.path.join(directory, filename)
+            key = os.path.relpath(path, root)
+            image_type = normalize_doc_type(doc_type) or normalize_doc_type(key.split(os.sep)[0])
+            if image_type is None:
+                logger.warning(f"Skipping {key}: no document type (use --doc-type or <root>/<doc_type>/)")
+                continue
+            yield {'key': key, 'path': path, 'doc_type': image_type}
+
+
+def read_manifest(manifest_path: str, doc_type: Optional[str] = None) -> Iterator[Dict]:
+    """Images listed in a JSONL or CSV manifest with `path` and optional `doc_type`.
+
+    Relative paths are resolved against the manifest's directory.
+    """
+    base = os.path.dirname(os.path.abspath(manifest_path))
+    with open(manifest_path, newline='') as f:
+        if manifest_path.endswith('.csv'):
+            rows: Iterable[Dict] = csv.DictReader(f)
+        else:
+            rows = (json.loads(line) for line in f if line.strip())
+        for row in rows:
+            path = row.get('path')
+            if not path:
+                continue
+            image_type = normalize_doc_type(row.get('doc_type')) or normalize_doc_type(doc_type)
+            if image_type is None:
+                logger.warning(f"Skipping {path}: no document type in the manifest or --doc-type")
+                continue
+            yield {
+                'key': row.get('key') or path,
+                'path': path if os.path.isabs(path) else os.path.join(base, path),
+                'doc_type': image_type
+            }
+
+
+def list_images(source: str, doc_type: Optional[str] = None, skip: Optional[Set[str]] = None) -> List[Dict]:
+    """Everything to process from a directory or manifest, minus keys already done.
+
+    Only paths are collected here so the total (and ETA) is known up front;
+    image bytes are read later by the prefetch stage.
+    """
+    tasks = read_manifest(source, doc_type) if os.path.isfile(source) else scan_directory(source, doc_type)
+    skip = skip or set()
+    return [task for task in tasks if task['key'] not in skip]
+
+
+def load_image(task: Dict) -> Dict:
+    """Read and header-check one image; runs on the prefetch threads"""
+    item = dict(task)
+    try:
+        with open(task['path'], 'rb') as f:
+            data = f.read()
+    except OSError as e:
+        item['error'] = f"Could not read image: {str(e)}"
+        return item
+
+    item['sha1'] = hashlib.sha1(data).hexdigest()
+    with DocumentImage(data) as document:
+        valid, message = document.validate()
+    if valid:
+        item['data'] = data
+    else:
+        # Rejected here so broken files never take a model slot
+        item['error'] = message
+    return item
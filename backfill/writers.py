@@ -0,0 +1,138 @@
+import os
+import json
+import glob
+import logging
+from typing import Dict, Iterator, List, Set
+
+logger = logging.getLogger(__name__)
+
+# Columns written for every record; nested values are stored as JSON strings
+# so Parquet parts written by different runs share one schema
+COLUMNS = (
+    'key', 'path', 'doc_type', 'sha1', 'success', 'fields', 'missing', 'text',
+    'raw_text', 'error', 'changed', 'seconds', 'processed_at'
+)
+JSON_COLUMNS = ('fields', 'missing', 'changed')
+
+
+class JsonlWriter:
+    """Append one JSON line per record, flushed as it is written, so an
+    interrupted run loses at most the batch in flight"""
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'a')
+        if self._file.tell() > 0 and not _ends_with_newline(path):
+            # Start clear of a line cut short when the last run was killed
+            self._file.write('\n')
+
+    def write(self, records: List[Dict]):
+        for record in records:
+            self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetWriter:
+    """Write records as numbered Parquet files in a directory.
+
+    Parquet can't be appended to, so each `rows_per_part` records become a
+    new part-NNNNN.parquet; a resumed run simply adds more parts.
+    """
+
+    def __init__(self, directory: str, rows_per_part: int = 500):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise RuntimeError("Parquet output needs pyarrow (pip install pyarrow)")
+        self._pyarrow = pyarrow
+        self._parquet = pyarrow.parquet
+        self.directory = directory
+        self.rows_per_part = rows_per_part
+        os.makedirs(directory, exist_ok=True)
+        self._part = len(glob.glob(os.path.join(directory, 'part-*.parquet')))
+        self._pending: List[Dict] = []
+
+    def write(self, records: List[Dict]):
+        self._pending.extend(records)
+        if len(self._pending) >= self.rows_per_part:
+            self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        rows = [_flatten(record) for record in self._pending]
+        table = self._pyarrow.Table.from_pylist(rows)
+        path = os.path.join(self.directory, f"part-{self._part:05d}.parquet")
+        temp_path = path + '.tmp'
+        self._parquet.write_table(table, temp_path)
+        # A part only becomes visible to --resume once it is complete
+        os.replace(temp_path, path)
+        self._part += 1
+        self._pending = []
+
+    def close(self):
+        self._flush()
+
+
+def _ends_with_newline(path: str) -> bool:
+    with open(path, 'rb') as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b'\n'
+
+
+def _flatten(record: Dict) -> Dict:
+    row = {column: record.get(column) for column in COLUMNS}
+    for column in JSON_COLUMNS:
+        row[column] = json.dumps(row[column], ensure_ascii=False) if row[column] is not None else None
+    return row
+
+
+def _unflatten(row: Dict) -> Dict:
+    record = dict(row)
+    for column in JSON_COLUMNS:
+        if record.get(column) is not None:
+            record[column] = json.loads(record[column])
+    return record
+
+
+def is_parquet(path: str) -> bool:
+    return path.endswith('.parquet') or os.path.isdir(path)
+
+
+def open_writer(path: str, rows_per_part: int = 500):
+    return ParquetWriter(path, rows_per_part) if is_parquet(path) else JsonlWriter(path)
+
+
+def read_records(path: str) -> Iterator[Dict]:
+    """Records from an earlier run's JSONL file or Parquet directory"""
+    if not os.path.exists(path):
+        return
+    if is_parquet(path):
+        import pyarrow.parquet
+        for part in sorted(glob.glob(os.path.join(path, 'part-*.parquet'))):
+            for row in pyarrow.parquet.read_table(part).to_pylist():
+                yield _unflatten(row)
+        return
+
+    with open(path) as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                # The last line can be cut short if the previous run was killed
+                logger.warning(f"Ignoring unreadable line {number} of {path}")
+
+
+def completed_keys(path: str) -> Set[str]:
+    """Keys already written to an output, for --resume"""
+    return {record['key'] for record in read_records(path)}
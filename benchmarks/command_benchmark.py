@@ -0,0 +1,89 @@
+"""Throughput benchmark for the text command fast path.
+
+Routes a mix of HELP, CHECK_STATUS, greetings and free text for many chats
+through CommandRouter, and checks the model stack was never imported:
+
+    python -m benchmarks.command_benchmark --messages 200000 --chats 5000
+"""
+import sys
+import time
+import random
+import argparse
+from typing import Dict, List, Optional
+
+from benchmarks.stats import summarize_latencies
+from controller.command_router import CommandRouter
+from services.applicant_aggregator import DOCUMENT_TYPES
+from services.session_store import SessionStore
+from view.message_view import MessageView
+
+MESSAGES = (
+    {'text': {'body': 'HELP'}},
+    {'text': {'body': 'check_status'}},
+    {'text': {'body': ' Check  Status '}},
+    {'text': {'body': 'hi'}},
+    {'text': 'STATUS'},
+    {'text': {'body': 'when will my policy be ready?'}}
+)
+# Modules text commands must never load; field constants from model.validators are fine
+MODEL_STACK = ('torch', 'transformers', 'model.processors', 'model.model_singleton', 'model.document_processor')
+# Latencies are sampled rather than timed on every call, so the timer
+# doesn't dominate what it measures
+SAMPLE_EVERY = 50
+
+
+def build_router(chats: int, seed: int) -> CommandRouter:
+    rng = random.Random(seed)
+    sessions = SessionStore()
+    for index in range(chats):
+        for doc_type in DOCUMENT_TYPES:
+            if rng.random() < 0.5:
+                sessions.update_document_status(f"chat-{index}", doc_type)
+    return CommandRouter(MessageView(), sessions)
+
+
+def run(messages: int, chats: int, seed: int) -> Dict:
+    rng = random.Random(seed)
+    router = build_router(chats, seed)
+    traffic = [(f"chat-{rng.randrange(chats)}", rng.choice(MESSAGES)) for _ in range(messages)]
+
+    latencies = []
+    start = time.perf_counter()
+    for index, (chat_id, message) in enumerate(traffic):
+        if index % SAMPLE_EVERY:
+            router.route(chat_id, message)
+        else:
+            call_start = time.perf_counter()
+            router.route(chat_id, message)
+            latencies.append(time.perf_counter() - call_start)
+    elapsed = time.perf_counter() - start
+
+    return {
+        'messages': messages,
+        'elapsed_seconds': elapsed,
+        'messages_per_second': messages / elapsed if elapsed > 0 else 0.0,
+        'latency': summarize_latencies(latencies),
+        'model_stack_imported': any(name in sys.modules for name in MODEL_STACK)
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the text command fast path")
+    parser.add_argument('--messages', type=int, default=100000)
+    parser.add_argument('--chats', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    report = run(args.messages, args.chats, args.seed)
+    latency = report['latency']
+    print(f"Routed {report['messages']} messages in {report['elapsed_seconds']:.3f}s: "
+          f"{report['messages_per_second']:,.0f} msgs/sec "
+          f"(p50={latency['p50'] * 1e6:.1f}us p99={latency['p99'] * 1e6:.1f}us)")
+    if report['model_stack_imported']:
+        print("Model stack was imported on the fast path")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
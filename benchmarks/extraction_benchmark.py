@@ -0,0 +1,303 @@
+"""Offline benchmark for document extraction throughput and accuracy.
+
+Samples are laid out one directory per document type, each image paired
+with a JSON file of expected field values:
+
+    samples/
+        id_card/0001.jpg
+        id_card/0001.json      {"Name": "TAN AH KOW", "ID Number": "S1234567D"}
+        log_card/0001.png
+        log_card/0001.json
+        log_card/0001.txt      optional raw generated text, used with --replay
+
+Usage:
+    python -m benchmarks.extraction_benchmark samples/ --output run.json
+    python -m benchmarks.extraction_benchmark samples/ --replay --compare run.json
+    python -m benchmarks.extraction_benchmark samples/ --backend stub
+    python -m benchmarks.extraction_benchmark samples/ --no-early-stop --output full.json
+
+The stub backend only reads images marked with the document they show (a
+"gobingo-doc-type" PNG text chunk or JPEG comment, see model.stub_backend).
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from services import metrics
+from benchmarks.stats import summarize_latencies
+from model.memory_stats import get_process_memory
+from model.resolution_policy import RESOLUTION_REQUESTS, RESOLUTION_ESCALATIONS
+from model.stopping_criteria import EARLY_STOPS
+from model.document_processor import DocumentProcessor, parse_formatted_text
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+DOCUMENT_TYPES = ('id_card', 'drivers_license', 'log_card')
+
+
+def find_samples(sample_dir: str, doc_types=DOCUMENT_TYPES) -> List[Dict]:
+    """Collect labelled images from `<sample_dir>/<doc_type>/`"""
+    samples = []
+    for doc_type in doc_types:
+        type_dir = os.path.join(sample_dir, doc_type)
+        if not os.path.isdir(type_dir):
+            continue
+
+        for filename in sorted(os.listdir(type_dir)):
+            stem, ext = os.path.splitext(filename)
+            if ext.lower() not in IMAGE_EXTENSIONS:
+                continue
+
+            label_path = os.path.join(type_dir, stem + '.json')
+            if not os.path.exists(label_path):
+                logger.warning(f"Skipping {filename}: no label file")
+                continue
+
+            with open(label_path) as f:
+                expected = json.load(f)
+
+            raw_path = os.path.join(type_dir, stem + '.txt')
+            samples.append({
+                'doc_type': doc_type,
+                'image_path': os.path.join(type_dir, filename),
+                'expected': expected,
+                'raw_path': raw_path if os.path.exists(raw_path) else None
+            })
+    return samples
+
+
+def normalize_value(value) -> str:
+    return ' '.join(str(value or '').split()).casefold()
+
+
+def run_sample(document_processor: DocumentProcessor, sample: Dict, replay: bool) -> Dict[str, str]:
+    """Extract one sample and return the parsed fields"""
+    doc_type = sample['doc_type']
+    if replay:
+        # Feed recorded model output straight to the formatter
+        with open(sample['raw_path']) as f:
+            raw_text = f.read()
+        with metrics.span('format_text', doc_type=doc_type):
+            formatted = document_processor.processors[doc_type].format_text(raw_text)
+    else:
+        formatted = document_processor.process_image(sample['image_path'], doc_type)
+    return parse_formatted_text(formatted)
+
+
+def run_benchmark(samples: List[Dict], replay: bool = False, repeat: int = 1) -> Dict:
+    """Run all samples through DocumentProcessor and collect the report"""
+    stage_times = defaultdict(list)
+
+    def record_stage(stage, seconds, labels):
+        stage_times[stage].append(seconds)
+
+    metrics.enable()
+    metrics.add_listener(record_stage)
+
+    document_processor = DocumentProcessor()
+    per_type_times = defaultdict(list)
+    field_totals = defaultdict(lambda: defaultdict(int))
+    field_matches = defaultdict(lambda: defaultdict(int))
+    failures = []
+
+    if replay:
+        samples = [sample for sample in samples if sample['raw_path']]
+
+    start = time.perf_counter()
+    try:
+        for _ in range(repeat):
+            for sample in samples:
+                doc_type = sample['doc_type']
+                sample_start = time.perf_counter()
+                try:
+                    extracted = run_sample(document_processor, sample, replay)
+                except Exception as e:
+                    logger.error(f"Failed on {sample['image_path']}: {str(e)}")
+                    failures.append(sample['image_path'])
+                    extracted = {}
+                per_type_times[doc_type].append(time.perf_counter() - sample_start)
+
+                for field, expected in sample['expected'].items():
+                    field_totals[doc_type][field] += 1
+                    if normalize_value(extracted.get(field)) == normalize_value(expected):
+                        field_matches[doc_type][field] += 1
+    finally:
+        metrics.remove_listener(record_stage)
+    elapsed = time.perf_counter() - start
+
+    total_images = sum(len(times) for times in per_type_times.values())
+    accuracy = {}
+    for doc_type, totals in field_totals.items():
+        fields = {
+            field: field_matches[doc_type][field] / total
+            for field, total in totals.items()
+        }
+        matched = sum(field_matches[doc_type].values())
+        accuracy[doc_type] = {
+            'fields': fields,
+            'overall': matched / sum(totals.values()) if totals else 0.0
+        }
+
+    return {
+        'mode': 'replay' if replay else os.getenv('MODEL_BACKEND', 'transformers'),
+        'images': total_images,
+        'failures': failures,
+        'elapsed_seconds': elapsed,
+        'images_per_second': total_images / elapsed if elapsed > 0 else 0.0,
+        'peak_rss_bytes': get_process_memory()['peak_rss'],
+        'latency': {doc_type: summarize_latencies(times) for doc_type, times in per_type_times.items()},
+        'stages': {stage: summarize_latencies(times) for stage, times in stage_times.items()},
+        'accuracy': accuracy,
+        'resolution': resolution_summary(),
+        'generation': generation_summary()
+    }
+
+
+def resolution_summary() -> Dict:
+    """Mean prompt (mostly image) tokens and escalation rate per document type"""
+    summary = {}
+    requests = {dict(key).get('doc_type'): value for key, value in RESOLUTION_REQUESTS.values().items()}
+    escalations = {dict(key).get('doc_type'): value for key, value in RESOLUTION_ESCALATIONS.values().items()}
+    prompt_tokens = {dict(key).get('doc_type'): totals for key, totals in metrics.PROMPT_TOKENS.totals().items()}
+    for doc_type, count in requests.items():
+        total_tokens, calls = prompt_tokens.get(doc_type, (0, 0))
+        summary[doc_type] = {
+            'documents': count,
+            'escalations': escalations.get(doc_type, 0),
+            'escalation_rate': escalations.get(doc_type, 0) / count if count else 0.0,
+            'mean_prompt_tokens': total_tokens / calls if calls else 0.0
+        }
+    return summary
+
+
+def generation_summary() -> Dict:
+    """Mean generated tokens per document type and why generation stopped early"""
+    summary = {}
+    for key, (total_tokens, calls) in metrics.GENERATED_TOKENS.totals().items():
+        doc_type = dict(key).get('doc_type')
+        summary[doc_type] = {
+            'generations': calls,
+            'mean_generated_tokens': total_tokens / calls if calls else 0.0,
+            'early_stops': {}
+        }
+    for key, count in EARLY_STOPS.values().items():
+        labels = dict(key)
+        if labels.get('doc_type') in summary:
+            summary[labels['doc_type']]['early_stops'][labels.get('reason')] = count
+    return summary
+
+
+def compare_reports(current: Dict, previous: Dict) -> List[str]:
+    """Describe how the headline numbers moved against an earlier run"""
+    lines = [
+        f"images/sec: {previous.get('images_per_second', 0):.3f} -> {current['images_per_second']:.3f}"
+    ]
+    for doc_type, latency in current['latency'].items():
+        before = previous.get('latency', {}).get(doc_type)
+        if before:
+            lines.append(f"{doc_type} p95: {before['p95']:.3f}s -> {latency['p95']:.3f}s")
+    for doc_type, result in current.get('generation', {}).items():
+        before = previous.get('generation', {}).get(doc_type)
+        if before:
+            lines.append(f"{doc_type} generated tokens: {before['mean_generated_tokens']:.1f} -> "
+                         f"{result['mean_generated_tokens']:.1f}")
+    for doc_type, result in current['accuracy'].items():
+        before = previous.get('accuracy', {}).get(doc_type)
+        if before:
+            lines.append(f"{doc_type} accuracy: {before['overall']:.1%} -> {result['overall']:.1%}")
+            for field, value in result['fields'].items():
+                old = before['fields'].get(field)
+                if old is not None and old != value:
+                    lines.append(f"  {field}: {old:.1%} -> {value:.1%}")
+    return lines
+
+
+def print_report(report: Dict):
+    print(f"Mode: {report['mode']}")
+    print(f"Images: {report['images']} in {report['elapsed_seconds']:.2f}s "
+          f"({report['images_per_second']:.3f} images/sec)")
+    print(f"Peak RSS: {report['peak_rss_bytes'] / (1024 * 1024):.1f} MiB")
+    print("\nLatency per document (seconds):")
+    for doc_type, latency in report['latency'].items():
+        print(f"  {doc_type:<16} p50={latency['p50']:.3f} p95={latency['p95']:.3f} p99={latency['p99']:.3f}")
+    print("\nLatency per stage (seconds):")
+    for stage, latency in report['stages'].items():
+        print(f"  {stage:<16} n={latency['count']:<5} p50={latency['p50']:.4f} p95={latency['p95']:.4f}")
+    if report['resolution']:
+        print("\nResolution policy:")
+        for doc_type, result in report['resolution'].items():
+            print(f"  {doc_type:<16} escalation_rate={result['escalation_rate']:.1%} "
+                  f"mean_prompt_tokens={result['mean_prompt_tokens']:.0f}")
+    if report['generation']:
+        print("\nGeneration:")
+        for doc_type, result in report['generation'].items():
+            stops = ', '.join(f"{reason}={count}" for reason, count in result['early_stops'].items()) or 'none'
+            print(f"  {doc_type:<16} mean_generated_tokens={result['mean_generated_tokens']:.1f} "
+                  f"early_stops: {stops}")
+    print("\nField exact-match accuracy:")
+    for doc_type, result in report['accuracy'].items():
+        print(f"  {doc_type}: {result['overall']:.1%}")
+        for field, value in result['fields'].items():
+            print(f"    {field:<30} {value:.1%}")
+    if report['failures']:
+        print(f"\nFailed samples: {len(report['failures'])}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark document extraction offline")
+    parser.add_argument('sample_dir', help="Directory with one sub-directory per document type")
+    parser.add_argument('--doc-type', action='append', choices=DOCUMENT_TYPES,
+                        help="Only benchmark these document types")
+    parser.add_argument('--replay', action='store_true',
+                        help="Use recorded raw model output (<name>.txt) instead of running the model")
+    parser.add_argument('--backend', choices=('transformers', 'stub'),
+                        help="Model backend, overriding MODEL_BACKEND")
+    parser.add_argument('--no-early-stop', action='store_true',
+                        help="Always generate up to max_new_tokens, for a before/after comparison")
+    parser.add_argument('--repeat', type=int, default=1, help="Run every sample this many times")
+    parser.add_argument('--output', help="Write the JSON report to this file")
+    parser.add_argument('--compare', help="Earlier JSON report to compare against")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    load_dotenv()
+    # Never reach out to the Hub; the model must already be cached locally
+    os.environ.setdefault('HF_HUB_OFFLINE', '1')
+    os.environ.setdefault('TRANSFORMERS_OFFLINE', '1')
+    if args.backend:
+        os.environ['MODEL_BACKEND'] = args.backend
+    if args.no_early_stop:
+        os.environ['EARLY_STOP'] = 'false'
+
+    samples = find_samples(args.sample_dir, args.doc_type or DOCUMENT_TYPES)
+    if not samples:
+        logger.error(f"No labelled samples found in {args.sample_dir}")
+        return 1
+
+    report = run_benchmark(samples, replay=args.replay, repeat=args.repeat)
+    print_report(report)
+
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        print("\nCompared with " + args.compare + ":")
+        for line in compare_reports(report, previous):
+            print("  " + line)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
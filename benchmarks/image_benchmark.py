@@ -0,0 +1,131 @@
+"""Allocation and copy benchmark for the image intake path.
+
+Each image is read into memory once, as if just downloaded from WhatsApp,
+then taken through the old path-based flow (written to a temporary file,
+validated by path, then opened and converted to RGB by every processor
+tried) and through DocumentImage (validated from the header, decoded once
+in place and shared by every processor tried):
+
+    python -m benchmarks.image_benchmark samples/log_card/*.jpg --max-size 2048
+
+Python-level allocations (copies of the encoded bytes) are measured with
+tracemalloc; decoded pixel buffers are counted from the images produced,
+since Pillow allocates those outside the Python allocator.
+"""
+import os
+import sys
+import time
+import tempfile
+import argparse
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+from PIL import Image
+
+from benchmarks.stats import summarize_latencies
+from model.document_image import DocumentImage
+
+
+def pixel_bytes(image: Image.Image) -> int:
+    return image.size[0] * image.size[1] * len(image.getbands())
+
+
+def path_flow(data: bytes, max_size: Optional[int], candidates: int) -> Dict[str, int]:
+    """Temp file on disk, validation by path and an unconditional RGB convert
+    in each processor tried"""
+    with tempfile.NamedTemporaryFile(suffix='.img', delete=False) as f:
+        f.write(data)
+        path = f.name
+    try:
+        with Image.open(path) as img:
+            img.size
+        os.path.getsize(path)
+        result = {'disk_bytes': len(data), 'pixel_bytes': 0, 'decodes': 0}
+        for _ in range(candidates):
+            with Image.open(path) as img:
+                decoded = img.convert('RGB')
+            result['pixel_bytes'] += pixel_bytes(decoded)
+            result['decodes'] += 1
+            decoded.close()
+        return result
+    finally:
+        os.unlink(path)
+
+
+def in_memory_flow(data: bytes, max_size: Optional[int], candidates: int) -> Dict[str, int]:
+    with DocumentImage(data) as document:
+        valid, message = document.validate()
+        if not valid:
+            raise ValueError(message)
+        result = {'disk_bytes': 0, 'pixel_bytes': 0, 'decodes': 0}
+        decoded = []
+        for _ in range(candidates):
+            image = document.open(max_size)
+            # Repeat opens hand back the image already decoded
+            if not any(image is seen for seen in decoded):
+                decoded.append(image)
+                result['pixel_bytes'] += pixel_bytes(image)
+                result['decodes'] += 1
+        return result
+
+
+def measure(flow: Callable, images: List[bytes], max_size: Optional[int], candidates: int,
+            repeat: int) -> Dict:
+    latencies = []
+    peaks = []
+    totals = {'disk_bytes': 0, 'pixel_bytes': 0, 'decodes': 0}
+    requests = 0
+    for _ in range(repeat):
+        for data in images:
+            tracemalloc.start()
+            start = time.perf_counter()
+            result = flow(data, max_size, candidates)
+            latencies.append(time.perf_counter() - start)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            peaks.append(peak)
+            for key in totals:
+                totals[key] += result[key]
+            requests += 1
+
+    encoded = sum(len(data) for data in images) * repeat
+    return {
+        'requests': requests,
+        'latency': summarize_latencies(latencies),
+        'mean_python_peak_bytes': sum(peaks) / requests,
+        # Peak Python memory relative to the encoded size approximates copies made
+        'encoded_copies_per_request': sum(peaks) / encoded if encoded else 0.0,
+        'mean_disk_bytes': totals['disk_bytes'] / requests,
+        'mean_pixel_bytes': totals['pixel_bytes'] / requests,
+        'decodes_per_request': totals['decodes'] / requests
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark allocations in the image intake path")
+    parser.add_argument('images', nargs='+', help="Image files to treat as downloaded media")
+    parser.add_argument('--max-size', type=int, default=2048,
+                        help="Largest size the resolution policy will ask for")
+    parser.add_argument('--candidates', type=int, default=3,
+                        help="Processors tried per image, e.g. all three document types")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    images = []
+    for path in args.images:
+        with open(path, 'rb') as f:
+            images.append(f.read())
+
+    for name, flow in (('path', path_flow), ('in_memory', in_memory_flow)):
+        report = measure(flow, images, args.max_size, args.candidates, args.repeat)
+        print(f"{name:<10} p50={report['latency']['p50'] * 1000:.1f}ms "
+              f"python_peak={report['mean_python_peak_bytes'] / 1024:.0f}KiB "
+              f"encoded_copies={report['encoded_copies_per_request']:.2f} "
+              f"disk={report['mean_disk_bytes'] / 1024:.0f}KiB "
+              f"decodes={report['decodes_per_request']:.1f} "
+              f"pixels={report['mean_pixel_bytes'] / (1024 * 1024):.1f}MiB")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,154 @@
+"""Memory and serialisation benchmark for extracted document records.
+
+Holds the same extractions as formatted "Field: value" strings, parsed dicts
+and typed records (model/records.py), and times each serialisation the
+pipeline could use for them:
+
+    python -m benchmarks.record_benchmark --records 20000
+
+First checks that records survive the binary round trip, including
+non-ASCII values and values at the length limit, and exits non-zero if not.
+"""
+import sys
+import gc
+import json
+import time
+import pickle
+import argparse
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+from benchmarks.validation_benchmark import sample_records
+from model.records import RECORD_TYPES, MAX_VALUE_LENGTH, from_bytes
+from model.validators import parse_formatted_text
+
+DOC_TYPES = ('id_card', 'drivers_license', 'log_card')
+
+
+def render(fields: Dict[str, str]) -> str:
+    return "\n".join(f"{field}: {value}" for field, value in fields.items())
+
+
+def make_fields(doc_type: str, count: int) -> List[Dict[str, str]]:
+    """Distinct values per record, as for real applicants"""
+    template = sample_records(doc_type)
+    return [
+        {field: f"{value} {index}" for field, value in template.items() if value != '-'}
+        for index in range(count)
+    ]
+
+
+# Values that are easy to get wrong: multi-byte UTF-8, astral characters,
+# separators the text format uses, values that start like a placeholder and
+# one at the length limit
+EDGE_VALUES = ('TAN 陈亚高', 'MÜLLER/Ō\'BRIEN', 'ROAD 🚗 TAX', 'A: B\nC', '-5', 'x' * MAX_VALUE_LENGTH)
+
+
+def check_round_trip() -> List[str]:
+    """Records that don't decode back to themselves, or limits not enforced"""
+    failures = []
+    for doc_type in DOC_TYPES:
+        record_class = RECORD_TYPES[doc_type]
+        labels = record_class.labels
+        records = [
+            record_class(),
+            record_class.from_fields({label: EDGE_VALUES[index % len(EDGE_VALUES)]
+                                      for index, label in enumerate(labels)}),
+            # Only the last field, so the bitmask and lengths don't line up by accident
+            record_class.from_fields({labels[-1]: EDGE_VALUES[0]})
+        ]
+        for record in records:
+            decoded = from_bytes(record.to_bytes())
+            if decoded != record or type(decoded) is not record_class:
+                failures.append(f"{doc_type}: {dict(record)!r:.80} decoded as {dict(decoded)!r:.80}")
+
+        try:
+            record_class.from_fields({labels[0]: 'x' * (MAX_VALUE_LENGTH + 1)}).to_bytes()
+            failures.append(f"{doc_type}: value over {MAX_VALUE_LENGTH} characters was encoded")
+        except ValueError:
+            pass
+    return failures
+
+
+def measure_memory(build: Callable[[], List]) -> float:
+    """Bytes allocated per object held by the list `build` returns"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    held = build()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    return allocated / len(held)
+
+
+def measure_throughput(items: List, encode: Callable, decode: Callable) -> Dict:
+    start = time.perf_counter()
+    encoded = [encode(item) for item in items]
+    encode_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    for payload in encoded:
+        decode(payload)
+    decode_seconds = time.perf_counter() - start
+    return {
+        'encode_per_second': len(items) / encode_seconds if encode_seconds > 0 else 0.0,
+        'decode_per_second': len(items) / decode_seconds if decode_seconds > 0 else 0.0,
+        'bytes_per_record': sum(len(payload) for payload in encoded) / len(encoded)
+    }
+
+
+def run(records: int) -> Dict:
+    report = {}
+    for doc_type in DOC_TYPES:
+        record_class = RECORD_TYPES[doc_type]
+        fields = make_fields(doc_type, records)
+        texts = [render(item) for item in fields]
+
+        memory = {
+            'text': measure_memory(lambda: [render(item) for item in fields]),
+            'dict': measure_memory(lambda: [parse_formatted_text(text) for text in texts]),
+            'record': measure_memory(lambda: [record_class.from_text(text) for text in texts])
+        }
+        typed = [record_class.from_fields(item) for item in fields]
+        serialisation = {
+            'text': measure_throughput(fields, lambda item: render(item).encode('utf-8'),
+                                       lambda payload: parse_formatted_text(payload.decode('utf-8'))),
+            'json': measure_throughput(fields, lambda item: json.dumps(item).encode('utf-8'), json.loads),
+            'pickle': measure_throughput(typed, pickle.dumps, pickle.loads),
+            'binary': measure_throughput(typed, lambda record: record.to_bytes(), from_bytes)
+        }
+        if any(from_bytes(record.to_bytes()) != record for record in typed[:100]):
+            raise AssertionError(f"{doc_type} records did not round-trip")
+        report[doc_type] = {'fields': len(record_class.labels), 'memory': memory, 'serialisation': serialisation}
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark document record memory and serialisation")
+    parser.add_argument('--records', type=int, default=10000)
+    parser.add_argument('--output', help="Write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    failures = check_round_trip()
+    for failure in failures:
+        print(f"Round trip check failed: {failure}")
+    if failures:
+        return 1
+
+    report = run(args.records)
+    for doc_type, result in report.items():
+        memory = result['memory']
+        print(f"{doc_type} ({result['fields']} fields): bytes in memory per record "
+              f"text={memory['text']:.0f} dict={memory['dict']:.0f} record={memory['record']:.0f}")
+        for name, stats in result['serialisation'].items():
+            print(f"  {name:<7} {stats['bytes_per_record']:>6.0f} bytes  "
+                  f"encode {stats['encode_per_second']:>10,.0f}/s  decode {stats['decode_per_second']:>10,.0f}/s")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
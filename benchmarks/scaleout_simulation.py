@@ -0,0 +1,187 @@
+"""Multi-node simulation of the shared work queue (services/work_queue.py).
+
+Starts N worker processes against one SQLite stand-in store, queues a few
+uploads per chat, and has each worker "process" a job by sleeping for the
+model time. Reports throughput per worker count and checks that every
+chat's jobs ran one at a time, in the order they were queued:
+
+    python -m benchmarks.scaleout_simulation --workers 1,2,4,8 --chats 64 --work-ms 25
+
+First checks that a partition held by a worker that died mid-job is taken
+over once its lease expires, with the unfinished job redone before the
+chat's next one, and exits non-zero if not.
+"""
+import os
+import sys
+import time
+import json
+import argparse
+import tempfile
+import multiprocessing
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from services.work_queue import SqliteBackend, WorkQueue, QueueWorker, partition_for
+
+LEASE_SECONDS = 1.5
+
+
+def run_worker(path: str, partitions: int, work_seconds: float, ready, stop, results):
+    backend = SqliteBackend(path, partitions)
+
+    def handle(chat_id: str, job: Dict):
+        started = time.time()
+        time.sleep(work_seconds)
+        results.put((chat_id, job['seq'], worker.worker_id, started, time.time()))
+
+    worker = QueueWorker(WorkQueue(backend), handle, lease_seconds=LEASE_SECONDS, poll_seconds=0.01)
+    worker.start()
+    ready.put(worker.worker_id)
+    stop.wait()
+    worker.stop()
+
+
+def check_failover(path: str, lease_seconds: float = 0.3) -> List[str]:
+    """What went wrong when a worker dies holding a partition with a job in progress"""
+    failures = []
+    backend = SqliteBackend(path, partitions=4)
+    queue = WorkQueue(backend)
+    for seq in range(2):
+        queue.enqueue('chat-failover', {'seq': seq})
+    partition = partition_for('chat-failover', backend.partitions)
+
+    # The first worker takes every partition and starts the first job, then stops renewing
+    backend.heartbeat('dead', lease_seconds)
+    held = backend.acquire('dead', backend.partitions, lease_seconds)
+    started = backend.claim('dead', held)
+    if started is None or json.loads(started[2])['seq'] != 0:
+        return [f"first worker started {started} instead of seq 0"]
+
+    backend.heartbeat('alive', lease_seconds)
+    if backend.acquire('alive', backend.partitions, lease_seconds):
+        failures.append("second worker took partitions still under lease")
+    if backend.claim('alive', [partition]) is not None:
+        failures.append("second worker claimed a job on a partition it doesn't lease")
+
+    time.sleep(lease_seconds * 1.5)
+    held = backend.acquire('alive', backend.partitions, lease_seconds)
+    if partition not in held:
+        return failures + [f"partition {partition} not taken over after the lease expired (holding {held})"]
+    redone = backend.claim('alive', held)
+    if redone is None or redone[0] != started[0]:
+        failures.append(f"unfinished job was not redone first (claimed {redone})")
+    elif backend.claim('alive', held) is not None:
+        failures.append("chat's next job was claimed while the redone one was in progress")
+
+    # A late ack from the dead worker must not drop the job it lost
+    backend.ack('dead', started[0])
+    if backend.pending(partition) != 2:
+        failures.append("dead worker's late ack removed the redone job")
+    if redone is not None:
+        backend.ack('alive', redone[0])
+    following = backend.claim('alive', held)
+    if following is None or json.loads(following[2])['seq'] != 1:
+        failures.append(f"chat's next job not claimable after the redone one was acked (claimed {following})")
+    return failures
+
+
+def check_order(results: List) -> List[str]:
+    """Chats whose jobs overlapped or ran out of order"""
+    by_chat = defaultdict(list)
+    for chat_id, seq, _, started, finished in results:
+        by_chat[chat_id].append((started, finished, seq))
+    broken = []
+    for chat_id, runs in by_chat.items():
+        runs.sort()
+        in_order = all(runs[i][2] < runs[i + 1][2] for i in range(len(runs) - 1))
+        serial = all(runs[i][1] <= runs[i + 1][0] for i in range(len(runs) - 1))
+        if not (in_order and serial):
+            broken.append(chat_id)
+    return broken
+
+
+def simulate(workers: int, chats: int, per_chat: int, work_seconds: float, partitions: int) -> Dict:
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'shared.db')
+        queue = WorkQueue(SqliteBackend(path, partitions))
+        ready, results, stop = context.Queue(), context.Queue(), context.Event()
+        processes = [
+            context.Process(target=run_worker, args=(path, partitions, work_seconds, ready, stop, results))
+            for _ in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        for _ in processes:
+            ready.get()
+        # Let the first workers hand surplus partitions to the later ones
+        time.sleep(LEASE_SECONDS)
+
+        start = time.perf_counter()
+        for seq in range(per_chat):
+            for index in range(chats):
+                queue.enqueue(f"chat-{index}", {'seq': seq})
+        total = chats * per_chat
+        collected = [results.get() for _ in range(total)]
+        elapsed = time.perf_counter() - start
+
+        stop.set()
+        for process in processes:
+            process.join(30)
+
+    jobs_per_worker = defaultdict(int)
+    for _, _, worker_id, _, _ in collected:
+        jobs_per_worker[worker_id] += 1
+    return {
+        'workers': workers,
+        'jobs': total,
+        'elapsed_seconds': elapsed,
+        'jobs_per_second': total / elapsed if elapsed > 0 else 0.0,
+        'jobs_per_worker': sorted(jobs_per_worker.values(), reverse=True),
+        'out_of_order_chats': check_order(collected),
+        'chats_per_partition': max(
+            sum(1 for index in range(chats) if partition_for(f"chat-{index}", partitions) == partition)
+            for partition in range(partitions)
+        )
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Simulate model workers sharing the work queue")
+    parser.add_argument('--workers', default='1,2,4', help="Comma-separated worker counts to run")
+    parser.add_argument('--chats', type=int, default=48)
+    parser.add_argument('--per-chat', type=int, default=4, help="Uploads queued per chat")
+    parser.add_argument('--work-ms', type=float, default=25, help="Simulated model time per upload")
+    parser.add_argument('--partitions', type=int, default=32)
+    parser.add_argument('--output', help="Write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        failures = check_failover(os.path.join(directory, 'failover.db'))
+    for failure in failures:
+        print(f"Failover check failed: {failure}")
+    if failures:
+        return 1
+
+    reports = []
+    for workers in (int(count) for count in args.workers.split(',')):
+        report = simulate(workers, args.chats, args.per_chat, args.work_ms / 1000, args.partitions)
+        baseline = reports[0]['jobs_per_second'] if reports else report['jobs_per_second']
+        report['speedup'] = report['jobs_per_second'] / baseline if baseline else 0.0
+        reports.append(report)
+        print(f"{workers} workers: {report['jobs']} jobs in {report['elapsed_seconds']:.2f}s "
+              f"({report['jobs_per_second']:.1f}/s, {report['speedup']:.2f}x), "
+              f"jobs per worker {report['jobs_per_worker']}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(reports, f, indent=2)
+
+    broken = [report for report in reports if report['out_of_order_chats']]
+    for report in broken:
+        print(f"{report['workers']} workers: chats handled out of order: {report['out_of_order_chats'][:10]}")
+    return 1 if broken else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""Summarise shadow-mode results recorded by the bot (see model/shadow.py).
+
+    SHADOW_CONFIG=shadow/greedy.json python bot.py
+    python -m benchmarks.shadow_report data/shadow_results.jsonl --output shadow.json
+"""
+import sys
+import json
+import argparse
+from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from benchmarks.stats import summarize_latencies
+
+
+def load_results(path: str) -> Iterator[Dict]:
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def summarize(results: Iterable[Dict], since: Optional[float] = None) -> Dict:
+    """Field agreement and latency per shadow config and document type"""
+    groups = defaultdict(list)
+    for result in results:
+        if since is None or result['ran_at'] >= since:
+            groups[(result['config'], result['doc_type'])].append(result)
+
+    summary = {}
+    for (config, doc_type), runs in sorted(groups.items()):
+        agreed = defaultdict(int)
+        compared = defaultdict(int)
+        for run in runs:
+            for field, comparison in run['fields'].items():
+                agreed[field] += comparison['agree']
+                compared[field] += 1
+        primary = [run['primary_seconds'] for run in runs]
+        shadow = [run['shadow_seconds'] for run in runs]
+        summary.setdefault(config, {})[doc_type] = {
+            'runs': len(runs),
+            'shadow_success_rate': sum(run['shadow_success'] for run in runs) / len(runs),
+            'field_agreement': {field: agreed[field] / total for field, total in compared.items()},
+            'overall_agreement': sum(agreed.values()) / sum(compared.values()) if compared else 0.0,
+            'primary_latency': summarize_latencies(primary),
+            'shadow_latency': summarize_latencies(shadow),
+            'mean_latency_delta': (sum(shadow) - sum(primary)) / len(runs)
+        }
+    return summary
+
+
+def print_report(summary: Dict):
+    for config, doc_types in summary.items():
+        print(f"Shadow config '{config}':")
+        for doc_type, result in doc_types.items():
+            print(f"  {doc_type}: {result['runs']} runs, agreement {result['overall_agreement']:.1%}, "
+                  f"shadow success {result['shadow_success_rate']:.1%}")
+            print(f"    latency p50 {result['primary_latency']['p50']:.2f}s -> {result['shadow_latency']['p50']:.2f}s, "
+                  f"p95 {result['primary_latency']['p95']:.2f}s -> {result['shadow_latency']['p95']:.2f}s "
+                  f"(mean delta {result['mean_latency_delta']:+.2f}s)")
+            for field, rate in sorted(result['field_agreement'].items(), key=lambda item: item[1]):
+                print(f"    {field:<30} {rate:.1%}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Summarise shadow-mode extraction results")
+    parser.add_argument('results', help="Shadow results JSONL (SHADOW_STORE_PATH)")
+    parser.add_argument('--since', type=float, help="Only runs at or after this Unix timestamp")
+    parser.add_argument('--output', help="Write the JSON summary to this file")
+    args = parser.parse_args(argv)
+
+    summary = summarize(load_results(args.results), args.since)
+    if not summary:
+        print(f"No shadow results in {args.results}")
+        return 1
+    print_report(summary)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(summary, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
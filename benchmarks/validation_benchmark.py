@@ -0,0 +1,121 @@
+"""Throughput benchmark for the field validation engine.
+
+Validates the stub backend's canned extractions, with a share of fields
+corrupted so the failure paths are exercised too:
+
+    python -m benchmarks.validation_benchmark --documents 50000 --corrupt-rate 0.2
+
+First checks the NRIC/FIN and plate check letters against published
+numbers and exits non-zero if any rule disagrees.
+"""
+import sys
+import time
+import random
+import argparse
+from typing import Dict, List, Optional
+
+from model.stub_backend import CANNED_OUTPUTS
+from model.validators import (
+    get_validation_engine, parse_formatted_text, is_missing, ValidationEngine, check_nric, check_plate
+)
+
+REQUIRED_FIELDS = {
+    'id_card': ["Name", "ID Number"],
+    'drivers_license': ["Name", "License Number"],
+    'log_card': ["Vehicle No", "Make/Model", "Chassis No"]
+}
+
+
+# Published example numbers, with their correct check letters
+VALID_NRICS = ('S1234567D', 'T1234567J', 'F1234567N', 'G1234567X', 's 1234567 d')
+VALID_PLATES = ('SBS3229P', 'sbs 3229 p')
+ALPHABET = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+
+def check_rules() -> List[str]:
+    """Check-letter rules that disagree with known numbers"""
+    failures = [f"{value}: {check_nric(value)}" for value in VALID_NRICS if check_nric(value)]
+    failures += [f"{value}: {check_plate(value)}" for value in VALID_PLATES if check_plate(value)]
+    # Any other check letter must be rejected, for every prefix length
+    for base, check in (('S1234567', check_nric), ('T0000001', check_nric), ('F7654321', check_nric),
+                        ('SBS3229', check_plate), ('E23', check_plate), ('SKQ7', check_plate)):
+        accepted = [letter for letter in ALPHABET if check(base + letter) is None]
+        if len(accepted) != 1:
+            failures.append(f"{base}?: {len(accepted)} check letters accepted ({''.join(accepted)})")
+    for value in ('S1234567', 'X1234567D', 'SBS32291P', '1234ABC'):
+        if check_nric(value) is None or check_plate(value) is None:
+            failures.append(f"{value}: malformed number accepted")
+    return failures
+
+
+def sample_records(doc_type: str) -> Dict[str, str]:
+    # Canned log card labels use the raw "Vehicle No." spellings
+    return {
+        key.rstrip('.').replace(' / ', '/'): value
+        for key, value in parse_formatted_text(CANNED_OUTPUTS[doc_type]).items()
+    }
+
+
+def corrupt(record: Dict[str, str], rate: float, rng: random.Random) -> Dict[str, str]:
+    corrupted = dict(record)
+    for field, value in record.items():
+        if rng.random() < rate:
+            # Swap two characters, the most common kind of misread
+            if len(value) > 2:
+                i = rng.randrange(len(value) - 1)
+                corrupted[field] = value[:i] + value[i + 1] + value[i] + value[i + 2:]
+            else:
+                corrupted[field] = '-'
+    return corrupted
+
+
+def run(documents: int, corrupt_rate: float, seed: int = 0) -> Dict:
+    rng = random.Random(seed)
+    workload: List = []
+    for doc_type in REQUIRED_FIELDS:
+        record = sample_records(doc_type)
+        engine = get_validation_engine(doc_type, REQUIRED_FIELDS[doc_type])
+        # Fields blank on the canned card aren't expected to be filled
+        expected = [field for field, value in record.items() if not is_missing(value)]
+        for _ in range(max(1, documents // len(REQUIRED_FIELDS))):
+            workload.append((engine, corrupt(record, corrupt_rate, rng), expected))
+
+    decisions = {ValidationEngine.ACCEPT: 0, ValidationEngine.RETRY: 0, ValidationEngine.FALLBACK: 0}
+    start = time.perf_counter()
+    for engine, record, fields in workload:
+        decisions[engine.validate(record, fields).decision] += 1
+    elapsed = time.perf_counter() - start
+
+    return {
+        'documents': len(workload),
+        'elapsed_seconds': elapsed,
+        'documents_per_second': len(workload) / elapsed if elapsed > 0 else 0.0,
+        'microseconds_per_document': elapsed / len(workload) * 1e6,
+        'decisions': decisions
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the field validation engine")
+    parser.add_argument('--documents', type=int, default=30000)
+    parser.add_argument('--corrupt-rate', type=float, default=0.1,
+                        help="Probability of corrupting each field")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    failures = check_rules()
+    for failure in failures:
+        print(f"Rule check failed: {failure}")
+    if failures:
+        return 1
+
+    report = run(args.documents, args.corrupt_rate, args.seed)
+    print(f"Validated {report['documents']} documents in {report['elapsed_seconds']:.3f}s: "
+          f"{report['documents_per_second']:,.0f} docs/sec "
+          f"({report['microseconds_per_document']:.1f} us/doc)")
+    print(f"Decisions: {report['decisions']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
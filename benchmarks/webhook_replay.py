@@ -0,0 +1,257 @@
+"""Replay recorded webhook payloads at the bot and measure end-to-end latency.
+
+Payloads are read from a JSONL file (one webhook body per line) and sent to
+/messages, the route that extracts through DocumentProcessor and the model
+backend; the legacy /webhook route loads its own Hugging Face pipeline and
+can't run offline. Run the bot against the local stand-ins (see
+mock_servers) and pass the Whapi stand-in URL to also measure the time until
+each chat gets its reply:
+
+    python -m mock_servers --whapi-port 5001 --monday-port 5002 &
+    API_URL=http://127.0.0.1:5001 MONDAY_API_URL=http://127.0.0.1:5002/v2 \
+        MODEL_BACKEND=stub python bot.py &
+    python -m benchmarks.webhook_replay payloads.jsonl \
+        --whapi http://127.0.0.1:5001 --concurrency 8 --repeat 10 --output replay.json
+
+where each line is {"chat_id": "...", "message": {"media": {"url": ...}}}.
+Media URLs on the Whapi stand-in named after a document type, e.g.
+http://127.0.0.1:5001/media/log_card-1.png, are read by the stub backend as
+that document.
+
+With --per-applicant each chat's uploads are sent in order and the report
+adds applicant completion latency. Run it with INFERENCE_PRIORITY=true and
+=false on the bot to see what priority scheduling does under load:
+
+    python -m benchmarks.webhook_replay applicants.jsonl --per-applicant \
+        --whapi http://127.0.0.1:5001 --rate 2 --repeat 40 --concurrency 40
+"""
+import sys
+import json
+import time
+import copy
+import argparse
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import requests
+
+from benchmarks.stats import summarize_latencies
+
+logger = logging.getLogger(__name__)
+
+# Payload keys that identify the sender, in the two webhook formats the bot accepts
+CHAT_ID_KEYS = ('chat_id', 'from')
+
+
+def load_payloads(path: str) -> List[Dict]:
+    payloads = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                payloads.append(json.loads(line))
+    return payloads
+
+
+def get_chat_id(payload: Dict) -> Optional[str]:
+    for key in CHAT_ID_KEYS:
+        if payload.get(key):
+            return str(payload[key])
+    return None
+
+
+def with_unique_chat(payload: Dict, suffix: str) -> Dict:
+    """Copy a payload so each replay round looks like a different sender"""
+    payload = copy.deepcopy(payload)
+    for key in CHAT_ID_KEYS:
+        if payload.get(key):
+            payload[key] = f"{payload[key]}-{suffix}"
+    return payload
+
+
+class ReplayDriver:
+    def __init__(self, target: str, concurrency: int = 4, rate: Optional[float] = None, timeout: float = 120):
+        self.target = target
+        self.concurrency = concurrency
+        self.rate = rate
+        self.timeout = timeout
+        self._local = threading.local()
+        self.results = []
+        self._lock = threading.Lock()
+
+    def _session(self) -> requests.Session:
+        if not hasattr(self._local, 'session'):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def _send(self, payload: Dict):
+        sent_at = time.time()
+        start = time.perf_counter()
+        try:
+            response = self._session().post(self.target, json=payload, timeout=self.timeout)
+            status = response.status_code
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"Request failed: {str(e)}")
+            status = 0
+        result = {
+            'chat_id': get_chat_id(payload),
+            'sent_at': sent_at,
+            'latency': time.perf_counter() - start,
+            'status': status
+        }
+        with self._lock:
+            self.results.append(result)
+
+    def _send_sequence(self, payloads: List[Dict]):
+        for payload in payloads:
+            self._send(payload)
+
+    def run_applicants(self, applicants: List[List[Dict]]) -> float:
+        """Send each applicant's uploads one after another, as a real chat would,
+        with applicants arriving at `rate` per second; return wall time"""
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            for index, payloads in enumerate(applicants):
+                if self.rate:
+                    delay = start + index / self.rate - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                pool.submit(self._send_sequence, payloads)
+        return time.perf_counter() - start
+
+    def run(self, payloads: List[Dict]) -> float:
+        """Fire all payloads, optionally paced to `rate` per second; return wall time"""
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            for index, payload in enumerate(payloads):
+                if self.rate:
+                    # Open-loop pacing so slow responses don't lower the offered load
+                    due = start + index / self.rate
+                    delay = due - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                pool.submit(self._send, payload)
+        return time.perf_counter() - start
+
+
+def group_by_chat(payloads: List[Dict]) -> List[List[Dict]]:
+    """Each chat's payloads in recorded order, chats in order of first appearance"""
+    groups = {}
+    for payload in payloads:
+        groups.setdefault(get_chat_id(payload), []).append(payload)
+    return list(groups.values())
+
+
+def reply_latencies(results: List[Dict], whapi_url: str) -> List[float]:
+    """Time from firing each webhook to the first message the bot sent that chat"""
+    stats = requests.get(f"{whapi_url}/_stats", timeout=10).json()
+    first_reply = {}
+    for event in stats.get('events', []):
+        if event.get('endpoint') == 'send' and event.get('status') == 200:
+            chat_id = event.get('chat_id')
+            if chat_id not in first_reply or event['time'] < first_reply[chat_id]:
+                first_reply[chat_id] = event['time']
+
+    latencies = []
+    for result in results:
+        replied_at = first_reply.get(result['chat_id'])
+        if replied_at is not None and replied_at >= result['sent_at']:
+            latencies.append(replied_at - result['sent_at'])
+    return latencies
+
+
+def completion_latencies(results: List[Dict], whapi_url: str) -> List[float]:
+    """Per applicant, time from their first upload to the last message the bot sent them"""
+    stats = requests.get(f"{whapi_url}/_stats", timeout=10).json()
+    last_reply = {}
+    for event in stats.get('events', []):
+        if event.get('endpoint') == 'send' and event.get('status') == 200:
+            chat_id = event.get('chat_id')
+            last_reply[chat_id] = max(event['time'], last_reply.get(chat_id, 0.0))
+
+    started = {}
+    failed = set()
+    for result in results:
+        chat_id = result['chat_id']
+        started[chat_id] = min(result['sent_at'], started.get(chat_id, result['sent_at']))
+        if not 200 <= result['status'] < 300:
+            failed.add(chat_id)
+    return [
+        last_reply[chat_id] - start
+        for chat_id, start in started.items()
+        if chat_id not in failed and last_reply.get(chat_id, 0.0) >= start
+    ]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Replay recorded webhook payloads at the bot")
+    parser.add_argument('payloads', help="JSONL file of recorded webhook bodies")
+    parser.add_argument('--target', default='http://127.0.0.1:80/messages', help="Bot message URL")
+    parser.add_argument('--whapi', help="Whapi stand-in URL, to measure time until the reply is sent")
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--rate', type=float, help="Offered load in requests/sec (default: as fast as possible)")
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--unique-chats', action='store_true',
+                        help="Give every replayed payload its own chat id")
+    parser.add_argument('--per-applicant', action='store_true',
+                        help="Send each chat's uploads in order, waiting for each reply, and report "
+                             "applicant completion latency (--rate is then applicants/sec)")
+    parser.add_argument('--output', help="Write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+
+    recorded = load_payloads(args.payloads)
+    payloads = []
+    for round_index in range(args.repeat):
+        for index, payload in enumerate(recorded):
+            if args.per_applicant:
+                # Keep each chat's documents together, as one applicant per round
+                payload = with_unique_chat(payload, str(round_index))
+            elif args.unique_chats:
+                payload = with_unique_chat(payload, f"{round_index}-{index}")
+            payloads.append(payload)
+
+    if args.whapi:
+        requests.post(f"{args.whapi}/_reset", timeout=10)
+
+    driver = ReplayDriver(args.target, args.concurrency, args.rate)
+    if args.per_applicant:
+        elapsed = driver.run_applicants(group_by_chat(payloads))
+    else:
+        elapsed = driver.run(payloads)
+
+    ok = [r for r in driver.results if 200 <= r['status'] < 300]
+    report = {
+        'requests': len(driver.results),
+        'succeeded': len(ok),
+        'errors': len(driver.results) - len(ok),
+        'elapsed_seconds': elapsed,
+        'throughput': len(driver.results) / elapsed if elapsed > 0 else 0.0,
+        'latency': summarize_latencies([r['latency'] for r in driver.results])
+    }
+    if args.whapi:
+        report['reply_latency'] = summarize_latencies(reply_latencies(driver.results, args.whapi))
+        if args.per_applicant:
+            report['applicant_completion_latency'] = summarize_latencies(
+                completion_latencies(driver.results, args.whapi)
+            )
+
+    print(f"Requests: {report['requests']} ({report['errors']} errors) in {elapsed:.2f}s "
+          f"= {report['throughput']:.2f} req/s")
+    for name in ('latency', 'reply_latency', 'applicant_completion_latency'):
+        if name in report:
+            latency = report[name]
+            print(f"{name}: p50={latency['p50']:.3f}s p95={latency['p95']:.3f}s "
+                  f"p99={latency['p99']:.3f}s max={latency['max']:.3f}s")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
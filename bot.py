@@ -1,12 +1,17 @@
 from flask import Flask
 from dotenv import load_dotenv
-from controller.webhook_controller import webhook_blueprint
-from controller.message_controller import messages_blueprint
-from controller.webhook_controller import webhook_blueprint
 from controller.message_controller import messages_blueprint, MessageController
-from model.document_processor import DocumentProcessor
+from controller.metrics_controller import metrics_blueprint
+from controller.status_controller import status_blueprint
+from controller.slo_controller import slo_blueprint
+from controller.command_router import CommandRouter
 from view.message_view import MessageView
 from services.whatsapp_client import WhatsAppClient
+from services.applicant_aggregator import applicant_aggregator
+from services.retry_scheduler import retry_scheduler
+from services.session_store import SessionStore, SharedSessionStore
+from services.work_queue import WorkQueue, QueueWorker, open_backend, partition_for
+from services.tracing import RequestIdFilter, enable_stage_tracing
 import os
 import requests
 import logging
@@ -45,24 +50,70 @@ def setup_webhook(api_url, bot_url, token):
 def create_app():
     # Setup logging
     logging.basicConfig(level=logging.INFO)
+    # Tag every log line with the request it belongs to
+    for handler in logging.getLogger().handlers:
+        handler.addFilter(RequestIdFilter())
+        handler.setFormatter(logging.Formatter('%(levelname)s:%(name)s:[%(request_id)s] %(message)s'))
     
     # Load environment variables
     load_dotenv()
+
+    # Per-stage breakdowns in /slo; times every span even with metrics off
+    if os.getenv('REQUEST_STAGE_TRACING', 'false').lower() == 'true':
+        enable_stage_tracing()
     
     # Create Flask app
     app = Flask(__name__)
     
-    # Register blueprints
-    app.register_blueprint(webhook_blueprint)  # Existing webhook blueprint
-    
-        # Instantiate MessageController and register routes
-    document_processor = DocumentProcessor()
+    # 'all' runs everything in this process. For scale-out, 'web' front ends
+    # answer commands and queue uploads, and 'worker' nodes run the model;
+    # both share sessions and the queue through SHARED_STORE_URL.
+    role = os.getenv('BOT_ROLE', 'all').lower()
+    if role not in ('all', 'web', 'worker'):
+        raise ValueError(f"BOT_ROLE must be all, web or worker, not {role}")
+    work_queue = None
+    if role == 'all':
+        user_state = SessionStore()
+    else:
+        backend = open_backend()
+        user_state = SharedSessionStore(backend)
+        work_queue = WorkQueue(backend)
+
+    # Front ends never import the model stack (torch, transformers)
+    document_processor = None
+    if role != 'web':
+        from controller.webhook_controller import webhook_blueprint
+        from model.document_processor import DocumentProcessor
+        from model.model_singleton import ModelSingleton
+
+        # The legacy webhook runs its own pipeline in-process
+        app.register_blueprint(webhook_blueprint)
+        document_processor = DocumentProcessor()
+        if os.getenv('MODEL_WARMUP', 'true').lower() == 'true':
+            ModelSingleton.get_instance().warm_up()
+        logging.info(f"Model load report: {ModelSingleton.get_instance().load_report()}")
     whapi_client = WhatsAppClient(api_url=os.getenv('API_URL'), token=os.getenv('TOKEN')) 
-    user_state = ...          # Replace with your actual implementation
     message_view = MessageView()
-    message_controller = MessageController(document_processor, whapi_client, user_state, message_view)
+    command_router = CommandRouter(message_view, user_state)
+    message_controller = MessageController(
+        document_processor, whapi_client, user_state, message_view, applicant_aggregator,
+        command_router=command_router, work_queue=work_queue if role == 'web' else None
+    )
+
+    if role == 'worker':
+        # Keep a chat's partition while its applicant's fields are held here
+        def can_release(partition):
+            return not any(partition_for(chat_id, work_queue.partitions) == partition
+                           for chat_id in applicant_aggregator.pending_chats())
+        QueueWorker(work_queue, message_controller.process_job, can_release=can_release).start()
 
     app.register_blueprint(messages_blueprint, url_prefix='')
+    app.register_blueprint(metrics_blueprint)
+    app.register_blueprint(status_blueprint)
+    app.register_blueprint(slo_blueprint)
+
+    # Failed Monday.com writes are retried in the background
+    retry_scheduler.start()
 
     
     # Setup webhook route
@@ -75,10 +126,12 @@ def create_app():
     api_url = os.getenv('API_URL')
     token = os.getenv('TOKEN')
     
-    if bot_url and api_url and token:
-        setup_webhook(api_url, bot_url, token)
-    else:
-        logging.error("Missing required environment variables (BOT_URL, API_URL, or TOKEN)")
+    # Only front ends receive Whapi's webhook
+    if role != 'worker':
+        if bot_url and api_url and token:
+            setup_webhook(api_url, bot_url, token)
+        else:
+            logging.error("Missing required environment variables (BOT_URL, API_URL, or TOKEN)")
     
     return app
 
@@ -0,0 +1,66 @@
+import logging
+from typing import Callable, Dict, Optional
+
+from view.message_view import MessageView
+
+logger = logging.getLogger(__name__)
+
+# Other ways people ask for the same thing
+COMMAND_ALIASES = {
+    'STATUS': 'CHECK_STATUS',
+    'CHECK STATUS': 'CHECK_STATUS',
+    'HI': 'START',
+    'HELLO': 'START',
+    'HEY': 'START',
+    'MENU': 'HELP',
+    '?': 'HELP'
+}
+
+
+def message_text(message: Dict) -> Optional[str]:
+    """Text of a plain-text message in either the Whapi or the simple format"""
+    text = message.get('text')
+    if isinstance(text, dict):
+        text = text.get('body')
+    if not isinstance(text, str):
+        text = message.get('body')
+    return text if isinstance(text, str) else None
+
+
+class CommandRouter:
+    """Answer text messages from precomputed templates and the session store.
+
+    Sits in front of MessageController so commands and status queries never
+    reach the document pipeline. This module deliberately imports nothing from
+    `model`, keeping it cheap to load and to benchmark on its own.
+    """
+
+    def __init__(self, message_view: MessageView, session_store):
+        self.message_view = message_view
+        self.session_store = session_store
+        self._handlers: Dict[str, Callable[[str], str]] = {
+            'HELP': lambda chat_id: message_view.get_help_message(),
+            'START': lambda chat_id: message_view.get_welcome_message(),
+            'CHECK_STATUS': self._status
+        }
+
+    def _status(self, chat_id: str) -> str:
+        return self.message_view.format_status(self.session_store.get_document_status(chat_id))
+
+    def route(self, chat_id: str, message: Dict) -> Optional[str]:
+        """Reply for a text message, or None if it isn't one this router answers"""
+        if 'media' in message:
+            return None
+        text = message_text(message)
+        if text is None:
+            return None
+
+        command = ' '.join(text.split()).upper()
+        command = COMMAND_ALIASES.get(command, command)
+        handler = self._handlers.get(command)
+        if handler is not None:
+            return handler(chat_id)
+        # A new chat gets the welcome first, anything else a pointer to HELP
+        if not self.session_store.has_session(chat_id):
+            return self.message_view.get_welcome_message()
+        return self.message_view.get_unknown_type_message()
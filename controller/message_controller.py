@@ -1,14 +1,33 @@
+import time
 import logging
 from flask import Blueprint, request, jsonify
 
+from services import metrics
+from services.applicant_aggregator import DOCUMENT_TYPES
+from services.tracing import RequestTrace, current_request, request_context, REQUEST_ID_HEADER
+from model.degradation import DeferredDocuments, get_controller
+from model.inference_resources import (
+    request_priority, PRIORITY_COMMAND, PRIORITY_COMPLETING, PRIORITY_CONTINUING, PRIORITY_NEW
+)
+
 messages_blueprint = Blueprint('messages', __name__)
 
 class MessageController:
-    def __init__(self, document_processor, whapi_client, user_state, message_view):
+    def __init__(self, document_processor, whapi_client, user_state, message_view, applicants=None,
+                 degradation=None, command_router=None, work_queue=None):
         self.document_processor = document_processor
         self.whapi_client = whapi_client
         self.user_state = user_state
         self.message_view = message_view
+        # Merges each chat's documents into a single Monday item
+        self.applicants = applicants
+        # Under heavy load uploads are acknowledged and processed later
+        self.degradation = degradation or get_controller()
+        self.deferred = DeferredDocuments(self.degradation, self._process_and_reply)
+        # Answers text commands before anything else runs
+        self.command_router = command_router
+        # On a web front end, uploads go to model workers through the shared queue
+        self.work_queue = work_queue
 
         # Register route with instance method
         messages_blueprint.add_url_rule('/messages', 'handle_messages', self.handle_messages, methods=['POST'])
@@ -27,9 +46,29 @@ class MessageController:
             if not chat_id or not message:
                 return jsonify({'error': 'Invalid request data'}), 400
 
-            # Check if message contains media
-            if 'media' in message:
-                return jsonify(self._handle_image_message(chat_id, message))
+            # Followed through processing to the reply for per-stage latency
+            trace = RequestTrace('message', request.headers.get(REQUEST_ID_HEADER), chat_id)
+            with request_context(trace):
+                if self.command_router is not None:
+                    reply = self.command_router.route(chat_id, message)
+                    if reply is not None:
+                        trace.kind = trace.doc_type = 'command'
+                        with metrics.span('webhook_receive', message_type='text'):
+                            self.whapi_client.send_message(chat_id, reply, priority=PRIORITY_COMMAND)
+                        return jsonify({'status': 'success'})
+
+                # Check if message contains media
+                if 'media' in message and self.work_queue is not None:
+                    with metrics.span('webhook_receive', message_type='media'):
+                        self.work_queue.enqueue(chat_id, {
+                            'message': message,
+                            'request_id': trace.request_id,
+                            'received_at': time.time() - trace.elapsed()
+                        })
+                    return jsonify({'status': 'queued'})
+                if 'media' in message:
+                    with metrics.span('webhook_receive', message_type='media'):
+                        return jsonify(self._handle_image_message(chat_id, message))
 
             # Add handling for other message types if needed
             return jsonify({'status': 'success'})
@@ -37,7 +76,16 @@ class MessageController:
             logging.error(f"Error handling message: {e}")
             return jsonify({'error': str(e)}), 500
 
-    def _handle_image_message(self, chat_id, message):
+    def process_job(self, chat_id, job):
+        """Handle an upload a front end put on the shared work queue (model workers)"""
+        waited = max(0.0, time.time() - job['received_at'])
+        trace = RequestTrace('queued', job.get('request_id'), chat_id, started=time.perf_counter() - waited)
+        trace.add_stage('work_queue', max(0.0, time.time() - job.get('enqueued_at', job['received_at'])))
+        with request_context(trace):
+            # The queue already absorbs bursts, and a deferred job would be acked unprocessed
+            return self._handle_image_message(chat_id, job['message'], allow_defer=False)
+
+    def _handle_image_message(self, chat_id, message, allow_defer=True):
         """Handle document image uploads."""
         try:
             media_url = message.get('media', {}).get('url')
@@ -51,27 +99,62 @@ class MessageController:
                 logging.error("Failed to download media from URL.")
                 return {'error': 'Failed to download media'}
 
-            # Process the document using the document processor
-            result = self.document_processor.process_document(image_data)
-            if result['success']:
-                # Update user state
-                self.user_state.update_document_status(chat_id, result['doc_type'])
-
-                # Send success response
-                response_text = self.message_view.format_document_success(result['doc_type'])
-                self.whapi_client.send_message(chat_id, response_text)
-
-                # Check if all documents are complete
-                if self.user_state.check_completion(chat_id):
-                    completion_text = self.message_view.get_completion_message()
-                    self.whapi_client.send_message(chat_id, completion_text)
-                    self.user_state.clear_user(chat_id)
-            else:
-                # Send detailed error message
-                error_text = self.message_view.format_document_error(result['error'])
-                self.whapi_client.send_message(chat_id, error_text)
+            if allow_defer and self.degradation.current().defer and self.deferred.submit(chat_id, image_data):
+                self._set_doc_type('deferred')
+                self.whapi_client.send_message(chat_id, self.message_view.get_deferred_message())
+                return {'status': 'deferred'}
 
+            self._process_and_reply(chat_id, image_data)
             return {'status': 'success'}
         except Exception as e:
             logging.error(f"Error processing image message: {e}")
             return {'error': str(e)}
+
+    def _upload_priority(self, chat_id):
+        """Uploads that could finish an applicant go before ones that start a new one"""
+        record = self.applicants.get(chat_id) if self.applicants is not None else None
+        if record is None or not record.documents:
+            return PRIORITY_NEW
+        if len(record.documents) >= len(DOCUMENT_TYPES) - 1:
+            return PRIORITY_COMPLETING
+        return PRIORITY_CONTINUING
+
+    def _expected_document(self, chat_id):
+        """The chat's last missing document, worth escalating for straight away"""
+        status = self.user_state.get_document_status(chat_id)
+        missing = [doc_type for doc_type in DOCUMENT_TYPES if not status.get(doc_type)]
+        return missing[0] if len(missing) == 1 else None
+
+    @staticmethod
+    def _set_doc_type(doc_type):
+        trace = current_request()
+        if trace is not None:
+            trace.doc_type = doc_type
+
+    def _process_and_reply(self, chat_id, image_data):
+        """Extract a downloaded document and send the chat the outcome"""
+        # Process the document using the document processor
+        with request_priority(self._upload_priority(chat_id)), metrics.span('extraction') as stage:
+            result = self.document_processor.process_document(image_data, self._expected_document(chat_id))
+            stage.set(doc_type=result.get('doc_type', 'unknown'))
+        self._set_doc_type(result['doc_type'] if result['success'] else 'unidentified')
+        if result['success']:
+            # Update user state
+            self.user_state.update_document_status(chat_id, result['doc_type'])
+            if self.applicants is not None:
+                self.applicants.add_document(chat_id, result['doc_type'], result.get('data', {}))
+
+            # Send success response
+            response_text = self.message_view.format_document_success(result['doc_type'])
+            self.whapi_client.send_message(chat_id, response_text)
+
+            # Check if all documents are complete
+            if self.user_state.check_completion(chat_id):
+                completion_text = self.message_view.get_completion_message()
+                self.whapi_client.send_message(chat_id, completion_text)
+                self.user_state.clear_user(chat_id)
+        else:
+            # Send detailed error message
+            error_text = self.message_view.format_document_error(result['error'])
+            self.whapi_client.send_message(chat_id, error_text)
+
@@ -0,0 +1,10 @@
+from flask import Blueprint, Response
+
+from services import metrics
+
+metrics_blueprint = Blueprint('metrics', __name__)
+
+@metrics_blueprint.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Expose pipeline metrics in the Prometheus text format."""
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,15 @@
+from flask import Blueprint, jsonify, request
+
+from services.slo import get_tracker
+
+slo_blueprint = Blueprint('slo', __name__)
+
+@slo_blueprint.route('/slo', methods=['GET'])
+def get_slo():
+    """Rolling reply latency and objective status per document type."""
+    return jsonify(get_tracker().status())
+
+@slo_blueprint.route('/slo/slow', methods=['GET'])
+def get_slow_requests():
+    """Recent requests over SLOW_REQUEST_SECONDS with their stage breakdown."""
+    return jsonify({'requests': get_tracker().slow_requests(request.args.get('limit', type=int))})
@@ -0,0 +1,37 @@
+from flask import Blueprint, jsonify
+
+from services import resilience
+from services.retry_scheduler import retry_scheduler
+from model.inference_resources import InferenceResources
+from model.degradation import get_controller
+
+status_blueprint = Blueprint('status', __name__)
+
+@status_blueprint.route('/status', methods=['GET'])
+def get_status():
+    """Circuit, bulkhead and queue state for each dependency."""
+    dependencies = resilience.status()
+    inference = InferenceResources.get_instance()
+    dependencies['model'].update({
+        'in_flight': inference.active,
+        'queued': inference.queued,
+        'max_concurrency': inference.concurrency
+    })
+    degradation = get_controller()
+    tier = degradation.current()
+    pending = retry_scheduler.pending()
+    degraded = [name for name, state in dependencies.items() if state['state'] != 'closed']
+    return jsonify({
+        'status': 'degraded' if degraded else 'ok',
+        'degraded': degraded,
+        'dependencies': dependencies,
+        'extraction_tier': {
+            'level': tier.level,
+            'name': tier.name,
+            'p90_latency_seconds': round(degradation.recent_latency(), 3)
+        },
+        'retry_queue': {
+            'pending': len(pending),
+            'oldest_created_at': min((job['created_at'] for job in pending), default=None)
+        }
+    })
@@ -8,6 +8,16 @@ from typing import Dict, Any
 from transformers import pipeline
 from huggingface_hub import model_info
 import time
+import threading
+
+from services import metrics
+from services.applicant_aggregator import applicant_aggregator
+from services.tracing import RequestTrace, current_request, request_context, REQUEST_ID_HEADER
+from model.validators import parse_formatted_text
+from model.records import RECORD_TYPES
+from model.inference_resources import (
+    InferenceResources, request_priority, PRIORITY_COMPLETING, PRIORITY_CONTINUING, PRIORITY_NEW
+)
 
 # Create blueprint
 webhook_blueprint = Blueprint('webhook', __name__)
@@ -19,6 +29,13 @@ class ProcessingState(Enum):
     WAITING_FOR_LOGCARD = "waiting_for_logcard"
     COMPLETED = "completed"
 
+# The last document finishes an applicant, so it is scheduled first
+STATE_PRIORITIES = {
+    ProcessingState.WAITING_FOR_ID: PRIORITY_NEW,
+    ProcessingState.WAITING_FOR_LICENSE: PRIORITY_CONTINUING,
+    ProcessingState.WAITING_FOR_LOGCARD: PRIORITY_COMPLETING
+}
+
 # Store user states (in real application, use a database)
 user_states = {}
 
@@ -60,13 +77,17 @@ class DocumentProcessor:
     def extract_data_from_image(self, image_url: str, document_type: str) -> Dict:
         """Extract data from image using the Hugging Face model."""
         try:
-            response = requests.get(image_url)
-            response.raise_for_status()  # Ensure the request was successful
+            with metrics.span('media_download', doc_type=document_type):
+                response = requests.get(image_url)
+                response.raise_for_status()  # Ensure the request was successful
 
             if not self.model:
                 raise RuntimeError("Model is not initialized. Unable to process the image.")
 
-            result = self.model(response.content)
+            # Same slots as the SmolVLM processors, so priorities apply across both
+            with InferenceResources.get_instance().slot(document_type), \
+                    metrics.span('generate', doc_type=document_type):
+                result = self.model(response.content)
 
             if document_type == "identity_card":
                 return self._parse_id_card(result)
@@ -91,38 +112,33 @@ class DocumentProcessor:
     def _parse_log_card(self, result: str) -> Dict:
         return {"type": "log_card", "extracted_data": result}
 
-    def save_to_monday(self, data: Dict) -> bool:
-        """Save extracted data to Monday.com."""
-        try:
-            query = """
-            mutation ($myItemName: String!, $columnValues: JSON!) {
-                create_item (
-                    board_id: <your_board_id>,
-                    item_name: $myItemName,
-                    column_values: $columnValues
-                ) {
-                    id
-                }
-            }
-            """
-            variables = {
-                "myItemName": f"Document Processing - {data['type']}",
-                "columnValues": json.dumps(data['extracted_data'])
-            }
-            headers = {
-                'Authorization': self.monday_api_token,
-                'Content-Type': 'application/json'
-            }
-            response = requests.post(self.monday_api_url, json={'query': query, 'variables': variables}, headers=headers)
-
-            if response.status_code == 200:
-                logging.info("Data saved to Monday.com successfully.")
-                return True
-            logging.error(f"Failed to save data to Monday.com: {response.text}")
-            return False
-        except Exception as e:
-            logging.error(f"Error saving to Monday.com: {e}")
-            return False
+    @staticmethod
+    def extracted_fields(data: Dict) -> Dict[str, str]:
+        """Field values from an extraction result, for the applicant's Monday item"""
+        extracted = data.get('extracted_data')
+        # image-to-text pipelines return [{'generated_text': ...}]
+        if isinstance(extracted, list) and extracted and isinstance(extracted[0], dict):
+            extracted = extracted[0].get('generated_text', '')
+        if isinstance(extracted, dict):
+            return extracted
+        record_class = RECORD_TYPES.get(data.get('type'))
+        if record_class is None:
+            return parse_formatted_text(str(extracted or ''))
+        return record_class.from_text(str(extracted or ''))
+
+_document_processor = None
+_document_processor_lock = threading.Lock()
+
+
+def get_document_processor() -> DocumentProcessor:
+    """The webhook path's processor, so its pipeline is loaded once per process
+    rather than for every message"""
+    global _document_processor
+    if _document_processor is None:
+        with _document_processor_lock:
+            if _document_processor is None:
+                _document_processor = DocumentProcessor()
+    return _document_processor
 
 def get_next_state(current_state: ProcessingState) -> ProcessingState:
     """Get the next state in the processing flow."""
@@ -150,18 +166,24 @@ def process_message(message_data: Dict[Any, Any]) -> Dict[str, str]:
 
         current_state = user_states[user_id]
 
-        doc_processor = DocumentProcessor()
-        if current_state == ProcessingState.WAITING_FOR_ID:
-            data = doc_processor.extract_data_from_image(message_data['media_url'], "identity_card")
-        elif current_state == ProcessingState.WAITING_FOR_LICENSE:
-            data = doc_processor.extract_data_from_image(message_data['media_url'], "drivers_license")
-        elif current_state == ProcessingState.WAITING_FOR_LOGCARD:
-            data = doc_processor.extract_data_from_image(message_data['media_url'], "log_card")
-        else:
-            return {"status": "success", "message": "All documents have been processed"}
+        doc_processor = get_document_processor()
+        with request_priority(STATE_PRIORITIES.get(current_state, PRIORITY_NEW)):
+            if current_state == ProcessingState.WAITING_FOR_ID:
+                data = doc_processor.extract_data_from_image(message_data['media_url'], "identity_card")
+            elif current_state == ProcessingState.WAITING_FOR_LICENSE:
+                data = doc_processor.extract_data_from_image(message_data['media_url'], "drivers_license")
+            elif current_state == ProcessingState.WAITING_FOR_LOGCARD:
+                data = doc_processor.extract_data_from_image(message_data['media_url'], "log_card")
+            else:
+                return {"status": "success", "message": "All documents have been processed"}
+
+        trace = current_request()
+        if trace is not None:
+            trace.doc_type = data['type'] if data else 'unidentified'
 
         if data:
-            doc_processor.save_to_monday(data)
+            # One Monday item per applicant, written once all documents are in
+            applicant_aggregator.add_document(user_id, data['type'], doc_processor.extracted_fields(data))
 
         next_state = get_next_state(current_state)
         user_states[user_id] = next_state
@@ -186,7 +208,12 @@ def handle_webhook():
 
         logging.info(f"Received webhook event: {json.dumps(data, indent=2)}")
 
-        result = process_message(data)
+        # The reply is this response, so the trace ends with the handler
+        trace = RequestTrace('webhook', request.headers.get(REQUEST_ID_HEADER), data.get('from'))
+        with request_context(trace):
+            with metrics.span('webhook_receive'):
+                result = process_message(data)
+            trace.finish('replied' if result.get('status') == 'success' else 'failed')
         return jsonify(result), 200
     except Exception as e:
         logging.error(f"Error handling webhook: {e}")
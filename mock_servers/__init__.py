@@ -0,0 +1,57 @@
+"""Local stand-ins for Whapi and Monday.com used by end-to-end performance tests.
+
+Point the bot at them with API_URL=http://127.0.0.1:<whapi port> and
+MONDAY_API_URL=http://127.0.0.1:<monday port>/v2.
+"""
+import threading
+import logging
+
+from werkzeug.serving import make_server
+
+from .common import MockBehaviour, TokenBucket
+from .whapi import create_whapi_app
+from .monday import create_monday_app
+
+logger = logging.getLogger(__name__)
+
+
+class MockServer:
+    """Serve a Flask app from a background thread"""
+
+    def __init__(self, app, host: str = '127.0.0.1', port: int = 0):
+        self._server = make_server(host, port, app, threaded=True)
+        self.host = host
+        self.port = self._server.server_port
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self):
+        self._thread.start()
+        logger.info(f"Mock server listening on {self.url}")
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._thread.join()
+
+
+def start_whapi(behaviour: MockBehaviour = None, media_dir: str = None, port: int = 0) -> MockServer:
+    return MockServer(create_whapi_app(behaviour or MockBehaviour(), media_dir), port=port).start()
+
+
+def start_monday(behaviour: MockBehaviour = None, port: int = 0) -> MockServer:
+    return MockServer(create_monday_app(behaviour or MockBehaviour()), port=port).start()
+
+
+__all__ = [
+    'MockBehaviour',
+    'MockServer',
+    'TokenBucket',
+    'create_whapi_app',
+    'create_monday_app',
+    'start_whapi',
+    'start_monday'
+]
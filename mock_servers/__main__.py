@@ -0,0 +1,55 @@
+"""Run the Whapi and Monday.com stand-ins.
+
+    python -m mock_servers --whapi-port 5001 --monday-port 5002 \
+        --latency lognormal:120:0.5 --rate-limit 20/1 --error-rate 0.01
+"""
+import time
+import argparse
+import logging
+
+from . import MockBehaviour, start_whapi, start_monday
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Whapi and Monday.com stand-ins")
+    parser.add_argument('--whapi-port', type=int, default=5001)
+    parser.add_argument('--monday-port', type=int, default=5002)
+    parser.add_argument('--media-dir', help="Serve /media/<name> from this directory")
+    parser.add_argument('--latency', default='fixed:0',
+                        help="fixed:ms, uniform:lo:hi or lognormal:median_ms:sigma")
+    parser.add_argument('--rate-limit', help="Requests per window for each server, e.g. 20/1")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of requests answered with 500")
+    parser.add_argument('--monday-latency', help="Override --latency for Monday.com")
+    parser.add_argument('--monday-rate-limit', help="Override --rate-limit for Monday.com")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    whapi = start_whapi(
+        MockBehaviour(args.latency, args.rate_limit, args.error_rate, args.seed),
+        media_dir=args.media_dir,
+        port=args.whapi_port
+    )
+    monday = start_monday(
+        MockBehaviour(
+            args.monday_latency or args.latency,
+            args.monday_rate_limit or args.rate_limit,
+            args.error_rate,
+            args.seed + 1
+        ),
+        port=args.monday_port
+    )
+
+    logging.info(f"Whapi stand-in: API_URL={whapi.url}")
+    logging.info(f"Monday stand-in: MONDAY_API_URL={monday.url}/v2")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        whapi.stop()
+        monday.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+import time
+import random
+import threading
+from typing import Dict, List, Optional
+
+from flask import jsonify
+
+from model.stub_backend import LatencyDistribution
+from services.token_bucket import TokenBucket
+
+
+class MockBehaviour:
+    """Latency, rate limiting and error injection shared by the mock servers.
+
+    `rate_limit` is a "requests/seconds" string such as "10/1".
+    """
+
+    def __init__(self, latency: str = 'fixed:0', rate_limit: Optional[str] = None,
+                 error_rate: float = 0.0, seed: int = 0):
+        self.latency = LatencyDistribution(latency)
+        self.error_rate = error_rate
+        self.rate_limiter = None
+        if rate_limit:
+            rate, per = rate_limit.split('/')
+            self.rate_limiter = TokenBucket(float(rate), float(per))
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.counts: Dict[str, int] = {}
+        self.events: List[Dict] = []
+
+    def record(self, endpoint: str, status: int, **details):
+        with self._lock:
+            key = f"{endpoint}:{status}"
+            self.counts[key] = self.counts.get(key, 0) + 1
+            event = {'endpoint': endpoint, 'status': status, 'time': time.time()}
+            event.update(details)
+            self.events.append(event)
+
+    def apply(self, endpoint: str):
+        """Delay the request and return an error response if one should be injected"""
+        if self.rate_limiter is not None:
+            wait = self.rate_limiter.try_acquire()
+            if wait is not None:
+                self.record(endpoint, 429)
+                response = jsonify({'error': 'Too many requests'})
+                response.status_code = 429
+                response.headers['Retry-After'] = str(max(1, int(round(wait))))
+                return response
+
+        with self._lock:
+            delay = self.latency.sample(self._rng)
+            fail = self._rng.random() < self.error_rate
+        if delay > 0:
+            time.sleep(delay)
+
+        if fail:
+            self.record(endpoint, 500)
+            response = jsonify({'error': 'Injected server error'})
+            response.status_code = 500
+            return response
+        return None
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'counts': dict(self.counts), 'events': list(self.events)}
+
+    def reset(self):
+        with self._lock:
+            self.counts.clear()
+            self.events.clear()
@@ -0,0 +1,86 @@
+import re
+import json
+import itertools
+import threading
+import logging
+
+from flask import Flask, request, jsonify
+
+from .common import MockBehaviour
+
+logger = logging.getLogger(__name__)
+
+# GraphQL mutations the bot issues against Monday.com
+SUPPORTED_MUTATIONS = ('create_item', 'change_multiple_column_values')
+
+
+def create_monday_app(behaviour: MockBehaviour) -> Flask:
+    """Stand-in for Monday.com's GraphQL API, answering item mutations"""
+    app = Flask('mock_monday')
+    item_ids = itertools.count(1000000)
+    id_lock = threading.Lock()
+    items = {}
+
+    @app.route('/', methods=['POST'])
+    @app.route('/v2', methods=['POST'])
+    def graphql():
+        error = behaviour.apply('graphql')
+        if error is not None:
+            return error
+
+        if not request.headers.get('Authorization'):
+            behaviour.record('graphql', 401)
+            return jsonify({'error_message': 'Not Authenticated'}), 401
+
+        payload = request.get_json(silent=True) or {}
+        query = payload.get('query', '')
+        variables = payload.get('variables', {})
+        mutation = next((name for name in SUPPORTED_MUTATIONS if re.search(rf'\b{name}\b', query)), None)
+        if mutation is None:
+            behaviour.record('graphql', 400)
+            return jsonify({'errors': [{'message': 'Unsupported query'}]}), 400
+
+        try:
+            column_values = json.loads(variables.get('columnValues') or '{}')
+        except (TypeError, ValueError):
+            behaviour.record('graphql', 200, mutation=mutation, error='invalid column values')
+            return jsonify({'errors': [{'message': 'Invalid column values'}]})
+
+        if mutation == 'create_item':
+            with id_lock:
+                item_id = str(next(item_ids))
+                items[item_id] = dict(column_values)
+        else:
+            item_id = str(variables.get('itemId'))
+            with id_lock:
+                if item_id not in items:
+                    behaviour.record('graphql', 200, mutation=mutation, error='item not found')
+                    return jsonify({'errors': [{'message': f'Item {item_id} not found'}]})
+                items[item_id].update(column_values)
+
+        behaviour.record(
+            'graphql', 200,
+            mutation=mutation,
+            item_id=item_id,
+            item_name=variables.get('itemName'),
+            columns=len(column_values)
+        )
+        return jsonify({'data': {mutation: {'id': item_id}}, 'account_id': 1})
+
+    @app.route('/_items', methods=['GET'])
+    def list_items():
+        with id_lock:
+            return jsonify(dict(items))
+
+    @app.route('/_stats', methods=['GET'])
+    def stats():
+        return jsonify(behaviour.stats())
+
+    @app.route('/_reset', methods=['POST'])
+    def reset():
+        behaviour.reset()
+        with id_lock:
+            items.clear()
+        return jsonify({'reset': True})
+
+    return app
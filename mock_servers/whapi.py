@@ -0,0 +1,99 @@
+import os
+import struct
+import zlib
+import logging
+from typing import Optional
+
+from flask import Flask, request, jsonify, send_file, Response
+
+from .common import MockBehaviour
+from model.stub_backend import CANNED_OUTPUTS, DOC_TYPE_MARKER
+
+logger = logging.getLogger(__name__)
+
+
+def _placeholder_png(width: int = 800, height: int = 600, doc_type: Optional[str] = None) -> bytes:
+    """A plain grey PNG, built without Pillow, for when no media directory is given.
+
+    With `doc_type` it carries the stub model's document marker, so a
+    MODEL_BACKEND=stub bot reads it as that document.
+    """
+    def chunk(kind, data):
+        body = kind + data
+        return struct.pack('>I', len(data)) + body + struct.pack('>I', zlib.crc32(body) & 0xffffffff)
+
+    row = b'\x00' + b'\xc8' * width
+    pixels = zlib.compress(row * height)
+    header = struct.pack('>IIBBBBB', width, height, 8, 0, 0, 0, 0)
+    marker = chunk(b'tEXt', f"{DOC_TYPE_MARKER}\0{doc_type}".encode('latin-1')) if doc_type else b''
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) + marker + chunk(b'IDAT', pixels) + chunk(b'IEND', b'')
+
+
+def _doc_type_for(name: str) -> Optional[str]:
+    """Document type a media name starts with, e.g. "log_card-17.png" """
+    for doc_type in CANNED_OUTPUTS:
+        if os.path.basename(name).startswith(doc_type):
+            return doc_type
+    return None
+
+
+def create_whapi_app(behaviour: MockBehaviour, media_dir: Optional[str] = None) -> Flask:
+    """Stand-in for the Whapi endpoints the bot calls: /send, /settings and media URLs.
+
+    Without a media directory every media URL serves a placeholder image,
+    marked as the document its name starts with (id_card, drivers_license or
+    log_card) for the stub model backend.
+    """
+    app = Flask('mock_whapi')
+    placeholders = {doc_type: _placeholder_png(doc_type=doc_type) for doc_type in (None, *CANNED_OUTPUTS)}
+
+    @app.route('/send', methods=['POST'])
+    def send():
+        error = behaviour.apply('send')
+        if error is not None:
+            return error
+
+        payload = request.get_json(silent=True) or {}
+        if not payload.get('chat_id') or not payload.get('text'):
+            behaviour.record('send', 400)
+            return jsonify({'error': 'chat_id and text are required'}), 400
+
+        behaviour.record('send', 200, chat_id=payload['chat_id'], text=payload['text'])
+        return jsonify({'sent': True, 'message': {'chat_id': payload['chat_id']}})
+
+    @app.route('/settings', methods=['PATCH'])
+    def settings():
+        error = behaviour.apply('settings')
+        if error is not None:
+            return error
+
+        behaviour.record('settings', 200)
+        return jsonify(request.get_json(silent=True) or {})
+
+    @app.route('/media/<path:name>', methods=['GET'])
+    def media(name):
+        error = behaviour.apply('media')
+        if error is not None:
+            return error
+
+        if media_dir:
+            path = os.path.abspath(os.path.join(media_dir, name))
+            if not path.startswith(os.path.abspath(media_dir)) or not os.path.isfile(path):
+                behaviour.record('media', 404, name=name)
+                return jsonify({'error': 'Media not found'}), 404
+            behaviour.record('media', 200, name=name)
+            return send_file(path)
+
+        behaviour.record('media', 200, name=name)
+        return Response(placeholders[_doc_type_for(name)], mimetype='image/png')
+
+    @app.route('/_stats', methods=['GET'])
+    def stats():
+        return jsonify(behaviour.stats())
+
+    @app.route('/_reset', methods=['POST'])
+    def reset():
+        behaviour.reset()
+        return jsonify({'reset': True})
+
+    return app
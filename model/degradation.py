@@ -0,0 +1,217 @@
+import os
+import time
+import queue
+import logging
+import threading
+from collections import deque
+from typing import Callable, List, Optional
+
+from .inference_resources import InferenceResources
+from services import metrics
+from services.tracing import current_request, request_context
+
+logger = logging.getLogger(__name__)
+
+DEGRADATION_TIER = metrics.registry.gauge(
+    'gobingo_degradation_tier',
+    'Active extraction tier: 0 full, 1 reduced resolution, 2 greedy, 3 OCR first, 4 deferred'
+)
+DEGRADATION_TRANSITIONS = metrics.registry.counter(
+    'gobingo_degradation_transitions_total',
+    'Changes of extraction tier, by the tier left and the tier entered'
+)
+DEFERRED_DOCUMENTS = metrics.registry.gauge(
+    'gobingo_deferred_documents',
+    'Documents accepted under load and waiting to be processed'
+)
+
+
+class Tier:
+    """What the pipeline gives up at one level of load; each tier keeps the
+    savings of the ones below it"""
+
+    def __init__(self, level: int, name: str, reduce_resolution: bool = False, greedy: bool = False,
+                 ocr_first: bool = False, defer: bool = False):
+        self.level = level
+        self.name = name
+        # Smallest legible size only, no escalation to larger ones
+        self.reduce_resolution = reduce_resolution
+        # Greedy decoding with a shorter token budget instead of beam search
+        self.greedy = greedy
+        # Try Tesseract before the model and keep its result if it validates
+        self.ocr_first = ocr_first
+        # Acknowledge the upload and process it once load has fallen
+        self.defer = defer
+
+    def __repr__(self):
+        return f"Tier({self.level}, {self.name})"
+
+
+TIERS = (
+    Tier(0, 'full'),
+    Tier(1, 'reduced_resolution', reduce_resolution=True),
+    Tier(2, 'greedy', reduce_resolution=True, greedy=True),
+    Tier(3, 'ocr_first', reduce_resolution=True, greedy=True, ocr_first=True),
+    Tier(4, 'deferred', reduce_resolution=True, greedy=True, ocr_first=True, defer=True)
+)
+
+# Token budget for greedy decoding in degraded tiers
+GREEDY_MAX_NEW_TOKENS = int(os.getenv('DEGRADE_GREEDY_MAX_TOKENS', '160'))
+
+
+def _thresholds(name: str, default: str) -> List[float]:
+    values = [float(value) for value in os.getenv(name, default).split(',') if value.strip()]
+    if len(values) != len(TIERS) - 1:
+        raise ValueError(f"{name} needs one threshold per degraded tier ({len(TIERS) - 1})")
+    return values
+
+
+class DegradationController:
+    """Pick the extraction tier from inference queue depth and recent latency.
+
+    Tier N is entered as soon as the queue is at least DEGRADE_QUEUE_THRESHOLDS[N-1]
+    deep or the p90 of recent extraction times reaches
+    DEGRADE_LATENCY_THRESHOLDS[N-1], so a burst degrades straight away. Load
+    falling only steps back one tier at a time, once both signals are under
+    DEGRADE_RECOVERY_RATIO of the current tier's thresholds and the tier has
+    held for DEGRADE_COOLDOWN_SECONDS, to avoid flapping.
+    """
+
+    def __init__(self, resources: Optional[InferenceResources] = None):
+        self.enabled = os.getenv('DEGRADATION_ENABLED', 'true').lower() == 'true'
+        self.queue_thresholds = _thresholds('DEGRADE_QUEUE_THRESHOLDS', '2,4,8,16')
+        self.latency_thresholds = _thresholds('DEGRADE_LATENCY_THRESHOLDS', '20,40,80,120')
+        self.max_level = min(len(TIERS) - 1, int(os.getenv('DEGRADE_MAX_TIER', str(len(TIERS) - 1))))
+        self.recovery_ratio = float(os.getenv('DEGRADE_RECOVERY_RATIO', '0.5'))
+        self.cooldown = float(os.getenv('DEGRADE_COOLDOWN_SECONDS', '30'))
+        self.latency_window = float(os.getenv('DEGRADE_LATENCY_WINDOW_SECONDS', '60'))
+        self._resources = resources
+        self._latencies = deque(maxlen=50)
+        self._lock = threading.Lock()
+        self.tier = TIERS[0]
+        self._changed_at = time.monotonic()
+        DEGRADATION_TIER.set(0)
+
+    @property
+    def resources(self) -> InferenceResources:
+        if self._resources is None:
+            self._resources = InferenceResources.get_instance()
+        return self._resources
+
+    def record_latency(self, seconds: float):
+        """Report how long a document took end to end"""
+        with self._lock:
+            self._latencies.append((time.monotonic(), seconds))
+
+    def recent_latency(self) -> float:
+        """p90 of extraction times within the latency window"""
+        cutoff = time.monotonic() - self.latency_window
+        with self._lock:
+            recent = sorted(seconds for at, seconds in self._latencies if at >= cutoff)
+        if not recent:
+            return 0.0
+        return recent[min(len(recent) - 1, int(len(recent) * 0.9))]
+
+    def _target_level(self, queued: int, latency: float) -> int:
+        level = 0
+        for index in range(len(self.queue_thresholds)):
+            if queued >= self.queue_thresholds[index] or latency >= self.latency_thresholds[index]:
+                level = index + 1
+        return min(level, self.max_level)
+
+    def _can_step_down(self, queued: int, latency: float) -> bool:
+        index = self.tier.level - 1
+        return queued < self.queue_thresholds[index] * self.recovery_ratio \
+            and latency < self.latency_thresholds[index] * self.recovery_ratio \
+            and time.monotonic() - self._changed_at >= self.cooldown
+
+    def current(self) -> Tier:
+        """Re-evaluate the load signals and return the tier to use now"""
+        if not self.enabled:
+            return TIERS[0]
+
+        queued = self.resources.queued
+        latency = self.recent_latency()
+        with self._lock:
+            level = self.tier.level
+            target = self._target_level(queued, latency)
+            if target > level:
+                level = target
+            elif level > 0 and self._can_step_down(queued, latency):
+                level -= 1
+            if level != self.tier.level:
+                self._set_tier(TIERS[level], queued, latency)
+            return self.tier
+
+    def _set_tier(self, tier: Tier, queued: int, latency: float):
+        logger.warning(
+            f"Extraction tier {self.tier.name} -> {tier.name} (queued={queued}, p90 latency={latency:.1f}s)"
+        )
+        DEGRADATION_TRANSITIONS.inc(from_tier=self.tier.name, to_tier=tier.name)
+        DEGRADATION_TIER.set(tier.level)
+        self.tier = tier
+        self._changed_at = time.monotonic()
+
+
+class DeferredDocuments:
+    """Uploads acknowledged under load, processed one at a time once the
+    controller is out of the deferred tier.
+
+    Held in memory and bounded by DEFERRED_QUEUE_SIZE; when full, submit()
+    returns False and the caller processes the document straight away.
+    """
+
+    def __init__(self, controller: DegradationController, handler: Callable[[str, object], None],
+                 max_size: Optional[int] = None):
+        self.controller = controller
+        self.handler = handler
+        self._queue = queue.Queue(maxsize=max_size or int(os.getenv('DEFERRED_QUEUE_SIZE', '200')))
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def submit(self, chat_id: str, image_data) -> bool:
+        # The acknowledgement finishes the request's trace; the result is traced separately
+        trace = current_request()
+        follow_up = trace.follow_up('deferred') if trace is not None else None
+        try:
+            self._queue.put_nowait((chat_id, image_data, follow_up))
+        except queue.Full:
+            return False
+        DEFERRED_DOCUMENTS.set(self._queue.qsize())
+        self.start()
+        return True
+
+    def _worker(self):
+        while True:
+            chat_id, image_data, trace = self._queue.get()
+            while self.controller.current().defer:
+                time.sleep(1.0)
+            DEFERRED_DOCUMENTS.set(self._queue.qsize())
+            try:
+                with request_context(trace):
+                    self.handler(chat_id, image_data)
+            except Exception as e:
+                logger.error(f"Deferred document for {chat_id} failed: {str(e)}")
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._worker, name='deferred-documents', daemon=True)
+                self._thread.start()
+
+
+_controller = None
+_controller_lock = threading.Lock()
+
+
+def get_controller() -> DegradationController:
+    global _controller
+    if _controller is None:
+        with _controller_lock:
+            if _controller is None:
+                _controller = DegradationController()
+    return _controller
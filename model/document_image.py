@@ -0,0 +1,204 @@
+import io
+import os
+import logging
+from typing import List, Optional, Tuple, Union
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+MIN_DIMENSION = 100
+MIN_FILE_BYTES = 1024
+
+# Leading bytes of the formats WhatsApp delivers, checked before PIL sees the data
+IMAGE_SIGNATURES = (
+    (b'\xff\xd8\xff', 'JPEG'),
+    (b'\x89PNG\r\n\x1a\n', 'PNG'),
+    (b'GIF87a', 'GIF'),
+    (b'GIF89a', 'GIF'),
+)
+
+ImageSource = Union[bytes, bytearray, memoryview, str, os.PathLike]
+
+
+def sniff_format(header: bytes) -> Optional[str]:
+    """Image format from the first bytes of a file, or None if unrecognised"""
+    for signature, image_format in IMAGE_SIGNATURES:
+        if header.startswith(signature):
+            return image_format
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'WEBP'
+    return None
+
+
+class BufferReader(io.RawIOBase):
+    """Seekable read-only file object over a memoryview.
+
+    io.BytesIO copies anything that isn't a bytes object, so downloaded
+    bytearrays and memoryviews are read in place instead.
+    """
+
+    def __init__(self, buffer: memoryview):
+        super().__init__()
+        self._buffer = buffer
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, target) -> int:
+        size = min(len(target), len(self._buffer) - self._position)
+        if size <= 0:
+            return 0
+        target[:size] = self._buffer[self._position:self._position + size]
+        self._position += size
+        return size
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            self._position = offset
+        elif whence == io.SEEK_CUR:
+            self._position += offset
+        else:
+            self._position = len(self._buffer) + offset
+        return self._position
+
+    def tell(self) -> int:
+        return self._position
+
+
+class DocumentImage:
+    """A document image from downloaded bytes, a memoryview or a file path.
+
+    Validation only reads the header, so nothing is decoded until `open()`,
+    and the decoded image is then shared by everything that opens it again.
+    Bytes are never written to disk or copied, and `close()` releases every
+    decoded image and the buffer as soon as extraction is done.
+    """
+
+    def __init__(self, source: ImageSource):
+        if isinstance(source, DocumentImage):
+            raise TypeError("Pass the DocumentImage itself instead of wrapping it again")
+        self.path: Optional[str] = None
+        self._buffer: Optional[memoryview] = None
+        self._bytes: Optional[bytes] = None
+        if isinstance(source, (str, os.PathLike)):
+            self.path = os.fspath(source)
+        elif isinstance(source, bytes):
+            # BytesIO shares an immutable bytes object instead of copying it
+            self._bytes = source
+        elif isinstance(source, (bytearray, memoryview)):
+            self._buffer = memoryview(source)
+        else:
+            raise TypeError(f"Unsupported image source: {type(source).__name__}")
+        self._images: List[Image.Image] = []
+        # Image returned by open() and the longest side its decode covers
+        # (None: full size), handed out again instead of decoding twice
+        self._decoded: Optional[Image.Image] = None
+        self._decoded_for: Optional[int] = None
+        self.format: Optional[str] = None
+        self.size: Optional[Tuple[int, int]] = None
+
+    def __repr__(self) -> str:
+        if self.path:
+            return f"DocumentImage({self.path})"
+        return f"DocumentImage(<{self.nbytes} bytes in memory>)"
+
+    @staticmethod
+    def describe(source) -> str:
+        """Short description for log lines; never the raw bytes"""
+        if isinstance(source, (str, os.PathLike, DocumentImage)):
+            return str(source)
+        if isinstance(source, Image.Image):
+            return f"<decoded {source.size[0]}x{source.size[1]} image>"
+        return f"<{len(source)} bytes in memory>"
+
+    @property
+    def nbytes(self) -> int:
+        if self.path:
+            return os.path.getsize(self.path)
+        if self._bytes is not None:
+            return len(self._bytes)
+        return self._buffer.nbytes if self._buffer is not None else 0
+
+    def _stream(self):
+        if self.path:
+            return open(self.path, 'rb')
+        if self._bytes is not None:
+            return io.BytesIO(self._bytes)
+        if self._buffer is None:
+            raise ValueError("Image has been closed")
+        return BufferReader(self._buffer)
+
+    def _header(self) -> bytes:
+        with self._stream() as stream:
+            return stream.read(16)
+
+    def validate(self) -> Tuple[bool, str]:
+        """Check signature, byte size and dimensions from the header only"""
+        try:
+            if self.nbytes < MIN_FILE_BYTES:
+                return False, "Image file is too small"
+            if sniff_format(self._header()) is None:
+                return False, "Invalid image: unrecognised file format"
+            # Image.open parses the header; pixel data is only read by load()
+            with self._stream() as stream, Image.open(stream) as img:
+                self.format = img.format
+                self.size = img.size
+            if self.size[0] < MIN_DIMENSION or self.size[1] < MIN_DIMENSION:
+                return False, "Image is too small"
+            return True, "Image is valid"
+        except Exception as e:
+            return False, f"Invalid image: {str(e)}"
+
+    def open(self, max_size: Optional[int] = None) -> Image.Image:
+        """Decode to an RGB image, closed together with this object.
+
+        With `max_size`, JPEGs are decoded straight at a reduced scale that
+        still covers `max_size` on the longest side, skipping the full-size
+        decode. Later calls return the same image while it covers their
+        `max_size`, so callers must not close or modify it.
+        """
+        if self._decoded is not None and (
+                self._decoded_for is None or (max_size is not None and max_size <= self._decoded_for)):
+            return self._decoded
+
+        # PIL closes a file it opened itself once the pixels are loaded
+        image = Image.open(self.path or self._stream())
+        self.format = image.format
+        full_size = image.size
+        if max_size and image.format == 'JPEG':
+            image.draft('RGB', (max_size, max_size))
+        image.load()
+        if image.mode != 'RGB':
+            # convert() copies even for RGB, so only call it when needed
+            converted = image.convert('RGB')
+            image.close()
+            image = converted
+        self.size = image.size
+        self._images.append(image)
+        self._decoded = image
+        # A draft decode only covers larger sizes if it kept every pixel
+        self._decoded_for = None if image.size == full_size else max_size
+        return image
+
+    def close(self):
+        """Release decoded pixel buffers and the source buffer"""
+        for image in self._images:
+            image.close()
+        self._images = []
+        self._decoded = None
+        if self._buffer is not None:
+            self._buffer.release()
+            self._buffer = None
+        self._bytes = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
@@ -1,28 +1,150 @@
+import time
+import logging
+import threading
+from contextlib import ExitStack
+from typing import Optional
+
+from . import ocr
+from .document_image import DocumentImage
+from .resolution_policy import RESOLUTION_PROFILES
+from .shadow import ShadowEvaluator
+from .degradation import get_controller
 from .processors.id_card_processor import IDCardProcessor
 from .processors.drivers_license_processor import DriversLicenseProcessor
 from .processors.log_card_processor import LogCardProcessor
+from services.profiling import profiled
+
+logger = logging.getLogger(__name__)
+
+
+class DocumentProcessorError(Exception):
+    """Raised for unsupported document types"""
+
+
+class DocumentProcessorFactory:
+    PROCESSOR_CLASSES = {
+        'id_card': IDCardProcessor,
+        'drivers_license': DriversLicenseProcessor,
+        'license': DriversLicenseProcessor,
+        'log_card': LogCardProcessor
+    }
+    _processors = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_processor(cls, document_type: str):
+        """Shared processor instance for a document type"""
+        processor_class = cls.PROCESSOR_CLASSES.get(document_type)
+        if processor_class is None:
+            raise DocumentProcessorError(f"Unsupported document type: {document_type}")
+        with cls._lock:
+            if processor_class not in cls._processors:
+                cls._processors[processor_class] = processor_class()
+            return cls._processors[processor_class]
+
 
 class DocumentProcessor:
-    def __init__(self):
+    def __init__(self, shadow: Optional[ShadowEvaluator] = None):
         self.processors = {
-            'id_card': IDCardProcessor(),
-            'drivers_license': DriversLicenseProcessor(),
-            'log_card': LogCardProcessor()
+            doc_type: DocumentProcessorFactory.get_processor(doc_type)
+            for doc_type in ('id_card', 'drivers_license', 'log_card')
         }
+        # Alternate config re-run on a sample of documents (SHADOW_CONFIG)
+        self.shadow = shadow if shadow is not None else ShadowEvaluator.from_env()
+        # Largest size any processor may ask for, so one decode serves them all
+        profiles = [RESOLUTION_PROFILES.get(processor.doc_type) for processor in self.processors.values()]
+        self.decode_size = max(max(profile['sizes']) for profile in profiles) if all(profiles) else None
+
+    def process_document(self, image_data, expected_type: Optional[str] = None):
+        """Try processing document with all available processors.
+
+        `expected_type` is the document the chat is most likely sending (e.g.
+        the only one still missing), tried first with full escalation.
+        """
+        start = time.perf_counter()
+        try:
+            with profiled('process_document'):
+                return self._process_document(image_data, expected_type)
+        finally:
+            # End-to-end time is one of the load signals for degradation tiers
+            get_controller().record_latency(time.perf_counter() - start)
 
-    def process_document(self, image_data):
-        """Try processing document with all available processors"""
-        errors = []
-        
-        # Try each processor until we find a match
-        for processor in self.processors.values():
-            result = processor.process(image_data)
-            if result['success']:
-                return result
-            errors.append(result['error'])
+    def _accept(self, image_data, result, start):
+        if self.shadow is not None:
+            self.shadow.submit(image_data, result['doc_type'], result, time.perf_counter() - start)
+        return result
+
+    def _process_document(self, image_data, expected_type: Optional[str] = None):
+        # Latest error per document type
+        errors = {}
+
+        # Validate and decode the downloaded bytes once instead of in every
+        # processor; the decoded image is closed with the DocumentImage
+        with DocumentImage(image_data) as document, ExitStack() as stack:
+            valid, message = document.validate()
+            if not valid:
+                return {'success': False, 'error': message}
+            try:
+                image = document.open(self.decode_size)
+            except Exception as e:
+                logger.error(f"Could not decode {document}: {str(e)}")
+                return {'success': False, 'error': f"Invalid image: {str(e)}"}
+
+            # Under the OCR-first tier Tesseract reads the image once, and each
+            # candidate parses that text instead of running OCR itself
+            if get_controller().current().ocr_first:
+                text = ocr.image_to_text(image)
+                for processor in self.processors.values():
+                    stack.enter_context(processor.shared_ocr(text))
+
+            expected = self.processors.get(expected_type)
+            if expected is not None:
+                start = time.perf_counter()
+                result = expected.process(image)
+                if result['success']:
+                    return self._accept(image_data, result, start)
+                errors[result['doc_type']] = result['error']
+
+            # One pass at the starting size per type, so a processor for the
+            # wrong document doesn't escalate on fields that were never there
+            candidates = []
+            for processor in self.processors.values():
+                if processor is expected:
+                    continue
+                start = time.perf_counter()
+                with processor.first_pass_only():
+                    result = processor.process(image)
+                if result['success']:
+                    return self._accept(image_data, result, start)
+                errors[result['doc_type']] = result['error']
+                missing = result.get('missing')
+                if missing is not None and len(missing) < len(processor.required_fields):
+                    candidates.append((len(missing) / len(processor.required_fields), processor))
+
+            # Only the likeliest type, the one that read most required fields, goes up in size
+            if candidates:
+                _, processor = min(candidates, key=lambda candidate: candidate[0])
+                start = time.perf_counter()
+                with processor.escalate():
+                    result = processor.process(image)
+                if result['success']:
+                    return self._accept(image_data, result, start)
+                errors[result['doc_type']] = result['error']
 
         # If no processor succeeded, return error
         return {
             'success': False,
-            'error': 'Could not identify document type. Errors: ' + '; '.join(errors)
-        }
\ No newline at end of file
+            'error': 'Could not identify document type. Errors: ' + '; '.join(errors.values())
+        }
+
+    def process_image(self, image_source, doc_type: str) -> str:
+        """Process an image with the processor for a known document type"""
+        processor = self.processors.get(doc_type)
+        if processor is None:
+            raise ValueError(f"Unsupported document type: {doc_type}")
+
+        result = processor.process_image(image_source)
+        # The log card processor also returns the raw generated text
+        if isinstance(result, tuple):
+            result = result[0]
+        return result
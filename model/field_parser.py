@@ -0,0 +1,144 @@
+import re
+import logging
+from difflib import SequenceMatcher
+from typing import Callable, Dict, Iterable, List, Optional
+
+from .validators import is_missing
+
+logger = logging.getLogger(__name__)
+
+LABEL_PATTERN = re.compile(r'^([^:]+?)\s*:\s*(.*)$')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+class FieldParser:
+    """Incremental parser for "Field: value" model output.
+
+    Text can be fed in arbitrary chunks, e.g. from a streamer during
+    generation; each line is handled once as soon as it is complete. Labels
+    resolve through a lookup table (exact, alias, then optional fuzzy match,
+    cached per label) and values go through a per-field transform table.
+    `on_field(field, value)` fires as each field is finalised.
+    """
+
+    def __init__(self, fields: List[str], aliases: Optional[Dict[str, str]] = None,
+                 transforms: Optional[Dict[str, Callable[[str], str]]] = None,
+                 fuzzy_threshold: Optional[float] = None, continuation: bool = False,
+                 skip_markers: Iterable[str] = (),
+                 on_field: Optional[Callable[[str, str], None]] = None):
+        self.fields = fields
+        self._lookup = {field.lower(): field for field in fields}
+        for alias, field in (aliases or {}).items():
+            self._lookup[alias.lower()] = field
+        self._transforms = transforms or {}
+        self._fuzzy_threshold = fuzzy_threshold
+        # Log card values may wrap onto following lines without a label
+        self._continuation = continuation
+        self._skip_markers = tuple(skip_markers)
+        self._on_field = on_field
+        self._buffer = ''
+        self._current = None
+        self._current_parts: List[str] = []
+        self.values: Dict[str, str] = {}
+        # Fields whose label has appeared, with or without a value yet
+        self.seen = set()
+        # Set when a label shows up twice, i.e. the model started over
+        self.repeated = False
+        self.streamed = False
+        self.finished = False
+
+    def _resolve(self, label: str) -> Optional[str]:
+        key = label.strip().lower()
+        field = self._lookup.get(key)
+        if field is not None or self._fuzzy_threshold is None:
+            return field
+
+        # Fuzzy match unknown labels once, then remember the answer
+        best_match = None
+        best_ratio = 0
+        for candidate in self.fields:
+            ratio = SequenceMatcher(None, key, candidate.lower()).ratio()
+            if ratio > best_ratio and ratio > self._fuzzy_threshold:
+                best_ratio = ratio
+                best_match = candidate
+        self._lookup[key] = best_match
+        return best_match
+
+    def _emit(self, field: str, value: str):
+        transform = self._transforms.get(field)
+        if transform is not None and not is_missing(value):
+            try:
+                value = transform(value)
+            except Exception as e:
+                logger.warning(f"Could not transform {field} value {value!r}: {str(e)}")
+        self.values[field] = value
+        if self._on_field is not None:
+            self._on_field(field, value)
+
+    def _close_current(self):
+        if self._current is not None:
+            if self._current_parts:
+                self._emit(self._current, ' '.join(self._current_parts).strip())
+            self._current = None
+            self._current_parts = []
+
+    def _consume_line(self, line: str):
+        line = line.strip()
+        if not line or (self._skip_markers and any(marker in line for marker in self._skip_markers)):
+            return
+
+        match = LABEL_PATTERN.match(line)
+        if match:
+            field = self._resolve(match.group(1))
+            if field is not None:
+                if field in self.seen:
+                    self.repeated = True
+                self.seen.add(field)
+            if self._continuation:
+                self._close_current()
+                if field is not None:
+                    self._current = field
+                    value = match.group(2).strip()
+                    self._current_parts = [value] if value else []
+            elif field is not None:
+                self._emit(field, match.group(2).strip())
+        elif self._current is not None:
+            self._current_parts.append(line)
+
+    def feed(self, text: str) -> None:
+        """Consume a chunk of generated text"""
+        self._buffer += text
+        while '\n' in self._buffer:
+            line, self._buffer = self._buffer.split('\n', 1)
+            self._consume_line(line)
+
+    def finish(self) -> Dict[str, str]:
+        """Flush the last line and return the parsed values"""
+        if not self.finished:
+            if self._buffer:
+                self._consume_line(self._buffer)
+                self._buffer = ''
+            self._close_current()
+            self.finished = True
+        return self.values
+
+    @property
+    def complete(self) -> bool:
+        """True once every field has been seen"""
+        return self.has_seen(self.fields)
+
+    def has_seen(self, fields: Iterable[str]) -> bool:
+        return all(field in self.seen for field in fields)
+
+    def has_values(self, fields: Iterable[str]) -> bool:
+        """True once every field has a finalised, non-empty value.
+
+        With continuation, a field stays open until the next label arrives,
+        as its value may still wrap onto following lines.
+        """
+        return all(self.values.get(field, '').strip() for field in fields)
+
+
+def clean_value(value: str) -> str:
+    """Drop quotes and collapse whitespace"""
+    return WHITESPACE_PATTERN.sub(' ', value.replace('"', '')).strip()
@@ -0,0 +1,228 @@
+import os
+import sys
+import time
+import logging
+import itertools
+import threading
+from contextlib import contextmanager
+from typing import Optional
+
+from .memory_stats import get_process_memory, format_bytes
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+MEGABYTE = 1024 * 1024
+
+INFERENCE_ACTIVE = metrics.registry.gauge(
+    'gobingo_inference_active',
+    'Model generate calls currently running'
+)
+INFERENCE_QUEUED = metrics.registry.gauge(
+    'gobingo_inference_queued',
+    'Model generate calls waiting for a free slot'
+)
+INFERENCE_QUEUE_SECONDS = metrics.registry.histogram(
+    'gobingo_inference_queue_wait_seconds',
+    'Time generate calls waited for a slot'
+)
+INFERENCE_SHED = metrics.registry.counter(
+    'gobingo_inference_shed_total',
+    'Generate calls rejected instead of run, by reason'
+)
+
+
+class InferenceBusyError(RuntimeError):
+    """Raised when a generate call can't get a slot within the queue timeout"""
+
+
+# Request priorities, most urgent first. Uploads that finish an applicant's
+# set go ahead of ones that start a new applicant.
+PRIORITY_COMMAND = 0
+PRIORITY_COMPLETING = 1
+PRIORITY_CONTINUING = 2
+PRIORITY_NEW = 3
+# Work nobody is waiting on, e.g. shadow evaluation
+PRIORITY_BACKGROUND = 4
+PRIORITY_NAMES = {
+    PRIORITY_COMMAND: 'command',
+    PRIORITY_COMPLETING: 'completing',
+    PRIORITY_CONTINUING: 'continuing',
+    PRIORITY_NEW: 'new',
+    PRIORITY_BACKGROUND: 'background'
+}
+
+_request = threading.local()
+
+
+@contextmanager
+def request_priority(priority: int):
+    """Generate calls made by this thread inside the block queue at `priority`"""
+    previous = getattr(_request, 'priority', None)
+    _request.priority = priority
+    try:
+        yield
+    finally:
+        _request.priority = previous
+
+
+def current_priority() -> int:
+    priority = getattr(_request, 'priority', None)
+    return PRIORITY_CONTINUING if priority is None else priority
+
+
+class InferenceResources:
+    """Thread and memory budget for model inference in this process.
+
+    Torch's intra-op pool defaults to one thread per core, so concurrent
+    requests each trying to use every core oversubscribe the CPU. Instead a
+    fixed number of generate calls run at once, each with its share of the
+    cores; the rest queue. A call is also held back while RSS (or CUDA memory)
+    plus its expected footprint would exceed the memory ceiling, and rejected
+    if no slot frees up within the queue timeout.
+
+    Queued calls are admitted by priority (see request_priority) rather than
+    in arrival order. Every INFERENCE_PRIORITY_AGING_SECONDS spent waiting
+    counts as one level more urgent, so new applicants still get through
+    when the bot is busy with applicants who are almost done.
+    INFERENCE_PRIORITY=false admits strictly first come, first served.
+    """
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self):
+        cores = os.cpu_count() or 1
+        self.concurrency = max(1, int(os.getenv('INFERENCE_CONCURRENCY', str(max(1, cores // 4)))))
+        self.intra_op_threads = max(1, int(os.getenv('INFERENCE_THREADS', str(max(1, cores // self.concurrency)))))
+        self.inter_op_threads = max(1, int(os.getenv('INFERENCE_INTEROP_THREADS', '1')))
+        limit_mb = os.getenv('INFERENCE_MEMORY_LIMIT_MB')
+        self.memory_limit = int(float(limit_mb) * MEGABYTE) if limit_mb else None
+        self.memory_per_call = int(float(os.getenv('INFERENCE_MEMORY_PER_CALL_MB', '512')) * MEGABYTE)
+        self.queue_timeout = float(os.getenv('INFERENCE_QUEUE_TIMEOUT', '60'))
+        self.prioritise = os.getenv('INFERENCE_PRIORITY', 'true').lower() == 'true'
+        self.aging_seconds = float(os.getenv('INFERENCE_PRIORITY_AGING_SECONDS', '10'))
+        self._condition = threading.Condition()
+        # Waiting calls as ticket -> admission rank
+        self._waiting = {}
+        self._tickets = itertools.count()
+        self._active = 0
+        self._queued = 0
+        self._configured = False
+
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    def configure_torch(self):
+        """Apply thread and allocator settings; call before the model is loaded"""
+        if self._configured:
+            return
+        self._configured = True
+        # Imported here so front ends that only read the queue state don't load torch
+        import torch
+
+        # Tokenizers spawn their own thread pool; the generate slots already
+        # parallelise across requests
+        os.environ.setdefault('TOKENIZERS_PARALLELISM', 'false')
+        # Return freed blocks to the driver instead of fragmenting the cache
+        os.environ.setdefault('PYTORCH_CUDA_ALLOC_CONF', 'expandable_segments:True')
+
+        torch.set_num_threads(self.intra_op_threads)
+        try:
+            torch.set_num_interop_threads(self.inter_op_threads)
+        except RuntimeError as e:
+            # Only allowed before any inter-op work has started
+            logger.warning(f"Could not set inter-op threads: {str(e)}")
+
+        logger.info(
+            f"Inference budget: {self.concurrency} concurrent generate calls x "
+            f"{self.intra_op_threads} threads (inter-op {self.inter_op_threads}), memory limit "
+            f"{format_bytes(self.memory_limit) if self.memory_limit else 'none'}"
+        )
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    @property
+    def queued(self) -> int:
+        return self._queued
+
+    def memory_in_use(self) -> int:
+        # Without torch loaded there is no model, so nothing on the GPU either
+        torch = sys.modules.get('torch')
+        if torch is not None and torch.cuda.is_available():
+            return torch.cuda.memory_allocated()
+        return get_process_memory()['rss']
+
+    def _has_memory(self) -> bool:
+        if self.memory_limit is None:
+            return True
+        return self.memory_in_use() + self.memory_per_call <= self.memory_limit
+
+    def _rank(self, priority: int, ticket: int):
+        """Admission order for a queued call.
+
+        Aging moves every waiter up at the same rate, so waiting
+        `aging_seconds` longer is worth exactly one priority level and the
+        order can be fixed when the call is queued.
+        """
+        if not self.prioritise:
+            return (0.0, ticket)
+        return (priority * self.aging_seconds + time.monotonic(), ticket)
+
+    def _is_next(self, ticket: int) -> bool:
+        return min(self._waiting.values()) == self._waiting[ticket]
+
+    def _can_run(self, ticket: int) -> bool:
+        if self._active >= self.concurrency or not self._is_next(ticket):
+            return False
+        # With nothing running there is nothing to wait for; let it through
+        return self._active == 0 or self._has_memory()
+
+    @contextmanager
+    def slot(self, doc_type: str = "document", timeout: Optional[float] = None, priority: Optional[int] = None):
+        """Hold one of the generate slots for the duration of the block"""
+        timeout = self.queue_timeout if timeout is None else timeout
+        priority = current_priority() if priority is None else priority
+        priority_name = PRIORITY_NAMES.get(priority, str(priority))
+        start = time.perf_counter()
+        with self._condition:
+            ticket = next(self._tickets)
+            self._waiting[ticket] = self._rank(priority, ticket)
+            self._queued += 1
+            INFERENCE_QUEUED.set(self._queued)
+            try:
+                admitted = self._condition.wait_for(lambda: self._can_run(ticket), timeout=timeout)
+            finally:
+                del self._waiting[ticket]
+                self._queued -= 1
+                INFERENCE_QUEUED.set(self._queued)
+                if self._waiting:
+                    # The head of the queue may have changed
+                    self._condition.notify_all()
+
+            waited = time.perf_counter() - start
+            if not admitted:
+                reason = 'memory' if self._active < self.concurrency else 'concurrency'
+                INFERENCE_SHED.inc(doc_type=doc_type, reason=reason)
+                raise InferenceBusyError(
+                    f"No inference slot for {doc_type} after {waited:.1f}s ({reason} limit reached)"
+                )
+
+            self._active += 1
+            INFERENCE_ACTIVE.set(self._active)
+        INFERENCE_QUEUE_SECONDS.observe(waited, doc_type=doc_type, priority=priority_name)
+
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._active -= 1
+                INFERENCE_ACTIVE.set(self._active)
+                self._condition.notify_all()
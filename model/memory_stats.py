@@ -0,0 +1,39 @@
+import os
+import resource
+import logging
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def get_process_memory() -> Dict[str, int]:
+    """Return RSS, shared and peak memory of the current process in bytes.
+
+    Shared memory covers file-backed pages such as memory-mapped weights,
+    so `rss - shared` approximates what each worker costs on its own.
+    """
+    stats = {'rss': 0, 'shared': 0, 'private': 0, 'peak_rss': 0}
+    try:
+        with open('/proc/self/statm') as f:
+            fields = f.read().split()
+        stats['rss'] = int(fields[1]) * _PAGE_SIZE
+        stats['shared'] = int(fields[2]) * _PAGE_SIZE
+        stats['private'] = stats['rss'] - stats['shared']
+    except (OSError, IndexError, ValueError):
+        # Not on Linux, only the peak is available
+        pass
+
+    try:
+        # ru_maxrss is reported in kilobytes on Linux
+        stats['peak_rss'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except Exception as e:
+        logger.debug(f"Could not read peak RSS: {str(e)}")
+
+    return stats
+
+
+def format_bytes(num_bytes: int) -> str:
+    """Format a byte count for log output"""
+    return f"{num_bytes / (1024 * 1024):.1f} MiB"
@@ -1,15 +1,16 @@
 import logging
 from typing import Tuple
 from .document_processor import DocumentProcessorFactory, DocumentProcessorError
+from .document_image import ImageSource
 
 logger = logging.getLogger(__name__)
 
-def process_document(image_path: str, document_type: str = 'id_card') -> Tuple[str, str]:
+def process_document(image: ImageSource, document_type: str = 'id_card') -> Tuple[str, str]:
     """
     Process a document image and extract text using OCR and VLM.
     
     Args:
-        image_path (str): Path to the image file
+        image: Path to the image file, or the downloaded image bytes
         document_type (str): Type of document ('id_card', 'license', or 'log_card')
         
     Returns:
@@ -17,14 +18,18 @@ def process_document(image_path: str, document_type: str = 'id_card') -> Tuple[s
         
     Raises:
         DocumentProcessorError: If document type is not supported or processing fails
-        ValueError: If image_path is invalid
+        ValueError: If image is empty
     """
     try:
-        if not image_path:
-            raise ValueError("Image path cannot be empty")
+        if not image:
+            raise ValueError("Image cannot be empty")
             
         processor = DocumentProcessorFactory.get_processor(document_type)
-        return processor.process_image(image_path)
+        result = processor.process_image(image)
+        # Only the log card processor returns the raw text separately
+        if isinstance(result, tuple):
+            return result
+        return result, result
         
     except DocumentProcessorError as e:
         logger.error(f"Document processor error: {str(e)}")
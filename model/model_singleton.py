@@ -1,15 +1,45 @@
 from transformers import AutoProcessor, AutoModelForVision2Seq
+from PIL import Image
 import torch
 import logging
+import os
+import time
+from typing import Dict, Optional
+
+from .weight_loader import load_model_mmap, WeightLoadError
+from .stub_backend import create_stub_backend
+from .memory_stats import get_process_memory, format_bytes
+from .inference_resources import InferenceResources
 
 logger = logging.getLogger(__name__)
 
+MODEL_ID = os.getenv('MODEL_ID', "HuggingFaceTB/SmolVLM-Instruct")
+
+# MODEL_DTYPE values; 'auto' keeps the checkpoint's dtype, on either load path
+MODEL_DTYPES = {
+    'auto': None,
+    'float32': torch.float32,
+    'float16': torch.float16,
+    'bfloat16': torch.bfloat16
+}
+
+# Prompt environment variables used by each document processor
+WARMUP_PROMPTS = {
+    'id_card': 'ID_CARD_PROMPT',
+    'drivers_license': 'LICENSE_PROMPT',
+    'log_card': 'LOG_CARD_PROMPT'
+}
+
 class ModelSingleton:
     _instance = None
     _initialized = False
     _model = None
     _processor = None
     _device = None
+    _backend = None
+    _load_seconds = None
+    _warmup_seconds = None
+    _weights = None
 
     def __new__(cls):
         if cls._instance is None:
@@ -25,31 +55,132 @@ class ModelSingleton:
         """Load the model once and cache it"""
         try:
             logger.info("Loading AI model...")
+            start = time.perf_counter()
+            # Thread counts must be set before torch starts its pools
+            InferenceResources.get_instance().configure_torch()
+            self._backend = os.getenv('MODEL_BACKEND', 'transformers').lower()
+            if self._backend == 'stub':
+                # Canned outputs for load tests; no weights are downloaded
+                stub = create_stub_backend()
+                self._device = "cpu"
+                self._processor = stub['processor']
+                self._model = stub['model']
+                self._load_seconds = time.perf_counter() - start
+                return
+
             self._device = "cuda" if torch.cuda.is_available() else "cpu"
             logger.info(f"Using device: {self._device}")
 
             # Load processor and model only if not already loaded
             if self._processor is None:
                 self._processor = AutoProcessor.from_pretrained(
-                    "HuggingFaceTB/SmolVLM-Instruct",
+                    MODEL_ID,
                     trust_remote_code=True
                 )
                 logger.info("Processor loaded successfully")
 
             if self._model is None:
-                self._model = AutoModelForVision2Seq.from_pretrained(
-                    "HuggingFaceTB/SmolVLM-Instruct",
-                    trust_remote_code=True
-                )
+                self._model = self._load_weights()
                 self._model.to(self._device)
                 self._model.eval()  # Set to evaluation mode
                 logger.info("Model loaded successfully")
 
+            self._load_seconds = time.perf_counter() - start
+            memory = get_process_memory()
+            logger.info(
+                f"Model load took {self._load_seconds:.2f}s "
+                f"(rss={format_bytes(memory['rss'])}, shared={format_bytes(memory['shared'])}, "
+                f"private={format_bytes(memory['private'])})"
+            )
+
         except Exception as e:
             self._initialized = False  # Reset initialization flag on failure
             logger.error(f"Failed to load model: {str(e)}")
             raise
 
+    def _load_weights(self):
+        """Load weights memory-mapped when possible, falling back to from_pretrained.
+
+        Both paths load in MODEL_DTYPE, so outputs and latency don't depend on
+        which one ran.
+        """
+        dtype_name = os.getenv('MODEL_DTYPE', 'auto').lower()
+        if dtype_name not in MODEL_DTYPES:
+            raise ValueError(f"MODEL_DTYPE must be one of {', '.join(MODEL_DTYPES)}, not {dtype_name}")
+        dtype = MODEL_DTYPES[dtype_name]
+
+        # Mapped weights only help on CPU; moving to CUDA copies them anyway
+        use_mmap = os.getenv('MODEL_MMAP_WEIGHTS', 'true').lower() == 'true'
+        if use_mmap and self._device == "cpu":
+            try:
+                model = load_model_mmap(MODEL_ID, AutoModelForVision2Seq, torch_dtype=dtype, trust_remote_code=True)
+                self._weights = 'mmap'
+                return model
+            except (WeightLoadError, OSError) as e:
+                logger.warning(f"Memory-mapped load failed, using from_pretrained: {str(e)}")
+
+        self._weights = 'from_pretrained'
+        return AutoModelForVision2Seq.from_pretrained(
+            MODEL_ID,
+            torch_dtype=dtype or 'auto',
+            trust_remote_code=True
+        )
+
+    def warm_up(self, prompts: Optional[Dict[str, str]] = None, max_new_tokens: int = 8):
+        """Run one short synthetic generation per document type.
+
+        The first generate call initialises kernels and caches lazily; doing it
+        at startup keeps that cost off the first real request.
+        """
+        if prompts is None:
+            prompts = {
+                doc_type: os.getenv(env_var)
+                for doc_type, env_var in WARMUP_PROMPTS.items()
+                if os.getenv(env_var)
+            }
+
+        start = time.perf_counter()
+        # Large enough to exercise the processor's image splitting
+        image = Image.new('RGB', (1024, 768), 'white')
+        for doc_type, prompt in prompts.items():
+            try:
+                doc_start = time.perf_counter()
+                inputs = self._processor(
+                    text=[prompt],
+                    images=[image],
+                    return_tensors="pt",
+                    padding=True
+                ).to(self._device)
+                with torch.no_grad():
+                    self._model.generate(**inputs, max_new_tokens=max_new_tokens, do_sample=False)
+                logger.info(f"Warm-up for {doc_type} took {time.perf_counter() - doc_start:.2f}s")
+            except Exception as e:
+                logger.warning(f"Warm-up for {doc_type} failed: {str(e)}")
+
+        image.close()
+        self._warmup_seconds = time.perf_counter() - start
+        memory = get_process_memory()
+        logger.info(
+            f"Model warm-up took {self._warmup_seconds:.2f}s "
+            f"(rss={format_bytes(memory['rss'])}, shared={format_bytes(memory['shared'])}, "
+            f"private={format_bytes(memory['private'])})"
+        )
+
+    def load_report(self) -> Dict:
+        """Load/warm-up timings and current memory usage, for sizing hosts"""
+        dtype = getattr(self._model, 'dtype', None)
+        report = {
+            'pid': os.getpid(),
+            'backend': self._backend,
+            'device': self._device,
+            'weights': self._weights,
+            'dtype': str(dtype) if dtype is not None else None,
+            'load_seconds': self._load_seconds,
+            'warmup_seconds': self._warmup_seconds
+        }
+        report.update(get_process_memory())
+        return report
+
     @property
     def model(self):
         return self._model
@@ -62,6 +193,10 @@ class ModelSingleton:
     def device(self):
         return self._device
 
+    @property
+    def backend(self):
+        return self._backend
+
     @classmethod
     def get_instance(cls):
         if cls._instance is None:
@@ -80,4 +215,3 @@ class ModelSingleton:
         # Set model to evaluation mode
         if self._model is not None:
             self._model.eval()
-  
\ No newline at end of file
@@ -0,0 +1,31 @@
+import os
+import logging
+from typing import Optional
+
+try:
+    import pytesseract
+except ImportError:
+    pytesseract = None
+
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+OCR_CONFIG = os.getenv('OCR_CONFIG', '--psm 6')
+
+
+def is_available() -> bool:
+    return pytesseract is not None
+
+
+def image_to_text(image, doc_type: str = "document") -> Optional[str]:
+    """Tesseract's text for an image, or None if OCR isn't installed or fails"""
+    if pytesseract is None:
+        return None
+    try:
+        with metrics.span('ocr', doc_type=doc_type):
+            return pytesseract.image_to_string(image.convert('L'), config=OCR_CONFIG)
+    except Exception as e:
+        # Raised when the tesseract binary is missing, among others
+        logger.warning(f"OCR failed for {doc_type}: {str(e)}")
+        return None
@@ -1,36 +1,490 @@
 from abc import ABC, abstractmethod
-from transformers import VisionEncoderDecoderModel, AutoTokenizer, AutoImageProcessor
 from PIL import Image
-import io
+from transformers import TextStreamer, StoppingCriteriaList
+import torch
+import os
+import logging
+import threading
+from contextlib import contextmanager, nullcontext
+from typing import Dict, List, Optional, Tuple
+
+from ..model_singleton import ModelSingleton
+from ..resolution_policy import ResolutionPolicy, RESOLUTION_PROFILES
+from ..field_parser import FieldParser
+from ..stopping_criteria import FieldStoppingCriteria, EARLY_STOPS
+from ..inference_resources import InferenceResources
+from ..degradation import get_controller, GREEDY_MAX_NEW_TOKENS, TIERS
+from .. import ocr
+from ..document_image import DocumentImage
+from ..records import DocumentRecord, record_type
+from ..validators import (
+    ValidationEngine, ValidationResult, get_validation_engine, parse_formatted_text, is_missing
+)
+from services import metrics
+from services.resilience import get_dependency
+
+logger = logging.getLogger(__name__)
+
+# Short prompt for the second pass that re-asks only for missing fields
+TARGETED_PROMPT_TEMPLATE = os.getenv(
+    'TARGETED_PROMPT_TEMPLATE',
+    "<image>Extract only the following fields from this {document}. "
+    "Answer one per line as 'Field: value', or 'Field: Not found'.\n{fields}"
+)
+# Generation budget per re-requested field in the targeted pass
+TARGETED_TOKENS_PER_FIELD = 16
+
+FIELD_RETRIES = metrics.registry.counter(
+    'gobingo_field_retries_total',
+    'Fields re-requested in the targeted second pass, by outcome'
+)
+VALIDATION_DECISIONS = metrics.registry.counter(
+    'gobingo_validation_decisions_total',
+    'Validation outcomes of extractions: accept, retry or fallback'
+)
+OCR_ATTEMPTS = metrics.registry.counter(
+    'gobingo_ocr_attempts_total',
+    'OCR-first extractions under load, by whether the model was still needed'
+)
+
+
+class FieldStreamer(TextStreamer):
+    """Feeds newly generated text to a FieldParser while generate() runs"""
+
+    def __init__(self, tokenizer, parser: FieldParser):
+        super().__init__(tokenizer, skip_prompt=True, skip_special_tokens=True)
+        self.parser = parser
+        parser.streamed = True
+
+    def on_finalized_text(self, text: str, stream_end: bool = False):
+        self.parser.feed(text)
+        if stream_end:
+            self.parser.finish()
+
 
 class BaseDocumentProcessor(ABC):
+    doc_type = "document"
+    # All fields the formatter emits, in output order
+    fields: List[str] = []
+    # Fields that must be present for an extraction to be accepted
+    required_fields: List[str] = []
+    # Fields often legitimately blank, not worth a second pass
+    optional_fields: List[str] = []
+    # Optional crop boxes per field as (left, top, right, bottom) fractions
+    field_regions: Dict[str, Tuple[float, float, float, float]] = {}
+    document_label = "document"
+
     def __init__(self):
-        # Initialize the AI models
-        self.model = VisionEncoderDecoderModel.from_pretrained("google/siglip-base-patch16-224")
-        self.tokenizer = AutoTokenizer.from_pretrained("google/siglip-base-patch16-224")
-        self.image_processor = AutoImageProcessor.from_pretrained("google/siglip-base-patch16-224")
+        # Share the cached SmolVLM model across all processors. It is looked up
+        # on first use so text-only paths (e.g. format_text) don't load weights.
+        self._model_singleton = None
+        self.resolution_policy = ResolutionPolicy()
+        self.progressive = os.getenv('PROGRESSIVE_EXTRACTION', 'true').lower() == 'true'
+        self.early_stop = os.getenv('EARLY_STOP', 'true').lower() == 'true'
+        self.validation_engine = get_validation_engine(self.doc_type, self.required_fields)
+        # Images opened by verify_image, per request thread, until cleanup()
+        self._open_images = threading.local()
+        # Per request thread: whether extraction stops after the first size
+        # (see first_pass_only) and where that pass left off
+        self._passes = threading.local()
+        # Decoding settings applied over each call's own, e.g. for a shadow config
+        self.generate_overrides: Dict = {}
+        # Shadow instances wait at most `slot_timeout` for an inference slot
+        # and stay out of the model's circuit breaker
+        self.shadow = False
+        self.slot_timeout: Optional[float] = None
+
+    @property
+    def model_singleton(self):
+        if self._model_singleton is None:
+            self._model_singleton = ModelSingleton.get_instance()
+        return self._model_singleton
+
+    @property
+    def model(self):
+        return self.model_singleton.model
+
+    @property
+    def processor(self):
+        return self.model_singleton.processor
+
+    @property
+    def device(self):
+        return self.model_singleton.device
+
+    def create_parser(self, on_field=None) -> FieldParser:
+        """Parser for this document's "Field: value" output"""
+        return FieldParser(self.fields, on_field=on_field)
+
+    def render_fields(self, values: Dict[str, str]) -> str:
+        """Format parsed values as the processor's text output"""
+        return "\n".join(
+            f"{field}: {'-' if is_missing(values.get(field)) else values[field]}"
+            for field in self.fields
+        )
+
+    def finish_parser(self, parser: FieldParser, generated_text: str) -> Dict[str, str]:
+        """Parsed values, feeding the decoded text if nothing was streamed"""
+        if not parser.streamed:
+            parser.feed(generated_text)
+        return parser.finish()
+
+    def generate_text(self, image, doc_type, prompt: Optional[str] = None,
+                      parser: Optional[FieldParser] = None,
+                      expected_fields: Optional[List[str]] = None, **generate_kwargs):
+        """Run the prompt and image through SmolVLM and decode the first output.
+
+        Each step is timed as its own pipeline stage. With a `parser`, fields
+        are parsed from the token stream as they are generated; streaming
+        isn't supported with beam search, so beam runs are parsed after
+        decoding instead (see finish_parser). Unless EARLY_STOP is off,
+        generation ends once all `expected_fields` (default: every field)
+        have a value or the output starts repeating.
+        """
+        if not self.shadow and get_controller().current().greedy:
+            # Under load: greedy decoding with a shorter budget instead of beam search
+            for setting in ('temperature', 'length_penalty'):
+                generate_kwargs.pop(setting, None)
+            generate_kwargs.update(
+                num_beams=1,
+                do_sample=False,
+                max_new_tokens=min(generate_kwargs.get('max_new_tokens', GREEDY_MAX_NEW_TOKENS), GREEDY_MAX_NEW_TOKENS)
+            )
+        generate_kwargs.update(self.generate_overrides)
+        if parser is not None and generate_kwargs.get('num_beams', 1) == 1:
+            generate_kwargs['streamer'] = FieldStreamer(getattr(self.processor, 'tokenizer', None), parser)
+
+        image_label = metrics.image_size_label(image.size)
+        with metrics.span('processor_inputs', doc_type=doc_type, image_size=image_label) as stage:
+            inputs = self.processor(
+                text=[prompt or self.prompt],
+                images=[image],
+                return_tensors="pt",
+                padding=True
+            ).to(self.device)
+            prompt_tokens = inputs['input_ids'].shape[-1]
+            stage.set(prompt_tokens=metrics.token_count_label(prompt_tokens))
+        metrics.observe_prompt_tokens(prompt_tokens, doc_type=doc_type)
+
+        stopping = None
+        if self.early_stop and (expected_fields or self.fields):
+            stopping = FieldStoppingCriteria(
+                getattr(self.processor, 'tokenizer', None),
+                self.create_parser,
+                expected_fields or self.fields,
+                prompt_tokens
+            )
+            criteria = StoppingCriteriaList(generate_kwargs.get('stopping_criteria') or [])
+            criteria.append(stopping)
+            generate_kwargs['stopping_criteria'] = criteria
+
+        # Queue for a slot so concurrent requests don't oversubscribe cores or
+        # memory; the circuit breaker inside only sees calls that actually ran
+        breaker = nullcontext() if self.shadow else get_dependency('model').call()
+        with InferenceResources.get_instance().slot(doc_type, self.slot_timeout), breaker, \
+                metrics.span('generate', doc_type=doc_type, image_size=image_label) as stage:
+            with torch.no_grad():
+                output_ids = self.model.generate(**inputs, **generate_kwargs)
+            generated_tokens = output_ids.shape[-1] - prompt_tokens
+            stage.set(
+                prompt_tokens=metrics.token_count_label(prompt_tokens),
+                generated_tokens=metrics.token_count_label(generated_tokens)
+            )
+        metrics.observe_tokens(generated_tokens, doc_type=doc_type)
+        if stopping is not None and stopping.reason:
+            EARLY_STOPS.inc(doc_type=doc_type, reason=stopping.reason)
+
+        with metrics.span('decode', doc_type=doc_type):
+            return self.processor.batch_decode(output_ids, skip_special_tokens=True)[0]
+
+    def validate_fields(self, extraction) -> ValidationResult:
+        """Run the shared field rules over a formatted extraction or a record"""
+        if not isinstance(extraction, DocumentRecord):
+            extraction = parse_formatted_text(extraction)
+        result = self.validation_engine.validate(
+            extraction,
+            self.fields,
+            self.optional_fields
+        )
+        VALIDATION_DECISIONS.inc(doc_type=self.doc_type, decision=result.decision)
+        if result.invalid:
+            logger.info(f"Invalid {self.doc_type} fields: {result.invalid}")
+        return result
+
+    def validate(self, extracted_text):
+        """Validate the extracted text for specific document type"""
+        return self.validate_fields(extracted_text).accepted
+
+    def missing_fields(self, validation: ValidationResult) -> List[str]:
+        """Required fields that are absent or fail their rule"""
+        return [
+            field for field in self.required_fields
+            if field in validation.missing or field in validation.invalid
+        ]
+
+    def _crop_for_fields(self, image, fields: List[str]):
+        """Crop to the union of the fields' regions, or None if any is unknown"""
+        if not fields or any(field not in self.field_regions for field in fields):
+            return None
+        boxes = [self.field_regions[field] for field in fields]
+        width, height = image.size
+        return image.crop((
+            int(min(box[0] for box in boxes) * width),
+            int(min(box[1] for box in boxes) * height),
+            int(max(box[2] for box in boxes) * width),
+            int(max(box[3] for box in boxes) * height)
+        ))
+
+    def extract_missing_fields(self, image, doc_type: str, formatted_text: str, fields: List[str]) -> str:
+        """Re-request only missing or invalid fields and merge them into the first pass.
+
+        The targeted pass uses a short prompt and greedy decoding with a token
+        budget proportional to the number of fields, instead of a full retry.
+        """
+        if not fields:
+            return formatted_text
+
+        prompt = TARGETED_PROMPT_TEMPLATE.format(document=self.document_label, fields="\n".join(fields))
+        cropped = self._crop_for_fields(image, fields)
+        parser = self.create_parser()
+        try:
+            with metrics.span('targeted_pass', doc_type=doc_type):
+                raw_text = self.generate_text(
+                    cropped or image,
+                    doc_type,
+                    prompt=prompt,
+                    parser=parser,
+                    expected_fields=fields,
+                    max_new_tokens=TARGETED_TOKENS_PER_FIELD * len(fields) + 8,
+                    num_beams=1,
+                    do_sample=False
+                )
+        except Exception as e:
+            logger.warning(f"Targeted pass for {doc_type} failed: {str(e)}")
+            return formatted_text
+        finally:
+            if cropped is not None:
+                cropped.close()
+
+        merged = parse_formatted_text(formatted_text)
+        second_pass = self.finish_parser(parser, raw_text)
+        recovered_count = 0
+        for field in fields:
+            value = second_pass.get(field, '')
+            # Only take values that pass the same rules as the first pass
+            recovered = not is_missing(value) and \
+                not self.validation_engine.check_fields({field: value}, [field])
+            if recovered:
+                merged[field] = value
+                recovered_count += 1
+            FIELD_RETRIES.inc(doc_type=doc_type, field=field, outcome='recovered' if recovered else 'missing')
+
+        logger.info(f"Targeted pass recovered {recovered_count} of {len(fields)} fields")
+        return self.render_fields(merged)
+
+    def extract_with_ocr(self, image, doc_type: str) -> Optional[str]:
+        """Formatted fields read by Tesseract, or None unless they pass validation"""
+        if getattr(self._passes, 'ocr_shared', False):
+            text = self._passes.ocr_text
+        else:
+            text = ocr.image_to_text(image, doc_type)
+        if not text:
+            return None
+        parser = self.create_parser()
+        parser.feed(text)
+        result = self.render_fields(parser.finish())
+        missing = self.missing_fields(self.validate_fields(result))
+        OCR_ATTEMPTS.inc(doc_type=doc_type, outcome='fallback' if missing else 'accepted')
+        return None if missing else result
+
+    @contextmanager
+    def shared_ocr(self, text: Optional[str]):
+        """Parse `text`, already read by Tesseract from the same image, in the
+        OCR-first tier instead of running OCR again (None: OCR failed)"""
+        self._passes.ocr_shared = True
+        self._passes.ocr_text = text
+        try:
+            yield
+        finally:
+            self._passes.ocr_shared = False
+            self._passes.ocr_text = None
+
+    @contextmanager
+    def first_pass_only(self):
+        """Extract at the starting size only while the document type is unknown.
+
+        Within the block, extract_with_resolution neither escalates nor runs
+        the targeted pass unless every required field was read, since missing
+        fields on another document's image say nothing about legibility.
+        escalate() picks up from the size this pass stopped at.
+        """
+        self._passes.first_only = True
+        self._passes.last = None
+        try:
+            yield
+        finally:
+            self._passes.first_only = False
+
+    @contextmanager
+    def escalate(self):
+        """Continue a first_pass_only() extraction from the next size up, once
+        this document has been picked as the likeliest type"""
+        self._passes.resume = getattr(self._passes, 'last', None)
+        try:
+            yield
+        finally:
+            self._passes.resume = None
+            self._passes.last = None
+
+    def extract_with_resolution(self, image, doc_type, extract):
+        """Run `extract` on the smallest legible resize of `image`.
+
+        The validation decision drives what happens next: a few bad fields get
+        a targeted second pass on the same image, while required fields still
+        missing or invalid after that fall back to a full retry at the next
+        size up. Degraded tiers (see model.degradation) may try OCR first and
+        stay at the smallest size. See first_pass_only() for extraction while
+        the document type is still unknown.
+        """
+        first_only = getattr(self._passes, 'first_only', False)
+        resume = getattr(self._passes, 'resume', None)
+        tier = TIERS[0] if self.shadow else get_controller().current()
+        if resume is not None:
+            # The first pass already ran; go straight to the next size up
+            size, result = resume
+            size = None if tier.reduce_resolution else self.resolution_policy.next_size(image, doc_type, size)
+            if size is None:
+                return result
+        else:
+            if tier.ocr_first:
+                result = self.extract_with_ocr(image, doc_type)
+                if result is not None:
+                    return result
+            if tier.reduce_resolution:
+                size = self.resolution_policy.smallest_size(image, doc_type)
+            else:
+                size = self.resolution_policy.initial_size(image, doc_type)
+
+        while True:
+            with metrics.span('decode_resize', doc_type=doc_type, image_size=metrics.image_size_label((size,))):
+                resized = self.resolution_policy.resize(image, size)
+            try:
+                result = extract(resized)
+                with metrics.span('validate', doc_type=doc_type):
+                    validation = self.validate_fields(result)
+                recognised = not first_only or not self.missing_fields(validation)
+                if validation.decision == ValidationEngine.RETRY and self.progressive and recognised:
+                    result = self.extract_missing_fields(resized, doc_type, result, validation.retry_fields)
+                    validation = self.validate_fields(result)
+            finally:
+                if resized is not image:
+                    resized.close()
+
+            missing = self.missing_fields(validation)
+            if first_only:
+                self._passes.last = (size, result)
+            if not missing or tier.reduce_resolution or first_only:
+                return result
+
+            next_size = self.resolution_policy.next_size(image, doc_type, size)
+            if next_size is None:
+                return result
+            logger.info(f"Missing {missing} at {size}px, retrying at {next_size}px")
+            size = next_size
+
+    def verify_image(self, image_source) -> Optional[Image.Image]:
+        """Validate and decode a path, downloaded bytes or DocumentImage.
+
+        Nothing touches the disk and the header is checked before decoding.
+        An already decoded image (see DocumentProcessor) is used as it is.
+        Images decoded from a path or bytes stay owned by this processor
+        until cleanup(); a caller's DocumentImage or image is released by
+        the caller.
+        """
+        if isinstance(image_source, Image.Image):
+            return image_source
+
+        owned = not isinstance(image_source, DocumentImage)
+        document = DocumentImage(image_source) if owned else image_source
+        valid, message = document.validate()
+        if not valid:
+            logger.error(f"Image verification failed for {document}: {message}")
+            if owned:
+                document.close()
+            return None
+
+        # JPEGs only need decoding at the largest size the resolution policy tries
+        sizes = RESOLUTION_PROFILES.get(self.doc_type, {}).get('sizes')
+        try:
+            image = document.open(max(sizes) if sizes else None)
+        except Exception as e:
+            logger.error(f"Could not decode {document}: {str(e)}")
+            if owned:
+                document.close()
+            return None
+
+        if owned:
+            if not hasattr(self._open_images, 'documents'):
+                self._open_images.documents = []
+            self._open_images.documents.append(document)
+        return image
+
+    def cleanup(self):
+        """Release images opened by verify_image in this thread and cached GPU memory"""
+        for document in getattr(self._open_images, 'documents', []):
+            document.close()
+        self._open_images.documents = []
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    def process(self, image_data):
+        """Extract this document type from image bytes, a path, a DocumentImage
+        or a decoded image; the result says whether it matched"""
+        result = self.process_image(image_data)
+        # The log card processor also returns the raw generated text
+        if isinstance(result, tuple):
+            result = result[0]
+
+        # Parsed once here; the record is what the aggregator and Monday mapper see
+        record = record_type(self.doc_type).from_text(result)
+        validation = self.validate_fields(record)
+        missing = self.missing_fields(validation)
+        if missing:
+            return {
+                'success': False,
+                'doc_type': self.doc_type,
+                'missing': missing,
+                'error': f"Not a readable {self.document_label} (missing {', '.join(missing)})"
+            }
+        return {
+            'success': True,
+            'doc_type': self.doc_type,
+            'text': result,
+            'data': record
+        }
 
     def extract_text(self, image_data):
         """Extract text from image using smolVLM"""
         try:
-            image = Image.open(io.BytesIO(image_data))
-            inputs = self.image_processor(image, return_tensors="pt")
-            outputs = self.model.generate(
-                pixel_values=inputs.pixel_values,
-                max_length=50,
-                num_beams=5
-            )
-            return self.tokenizer.decode(outputs[0], skip_special_tokens=True)
+            with DocumentImage(image_data) as document:
+                image = document.open()
+                inputs = self.processor(
+                    text=[self.prompt],
+                    images=[image],
+                    return_tensors="pt"
+                ).to(self.device)
+                with torch.no_grad():
+                    outputs = self.model.generate(
+                        **inputs,
+                        max_new_tokens=50,
+                        num_beams=5
+                    )
+            return self.processor.batch_decode(outputs, skip_special_tokens=True)[0]
         except Exception as e:
-            print(f"Error extracting text: {str(e)}")
+            logger.debug(f"Error extracting text: {str(e)}")
             return None
 
     @abstractmethod
-    def validate(self, extracted_text):
-        """Validate the extracted text for specific document type"""
+    def process_image(self, image_source):
+        """Extract and format the document's fields from a path or image bytes"""
         pass
-
-    @abstractmethod
-    def process(self, image_data):
-        """Process the document"""
-        pass
\ No newline at end of file
@@ -1,10 +1,12 @@
-from base_processor import BaseDocumentProcessor
-from PIL import Image
-import torch
+from .base_processor import BaseDocumentProcessor
+from ..validators import is_missing
+from ..document_image import DocumentImage
+from ..records import DRIVERS_LICENSE_FIELDS
 from transformers import AutoProcessor, AutoModelForVision2Seq
 import os
 from datetime import datetime
 import logging
+from services import metrics
 from flask import Flask
 from dotenv import load_dotenv
 
@@ -13,6 +15,11 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class DriversLicenseProcessor(BaseDocumentProcessor):
+    doc_type = "drivers_license"
+    fields = list(DRIVERS_LICENSE_FIELDS)
+    required_fields = ["Name", "License Number"]
+    document_label = "driver's license"
+
     def __init__(self):
         super().__init__()
         self.prompt = os.getenv('LICENSE_PROMPT')
@@ -20,101 +27,68 @@ class DriversLicenseProcessor(BaseDocumentProcessor):
             logger.error("LICENSE_PROMPT environment variable is required but not set")
             raise ValueError("LICENSE_PROMPT environment variable is required")
 
-    def validate(self, extracted_text):
-        """Validate driver's license specific fields"""
-        text_lower = extracted_text.lower()
-        # Check for driver's license specific keywords and patterns
-        is_valid = (
-            ('driver' in text_lower or 'license' in text_lower) and
-            any(field in text_lower for field in self.required_fields)
-        )
-        return is_valid
-
-    def process_image(self, image_path):
+    def process_image(self, image_source):
         try:
-            logger.info(f"Processing driver's license image: {image_path}")
-            
-            original_image = self.verify_image(image_path)
-            if original_image is None:
-                return "Image verification failed", "Image verification failed"
+            logger.info(f"Processing driver's license image: {DocumentImage.describe(image_source)}")
             
-            logger.info(f"Image opened successfully: {original_image.size}")
+            with metrics.span('decode_resize', doc_type='drivers_license') as stage:
+                original_image = self.verify_image(image_source)
+                if original_image is None:
+                    return "Image verification failed"
+                
+                logger.info(f"Image opened successfully: {original_image.size}")
+                stage.set(image_size=metrics.image_size_label(original_image.size))
             
             try:
-                # Optimize image size if too large
-                max_size = 1024
-                if original_image.size[0] > max_size or original_image.size[1] > max_size:
-                    ratio = max_size / max(original_image.size)
-                    new_size = tuple([int(dim * ratio) for dim in original_image.size])
-                    original_image = original_image.resize(new_size, Image.Resampling.LANCZOS)
-                    logger.info(f"Resized image to: {original_image.size}")
-
-                logger.info("Preparing model inputs...")
-                inputs = self.processor(
-                    text=[self.prompt],
-                    images=[original_image],
-                    return_tensors="pt",
-                    padding=True
-                ).to(self.device)
-                
-                logger.info("Starting model inference...")
-                with torch.no_grad():
-                    output_ids = self.model.generate(
-                        **inputs,
-                        max_new_tokens=128,  # Reduced from 256
-                        num_beams=2,         # Reduced from 3
-                        temperature=0.3,
-                        do_sample=True,
-                        length_penalty=1.0,
-                        repetition_penalty=1.2
-                    )
-                    
-                    logger.info("Model inference completed, decoding output...")
-                    generated_text = self.processor.batch_decode(output_ids, skip_special_tokens=True)[0]
-                    logger.info(f"Raw generated text: {generated_text}")
-                    
-                    formatted_text = self.format_text(generated_text)
-                    logger.info(f"Formatted output: {formatted_text}")
-                    
-                    return formatted_text
+                # Start small and only go up in resolution if fields are missing
+                return self.extract_with_resolution(original_image, 'drivers_license', self._extract)
                 
             except Exception as e:
                 logger.error(f"Generation error: {str(e)}")
-                return "Text generation failed", "Text generation failed"
+                return "Text generation failed"
             finally:
                 # Clean up CUDA memory
                 self.cleanup()
                 
         except Exception as e:
             logger.error(f"General error: {str(e)}")
-            return "Image processing failed", "Image processing failed"
+            return "Image processing failed"
+
+    def _extract(self, image):
+        """Generate and format the license fields from a sized image"""
+        logger.info(f"Starting model inference at {image.size}...")
+        parser = self.create_parser()
+        generated_text = self.generate_text(
+            image,
+            'drivers_license',
+            parser=parser,
+            max_new_tokens=128,  # Reduced from 256
+            num_beams=2,         # Reduced from 3
+            temperature=0.3,
+            do_sample=True,
+            length_penalty=1.0,
+            repetition_penalty=1.2
+        )
+        logger.info(f"Raw generated text: {generated_text}")
+        
+        with metrics.span('format_text', doc_type='drivers_license'):
+            formatted_text = self.render_fields(self.finish_parser(parser, generated_text))
+        logger.info(f"Formatted output: {formatted_text}")
+        
+        return formatted_text
+
+    def render_fields(self, values) -> str:
+        return "\n".join(
+            f"{field}: {'Not found' if is_missing(values.get(field)) else values[field]}"
+            for field in self.fields
+        )
 
     def format_text(self, text: str) -> str:
         """Format the extracted text into a structured output."""
         try:
-            # Initialize default values
-            formatted = {
-                "Name": "Not found",
-                "License Number": "Not found",
-                "Date of birth": "Not found",
-                "Issue Date": "Not found"
-            }
-            
-            # Extract information using simple pattern matching
-            lines = text.split('\n')
-            for line in lines:
-                line = line.strip()
-                if line.startswith("Name:"):
-                    formatted["Name"] = line.split(":", 1)[1].strip()
-                elif line.startswith("License Number:"):
-                    formatted["License Number"] = line.split(":", 1)[1].strip()
-                elif line.startswith("Date of birth:"):
-                    formatted["Date of birth"] = line.split(":", 1)[1].strip()
-                elif line.startswith("Issue Date:"):
-                    formatted["Issue Date"] = line.split(":", 1)[1].strip()
-            
-            # Format the output
-            return "\n".join([f"{k}: {v}" for k, v in formatted.items()])
+            parser = self.create_parser()
+            parser.feed(text)
+            return self.render_fields(parser.finish())
             
         except Exception as e:
             logger.error(f"Error formatting text: {str(e)}")
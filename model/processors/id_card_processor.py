@@ -1,14 +1,22 @@
-from base_processor import BaseDocumentProcessor
-from PIL import Image
-import torch
+from .base_processor import BaseDocumentProcessor
+from ..field_parser import FieldParser, clean_value
+from ..validators import is_missing
+from ..document_image import DocumentImage
+from ..records import ID_CARD_FIELDS
 from transformers import AutoProcessor, AutoModelForVision2Seq
 import logging
+from services import metrics
 import os
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
 class IDCardProcessor(BaseDocumentProcessor):
+    doc_type = "id_card"
+    fields = list(ID_CARD_FIELDS)
+    required_fields = ["Name", "ID Number"]
+    document_label = "identity card"
+
     def __init__(self):
         super().__init__()
         self.prompt = os.getenv('ID_CARD_PROMPT')
@@ -16,53 +24,21 @@ class IDCardProcessor(BaseDocumentProcessor):
             logger.error("ID_CARD_PROMPT environment variable is required but not set")
             raise ValueError("ID_CARD_PROMPT environment variable is required")
 
-    def process_image(self, image_path):
+    def process_image(self, image_source):
         try:
-            logger.info(f"Processing image: {image_path}")
-            
-            original_image = self.verify_image(image_path)
-            if original_image is None:
-                return "Image verification failed"
+            logger.info(f"Processing image: {DocumentImage.describe(image_source)}")
             
-            logger.info(f"Image opened successfully: {original_image.size}")
+            with metrics.span('decode_resize', doc_type='id_card') as stage:
+                original_image = self.verify_image(image_source)
+                if original_image is None:
+                    return "Image verification failed"
+                
+                logger.info(f"Image opened successfully: {original_image.size}")
+                stage.set(image_size=metrics.image_size_label(original_image.size))
             
             try:
-                # Optimize image size if too large
-                max_size = 1024
-                if original_image.size[0] > max_size or original_image.size[1] > max_size:
-                    ratio = max_size / max(original_image.size)
-                    new_size = tuple([int(dim * ratio) for dim in original_image.size])
-                    original_image = original_image.resize(new_size, Image.Resampling.LANCZOS)
-                    logger.info(f"Resized image to: {original_image.size}")
-
-                logger.info("Preparing model inputs...")
-                inputs = self.processor(
-                    text=[self.prompt],
-                    images=[original_image],
-                    return_tensors="pt",
-                    padding=True
-                ).to(self.device)
-                
-                logger.info("Starting model inference...")
-                with torch.no_grad():
-                    # Set shorter max_new_tokens for faster processing
-                    output_ids = self.model.generate(
-                        **inputs,
-                        max_new_tokens=128,  # Reduced from 256
-                        num_beams=2,         # Reduced from 3
-                        temperature=0.3,
-                        do_sample=True,
-                        length_penalty=1.0,
-                        repetition_penalty=1.2
-                    )
-                    
-                    generated_text = self.processor.batch_decode(output_ids, skip_special_tokens=True)[0]
-                    logger.info(f"Raw generated text: {generated_text}")
-                    
-                    formatted_text = self.format_text(generated_text)
-                    logger.info(f"Formatted output: {formatted_text}")
-                    
-                    return formatted_text
+                # Start small and only go up in resolution if fields are missing
+                return self.extract_with_resolution(original_image, 'id_card', self._extract)
                 
             except Exception as e:
                 logger.error(f"Generation error: {str(e)}")
@@ -75,43 +51,54 @@ class IDCardProcessor(BaseDocumentProcessor):
             logger.error(f"General error: {str(e)}")
             return "Image processing failed"
         
+    def _extract(self, image):
+        """Generate and format the ID card fields from a sized image"""
+        logger.info(f"Starting model inference at {image.size}...")
+        parser = self.create_parser()
+        # Set shorter max_new_tokens for faster processing
+        generated_text = self.generate_text(
+            image,
+            'id_card',
+            parser=parser,
+            max_new_tokens=128,  # Reduced from 256
+            num_beams=2,         # Reduced from 3
+            temperature=0.3,
+            do_sample=True,
+            length_penalty=1.0,
+            repetition_penalty=1.2
+        )
+        logger.info(f"Raw generated text: {generated_text}")
+        
+        with metrics.span('format_text', doc_type='id_card'):
+            formatted_text = self.render_fields(self.finish_parser(parser, generated_text))
+        logger.info(f"Formatted output: {formatted_text}")
+        
+        return formatted_text
+
+    def create_parser(self, on_field=None) -> FieldParser:
+        # Skip echoed prompt lines and clean quotes/whitespace from every value
+        return FieldParser(
+            self.fields,
+            transforms={field: clean_value for field in self.fields},
+            skip_markers=("<image>", "Extract only"),
+            on_field=on_field
+        )
+
+    def render_fields(self, values) -> str:
+        # Only include valid values
+        output_lines = [
+            f"{field}: {values[field]}"
+            for field in self.fields
+            if not is_missing(values.get(field))
+        ]
+        return "\n".join(output_lines) if output_lines else "No data found"
+
     def format_text(self, text: str) -> str:
         try:
-            # Initialize with required fields
-            formatted_data = {
-                "Name": "",
-                "Race": "",
-                "Date of birth": "",
-                "Sex": "",
-                "Country/Place of birth": "",
-                "ID Number": ""
-            }
-            
-            # Process lines
-            lines = text.split('\n')
-            for line in lines:
-                line = line.strip()
-                if not line or "<image>" in line or "Extract only" in line:
-                    continue
-                    
-                for field in formatted_data.keys():
-                    if line.lower().startswith(field.lower() + ":"):
-                        value = line.split(":", 1)[1].strip()
-                        # Clean the value
-                        value = value.replace('"', '')  # Remove quotes
-                        value = value.replace('\n', ' ')  # Replace newlines
-                        value = ' '.join(value.split())  # Normalize whitespace
-                        formatted_data[field] = value
-                        break
-            
-            # Format output
-            output_lines = []
-            for field, value in formatted_data.items():
-                if value and value.lower() != "not found":  # Only include valid values
-                    output_lines.append(f"{field}: {value}")
-            
-            return "\n".join(output_lines) if output_lines else "No data found"
+            parser = self.create_parser()
+            parser.feed(text)
+            return self.render_fields(parser.finish())
             
         except Exception as e:
             logger.error(f"Error formatting text: {str(e)}")
-            return "Error formatting text"
\ No newline at end of file
+            return "Error formatting text"
@@ -0,0 +1,259 @@
+import sys
+import base64
+import struct
+from collections.abc import Mapping
+from dataclasses import dataclass
+from typing import ClassVar, Collection, Dict, Iterable, Iterator, List, Optional, Tuple, Type
+
+from .validators import is_missing, parse_formatted_text
+
+# Field labels as the model writes them and the Monday mapper reads them.
+# Interned, so parsers, records and column lookups share one string per label.
+ID_CARD_FIELDS = tuple(map(sys.intern, (
+    "Name", "Race", "Date of birth", "Sex", "Country/Place of birth", "ID Number"
+)))
+DRIVERS_LICENSE_FIELDS = tuple(map(sys.intern, (
+    "Name", "License Number", "Date of birth", "Issue Date"
+)))
+LOG_CARD_FIELDS = tuple(map(sys.intern, (
+    "Vehicle No",
+    "Make/Model",
+    "Vehicle Type",
+    "Vehicle Attachment 1",
+    "Vehicle Scheme",
+    "Chassis No",
+    "Propellant",
+    "Engine No",
+    "Motor No",
+    "Engine Capacity",
+    "Power Rating",
+    "Maximum Power Output",
+    "Maximum Laden Weight",
+    "Unladen Weight",
+    "Year Of Manufacture",
+    "Original Registration Date",
+    "Lifespan Expiry Date",
+    "COE Category",
+    "PQP Paid",
+    "COE Expiry Date",
+    "Road Tax Expiry Date",
+    "PARF Eligibility Expiry Date",
+    "Inspection Due Date",
+    "Intended Transfer Date"
+)))
+
+# Binary layout: version, record type, bitmask of present fields, the
+# character length of each present value, then the values concatenated as
+# one UTF-8 string. Decoding is one unpack and one decode plus slicing.
+FORMAT_VERSION = 1
+# Lengths are unsigned shorts, counted in characters
+MAX_VALUE_LENGTH = 0xFFFF
+_HEADER = struct.Struct('>BBI')
+_LENGTHS = [struct.Struct(f'>{count}H') for count in range(33)]
+
+
+class DocumentRecord(Mapping):
+    """Extracted fields for one document.
+
+    Subclasses are slotted dataclasses with one attribute per label, None when
+    the field wasn't read. A record also reads as a {label: value} mapping of
+    the fields that were read, so validators, the applicant aggregator and the
+    Monday column mapper use it as they would the parsed dict.
+    """
+    __slots__ = ()
+
+    doc_type: ClassVar[str]
+    type_code: ClassVar[int]
+    labels: ClassVar[Tuple[str, ...]]
+    _attributes: ClassVar[Dict[str, str]]
+
+    @classmethod
+    def from_fields(cls, fields: Mapping) -> 'DocumentRecord':
+        """Build a record from parsed values; placeholders like '-' become None"""
+        values = []
+        for label in cls.labels:
+            value = fields.get(label)
+            values.append(None if is_missing(value) else value)
+        return cls(*values)
+
+    @classmethod
+    def from_text(cls, text: str) -> 'DocumentRecord':
+        """Build a record from a processor's "Field: value" output"""
+        return cls.from_fields(parse_formatted_text(text))
+
+    def __getitem__(self, label: str) -> str:
+        attribute = self._attributes.get(label)
+        value = None if attribute is None else getattr(self, attribute)
+        if value is None:
+            raise KeyError(label)
+        return value
+
+    def __iter__(self) -> Iterator[str]:
+        for label, attribute in self._attributes.items():
+            if getattr(self, attribute) is not None:
+                yield label
+
+    def __len__(self) -> int:
+        return sum(getattr(self, attribute) is not None for attribute in self.__slots__)
+
+    def to_bytes(self) -> bytes:
+        mask = 0
+        present = []
+        for bit, attribute in enumerate(self.__slots__):
+            value = getattr(self, attribute)
+            if value is not None:
+                mask |= 1 << bit
+                present.append(value)
+        try:
+            lengths = _LENGTHS[len(present)].pack(*map(len, present))
+        except struct.error:
+            raise ValueError(f"{type(self).__name__} values must be at most {MAX_VALUE_LENGTH} characters") from None
+        return _HEADER.pack(FORMAT_VERSION, self.type_code, mask) + lengths + ''.join(present).encode('utf-8')
+
+
+@dataclass(slots=True)
+class IDCardRecord(DocumentRecord):
+    doc_type: ClassVar[str] = 'id_card'
+    type_code: ClassVar[int] = 1
+    labels: ClassVar[Tuple[str, ...]] = ID_CARD_FIELDS
+
+    name: Optional[str] = None
+    race: Optional[str] = None
+    date_of_birth: Optional[str] = None
+    sex: Optional[str] = None
+    country_of_birth: Optional[str] = None
+    id_number: Optional[str] = None
+
+
+@dataclass(slots=True)
+class DriversLicenseRecord(DocumentRecord):
+    doc_type: ClassVar[str] = 'drivers_license'
+    type_code: ClassVar[int] = 2
+    labels: ClassVar[Tuple[str, ...]] = DRIVERS_LICENSE_FIELDS
+
+    name: Optional[str] = None
+    license_number: Optional[str] = None
+    date_of_birth: Optional[str] = None
+    issue_date: Optional[str] = None
+
+
+@dataclass(slots=True)
+class LogCardRecord(DocumentRecord):
+    doc_type: ClassVar[str] = 'log_card'
+    type_code: ClassVar[int] = 3
+    labels: ClassVar[Tuple[str, ...]] = LOG_CARD_FIELDS
+
+    vehicle_no: Optional[str] = None
+    make_model: Optional[str] = None
+    vehicle_type: Optional[str] = None
+    vehicle_attachment_1: Optional[str] = None
+    vehicle_scheme: Optional[str] = None
+    chassis_no: Optional[str] = None
+    propellant: Optional[str] = None
+    engine_no: Optional[str] = None
+    motor_no: Optional[str] = None
+    engine_capacity: Optional[str] = None
+    power_rating: Optional[str] = None
+    maximum_power_output: Optional[str] = None
+    maximum_laden_weight: Optional[str] = None
+    unladen_weight: Optional[str] = None
+    year_of_manufacture: Optional[str] = None
+    original_registration_date: Optional[str] = None
+    lifespan_expiry_date: Optional[str] = None
+    coe_category: Optional[str] = None
+    pqp_paid: Optional[str] = None
+    coe_expiry_date: Optional[str] = None
+    road_tax_expiry_date: Optional[str] = None
+    parf_eligibility_expiry_date: Optional[str] = None
+    inspection_due_date: Optional[str] = None
+    intended_transfer_date: Optional[str] = None
+
+
+RECORD_TYPES: Dict[str, Type[DocumentRecord]] = {}
+_RECORDS_BY_CODE: Dict[int, Type[DocumentRecord]] = {}
+for _record_class in (IDCardRecord, DriversLicenseRecord, LogCardRecord):
+    if len(_record_class.labels) != len(_record_class.__slots__):
+        raise TypeError(f"{_record_class.__name__} needs one attribute per label")
+    _record_class._attributes = dict(zip(_record_class.labels, _record_class.__slots__))
+    RECORD_TYPES[_record_class.doc_type] = _record_class
+    _RECORDS_BY_CODE[_record_class.type_code] = _record_class
+RECORD_TYPES['license'] = DriversLicenseRecord
+
+
+def record_type(doc_type: str) -> Type[DocumentRecord]:
+    record_class = RECORD_TYPES.get(doc_type)
+    if record_class is None:
+        raise ValueError(f"No record type for {doc_type}")
+    return record_class
+
+
+def from_bytes(data: bytes) -> DocumentRecord:
+    """Decode a record written by DocumentRecord.to_bytes"""
+    version, type_code, mask = _HEADER.unpack_from(data)
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported record format version {version}")
+    record_class = _RECORDS_BY_CODE.get(type_code)
+    if record_class is None:
+        raise ValueError(f"Unknown record type {type_code}")
+
+    layout = _LENGTHS[mask.bit_count()]
+    text = data[_HEADER.size + layout.size:].decode('utf-8')
+    lengths = iter(layout.unpack_from(data, _HEADER.size))
+    values = []
+    offset = 0
+    for bit in range(len(record_class.labels)):
+        if mask >> bit & 1:
+            end = offset + next(lengths)
+            values.append(text[offset:end])
+            offset = end
+        else:
+            values.append(None)
+    return record_class(*values)
+
+
+class RecordSet(Mapping):
+    """One applicant's records across documents, read as a single
+    {label: value} mapping; the first record with a value for a label wins.
+
+    This is what the applicant aggregator hands the Monday column mapper.
+    `to_json()` keeps each record in its binary form for JSON stores such as
+    the retry queue.
+    """
+    __slots__ = ('records',)
+
+    def __init__(self, records: Iterable[DocumentRecord] = ()):
+        self.records: Tuple[DocumentRecord, ...] = tuple(records)
+
+    def __getitem__(self, label: str) -> str:
+        for record in self.records:
+            value = record.get(label)
+            if value is not None:
+                return value
+        raise KeyError(label)
+
+    def __iter__(self) -> Iterator[str]:
+        seen = set()
+        for record in self.records:
+            for label in record:
+                if label not in seen:
+                    seen.add(label)
+                    yield label
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def without(self, labels: Collection[str]) -> 'RecordSet':
+        """The same records minus any value for `labels`"""
+        remaining = (
+            type(record).from_fields({label: record[label] for label in record if label not in labels})
+            for record in self.records
+        )
+        return RecordSet(record for record in remaining if record)
+
+    def to_json(self) -> List[str]:
+        """Each record's binary form, base64 encoded"""
+        return [base64.b64encode(record.to_bytes()).decode('ascii') for record in self.records]
+
+    @classmethod
+    def from_json(cls, items: Iterable[str]) -> 'RecordSet':
+        return cls(from_bytes(base64.b64decode(item)) for item in items)
@@ -0,0 +1,111 @@
+import os
+import logging
+from typing import Optional
+
+from PIL import Image, ImageFilter, ImageStat
+
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+# Candidate sizes (longest side, px) tried from smallest up, and roughly how
+# many lines of text each document has from top to bottom
+RESOLUTION_PROFILES = {
+    'id_card': {'sizes': (512, 768, 1024), 'text_rows': 14},
+    'drivers_license': {'sizes': (512, 768, 1024), 'text_rows': 14},
+    'log_card': {'sizes': (768, 1024, 1536, 2048), 'text_rows': 45}
+}
+
+# Below these the image is blurry or washed out and needs more pixels per glyph
+SHARPNESS_THRESHOLD = 8.0
+CONTRAST_THRESHOLD = 30.0
+LOW_QUALITY_FACTOR = 1.5
+
+RESOLUTION_REQUESTS = metrics.registry.counter(
+    'gobingo_resolution_requests_total',
+    'Documents sized by the resolution policy'
+)
+RESOLUTION_ESCALATIONS = metrics.registry.counter(
+    'gobingo_resolution_escalations_total',
+    'Retries at a higher resolution because required fields were missing'
+)
+
+
+def measure_quality(image: Image.Image) -> dict:
+    """Cheap sharpness/contrast estimate on a small greyscale thumbnail"""
+    thumbnail = image.convert('L')
+    thumbnail.thumbnail((256, 256))
+    contrast = ImageStat.Stat(thumbnail).stddev[0]
+    sharpness = ImageStat.Stat(thumbnail.filter(ImageFilter.FIND_EDGES)).mean[0]
+    thumbnail.close()
+    return {'sharpness': sharpness, 'contrast': contrast}
+
+
+class ResolutionPolicy:
+    """Pick the smallest input size that keeps text legible.
+
+    SmolVLM splits images into tiles, so prompt length and latency grow with
+    resolution. Text height is estimated from the document's typical number of
+    lines; blurry or low-contrast images get a higher target.
+    """
+
+    def __init__(self, min_text_px: Optional[float] = None):
+        self.min_text_px = min_text_px or float(os.getenv('RESOLUTION_MIN_TEXT_PX', '14'))
+
+    def _candidates(self, image: Image.Image, doc_type: str):
+        longest = max(image.size)
+        sizes = [size for size in RESOLUTION_PROFILES[doc_type]['sizes'] if size < longest]
+        # Never upscale; the original is always the last resort
+        return sizes + [longest]
+
+    def initial_size(self, image: Image.Image, doc_type: str) -> int:
+        """Smallest candidate longest side meeting the legibility target"""
+        if doc_type not in RESOLUTION_PROFILES:
+            return max(image.size)
+
+        target = self.min_text_px
+        quality = measure_quality(image)
+        if quality['sharpness'] < SHARPNESS_THRESHOLD or quality['contrast'] < CONTRAST_THRESHOLD:
+            target *= LOW_QUALITY_FACTOR
+
+        rows = RESOLUTION_PROFILES[doc_type]['text_rows']
+        height_ratio = image.size[1] / max(image.size)
+        candidates = self._candidates(image, doc_type)
+        chosen = candidates[-1]
+        for size in candidates:
+            if size * height_ratio / rows >= target:
+                chosen = size
+                break
+
+        RESOLUTION_REQUESTS.inc(doc_type=doc_type)
+        logger.info(
+            f"Resolution for {doc_type}: {chosen}px "
+            f"(sharpness={quality['sharpness']:.1f}, contrast={quality['contrast']:.1f})"
+        )
+        return chosen
+
+    def smallest_size(self, image: Image.Image, doc_type: str) -> int:
+        """Smallest candidate regardless of legibility, for degraded tiers"""
+        if doc_type not in RESOLUTION_PROFILES:
+            return max(image.size)
+        RESOLUTION_REQUESTS.inc(doc_type=doc_type)
+        return self._candidates(image, doc_type)[0]
+
+    def next_size(self, image: Image.Image, doc_type: str, current: int) -> Optional[int]:
+        """Next larger candidate, or None once the original size has been tried"""
+        if doc_type not in RESOLUTION_PROFILES:
+            return None
+        for size in self._candidates(image, doc_type):
+            if size > current:
+                RESOLUTION_ESCALATIONS.inc(doc_type=doc_type)
+                return size
+        return None
+
+    @staticmethod
+    def resize(image: Image.Image, size: int) -> Image.Image:
+        """Scale so the longest side is `size`; returns the image itself if already there"""
+        if max(image.size) <= size:
+            return image
+        ratio = size / max(image.size)
+        new_size = tuple([int(dim * ratio) for dim in image.size])
+        return image.resize(new_size, Image.Resampling.LANCZOS)
@@ -0,0 +1,254 @@
+import os
+import json
+import time
+import queue
+import random
+import logging
+import threading
+from typing import Dict, List, Optional
+
+from .inference_resources import InferenceResources, request_priority, PRIORITY_BACKGROUND
+from .validators import parse_formatted_text, is_missing
+from services import metrics
+from services.resilience import get_dependency, CircuitBreaker
+
+logger = logging.getLogger(__name__)
+
+SHADOW_RUNS = metrics.registry.counter(
+    'gobingo_shadow_runs_total',
+    'Shadow extractions, by config and outcome (ran, failed, dropped)'
+)
+SHADOW_FIELD_AGREEMENT = metrics.registry.counter(
+    'gobingo_shadow_field_agreement_total',
+    'Fields compared between primary and shadow extractions, by whether they agreed'
+)
+SHADOW_LATENCY_DELTA = metrics.registry.histogram(
+    'gobingo_shadow_latency_delta_seconds',
+    'Shadow minus primary extraction time (positive when the shadow is slower)',
+    buckets=(-20, -10, -5, -2, -1, -0.5, 0, 0.5, 1, 2, 5, 10, 20)
+)
+
+
+class ShadowConfig:
+    """An alternate extraction setup to evaluate against the live one.
+
+    Read from SHADOW_CONFIG, either inline JSON or a path to a JSON file:
+
+        {"name": "greedy-v2", "sample_rate": 0.1, "doc_types": ["log_card"],
+         "prompts": {"log_card": "<image>..."}, "generate": {"num_beams": 1},
+         "early_stop": true, "progressive": false}
+
+    `prompts` and `generate` are applied over the primary processor's own;
+    anything left out is the same as the primary.
+    """
+
+    def __init__(self, name: str, sample_rate: float = 0.05, doc_types: Optional[List[str]] = None,
+                 prompts: Optional[Dict[str, str]] = None, generate: Optional[Dict] = None,
+                 early_stop: Optional[bool] = None, progressive: Optional[bool] = None):
+        self.name = name
+        self.sample_rate = sample_rate
+        self.doc_types = set(doc_types) if doc_types else None
+        self.prompts = prompts or {}
+        self.generate = generate or {}
+        self.early_stop = early_stop
+        self.progressive = progressive
+
+    @classmethod
+    def from_env(cls) -> Optional['ShadowConfig']:
+        value = os.getenv('SHADOW_CONFIG', '').strip()
+        if not value:
+            return None
+        try:
+            if value.startswith('{'):
+                settings = json.loads(value)
+            else:
+                with open(value) as f:
+                    settings = json.load(f)
+            return cls(**settings)
+        except (OSError, ValueError, TypeError) as e:
+            logger.error(f"Ignoring invalid SHADOW_CONFIG: {str(e)}")
+            return None
+
+    def applies_to(self, doc_type: str) -> bool:
+        return self.doc_types is None or doc_type in self.doc_types
+
+
+def compare_fields(fields: List[str], primary_text: str, shadow_text: str) -> Dict[str, Dict]:
+    """Per-field agreement between two formatted extractions"""
+    def normalize(value):
+        return None if is_missing(value) else ' '.join(value.split()).casefold()
+
+    primary = parse_formatted_text(primary_text)
+    shadow = parse_formatted_text(shadow_text)
+    comparison = {}
+    for field in fields:
+        primary_value, shadow_value = primary.get(field), shadow.get(field)
+        comparison[field] = {
+            'agree': normalize(primary_value) == normalize(shadow_value),
+            'primary': primary_value,
+            'shadow': shadow_value
+        }
+    return comparison
+
+
+class ShadowEvaluator:
+    """Re-run a sample of live documents with a shadow config, off the reply path.
+
+    Sampled images are queued for a single background thread and dropped if
+    the queue is full. That thread only starts a run while no live request is
+    waiting for an inference slot and the model's circuit is closed, and keeps
+    shadow inference under SHADOW_CPU_BUDGET of wall-clock time (0.1 lets it
+    use about 10%). Each run's field agreement and latency against the primary
+    result is appended to SHADOW_STORE_PATH; field values are only stored with
+    SHADOW_STORE_VALUES=true since they are applicants' personal data.
+    """
+
+    def __init__(self, config: ShadowConfig, store_path: Optional[str] = None,
+                 cpu_budget: Optional[float] = None, queue_size: Optional[int] = None,
+                 store_values: Optional[bool] = None, seed: Optional[int] = None):
+        self.config = config
+        self.store_path = store_path or os.getenv('SHADOW_STORE_PATH', 'data/shadow_results.jsonl')
+        self.cpu_budget = cpu_budget if cpu_budget is not None else float(os.getenv('SHADOW_CPU_BUDGET', '0.1'))
+        # Idle periods bank at most this many seconds of shadow inference
+        self.max_burst = float(os.getenv('SHADOW_MAX_BURST_SECONDS', '60'))
+        self.slot_timeout = float(os.getenv('SHADOW_SLOT_TIMEOUT', '2'))
+        self.store_values = store_values if store_values is not None else \
+            os.getenv('SHADOW_STORE_VALUES', 'false').lower() == 'true'
+        self._queue = queue.Queue(maxsize=queue_size or int(os.getenv('SHADOW_QUEUE_SIZE', '16')))
+        self._rng = random.Random(seed)
+        self._processors = {}
+        self._budget = 0.0
+        self._budget_updated = time.monotonic()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    @classmethod
+    def from_env(cls) -> Optional['ShadowEvaluator']:
+        config = ShadowConfig.from_env()
+        if config is None:
+            return None
+        logger.info(f"Shadow config '{config.name}' sampling {config.sample_rate:.0%} of documents")
+        return cls(config)
+
+    def submit(self, image_data, doc_type: str, primary: Dict, primary_seconds: float) -> bool:
+        """Maybe queue a shadow run of a document the primary processed; never blocks"""
+        if not self.config.applies_to(doc_type) or self._rng.random() >= self.config.sample_rate:
+            return False
+        self.start()
+        try:
+            self._queue.put_nowait((image_data, doc_type, primary, primary_seconds, time.time()))
+        except queue.Full:
+            SHADOW_RUNS.inc(config=self.config.name, outcome='dropped')
+            return False
+        return True
+
+    def _processor(self, doc_type: str):
+        """A separate processor instance carrying the shadow settings"""
+        if doc_type not in self._processors:
+            from .document_processor import DocumentProcessorFactory
+
+            processor = DocumentProcessorFactory.PROCESSOR_CLASSES[doc_type]()
+            processor.prompt = self.config.prompts.get(doc_type, processor.prompt)
+            processor.generate_overrides = dict(self.config.generate)
+            if self.config.early_stop is not None:
+                processor.early_stop = self.config.early_stop
+            if self.config.progressive is not None:
+                processor.progressive = self.config.progressive
+            processor.shadow = True
+            processor.slot_timeout = self.slot_timeout
+            self._processors[doc_type] = processor
+        return self._processors[doc_type]
+
+    def _refill(self) -> float:
+        now = time.monotonic()
+        self._budget = min(self.max_burst, self._budget + (now - self._budget_updated) * self.cpu_budget)
+        self._budget_updated = now
+        return self._budget
+
+    def _wait_for_capacity(self) -> bool:
+        """Block until a shadow run may start; False once stopping"""
+        resources = InferenceResources.get_instance()
+        breaker = get_dependency('model').breaker
+        while not self._stopping.is_set():
+            budget = self._refill()
+            if budget <= 0:
+                self._stopping.wait(min(5.0, -budget / self.cpu_budget if self.cpu_budget > 0 else 5.0))
+                continue
+            if resources.queued > 0 or resources.active >= resources.concurrency \
+                    or breaker.state != CircuitBreaker.CLOSED:
+                self._stopping.wait(0.5)
+                continue
+            return True
+        return False
+
+    def _run(self, image_data, doc_type: str, primary: Dict, primary_seconds: float, queued_at: float):
+        processor = self._processor(doc_type)
+        start = time.perf_counter()
+        try:
+            with request_priority(PRIORITY_BACKGROUND):
+                shadow = processor.process(image_data)
+            error = None
+        except Exception as e:
+            shadow = {'success': False, 'error': str(e)}
+            error = str(e)
+        shadow_seconds = time.perf_counter() - start
+        self._budget -= shadow_seconds
+
+        comparison = compare_fields(processor.fields, primary.get('text', ''), shadow.get('text', ''))
+        for field, result in comparison.items():
+            SHADOW_FIELD_AGREEMENT.inc(config=self.config.name, doc_type=doc_type, field=field,
+                                       agree=str(result['agree']).lower())
+            if not self.store_values:
+                del result['primary'], result['shadow']
+        SHADOW_LATENCY_DELTA.observe(shadow_seconds - primary_seconds, config=self.config.name, doc_type=doc_type)
+        SHADOW_RUNS.inc(config=self.config.name, outcome='ran' if error is None else 'failed')
+
+        self._write({
+            'config': self.config.name,
+            'doc_type': doc_type,
+            'queued_at': queued_at,
+            'ran_at': time.time(),
+            'primary_seconds': round(primary_seconds, 3),
+            'shadow_seconds': round(shadow_seconds, 3),
+            'primary_success': primary.get('success', False),
+            'shadow_success': shadow.get('success', False),
+            'shadow_error': error or (None if shadow.get('success') else shadow.get('error')),
+            'fields': comparison
+        })
+
+    def _write(self, record: Dict):
+        directory = os.path.dirname(self.store_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        try:
+            with open(self.store_path, 'a') as f:
+                f.write(json.dumps(record) + '\n')
+        except OSError as e:
+            logger.error(f"Could not write shadow result to {self.store_path}: {str(e)}")
+
+    def _worker(self):
+        while not self._stopping.is_set():
+            try:
+                job = self._queue.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            if not self._wait_for_capacity():
+                return
+            try:
+                self._run(*job)
+            except Exception as e:
+                logger.error(f"Shadow run failed: {str(e)}")
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping.clear()
+                self._thread = threading.Thread(target=self._worker, name='shadow-evaluator', daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
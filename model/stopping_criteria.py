@@ -0,0 +1,89 @@
+import logging
+from typing import Callable, Dict, List, Optional
+
+import torch
+from transformers import StoppingCriteria
+
+from .field_parser import FieldParser
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+# A token pattern up to this long repeated this many times in a row is a loop.
+# Short patterns must also cover a minimum span, as digits are single tokens
+# and values like "1000000" would otherwise look like a loop.
+MAX_REPEAT_PERIOD = 24
+REPEAT_COUNT = 3
+MIN_REPEAT_SPAN = 16
+
+EARLY_STOPS = metrics.registry.counter(
+    'gobingo_early_stops_total',
+    'Generations stopped before max_new_tokens, by reason'
+)
+
+
+def has_repeating_tail(tokens: List[int], max_period: int = MAX_REPEAT_PERIOD,
+                       min_repeats: int = REPEAT_COUNT, min_span: int = MIN_REPEAT_SPAN) -> bool:
+    """True if the sequence ends with the same token pattern repeated back to back"""
+    for period in range(1, max_period + 1):
+        repeats = max(min_repeats, -(-min_span // period))
+        if len(tokens) < period * repeats:
+            continue
+        pattern = tokens[-period:]
+        if all(tokens[-(i + 1) * period:len(tokens) - i * period] == pattern for i in range(1, repeats)):
+            return True
+    return False
+
+
+class FieldStoppingCriteria(StoppingCriteria):
+    """Stop generating once every expected field has a value, or the output
+    starts repeating.
+
+    The generated text is only decoded and parsed when the newest token ends
+    a line, since fields are one per line. Each sequence (beam) is judged on
+    its own text, as beams are reordered between steps, and generation only
+    ends once every sequence is done.
+    """
+
+    def __init__(self, tokenizer, create_parser: Callable[[], FieldParser],
+                 expected_fields: List[str], prompt_length: int):
+        self.tokenizer = tokenizer
+        self.create_parser = create_parser
+        self.expected_fields = expected_fields
+        self.prompt_length = prompt_length
+        # Why the first sequence stopped once all of them were done, for
+        # metrics after generate() returns; None if generation ran on
+        self.reason: Optional[str] = None
+        self._newline_tokens: Dict[int, bool] = {}
+
+    def _ends_line(self, token_id: int) -> bool:
+        ends_line = self._newline_tokens.get(token_id)
+        if ends_line is None:
+            ends_line = '\n' in self.tokenizer.decode([token_id])
+            self._newline_tokens[token_id] = ends_line
+        return ends_line
+
+    def _stop_reason(self, sequence) -> Optional[str]:
+        generated = sequence[self.prompt_length:]
+        if len(generated) == 0:
+            return None
+        if has_repeating_tail(generated[-MAX_REPEAT_PERIOD * REPEAT_COUNT:].tolist()):
+            return 'repetition'
+        if not self._ends_line(int(generated[-1])):
+            return None
+
+        parser = self.create_parser()
+        # Only complete lines are parsed; the buffered last line is never flushed
+        parser.feed(self.tokenizer.decode(generated, skip_special_tokens=True))
+        if parser.repeated:
+            return 'repeated_field'
+        if parser.has_values(self.expected_fields):
+            return 'all_fields'
+        return None
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> torch.BoolTensor:
+        reasons = [self._stop_reason(sequence) for sequence in input_ids]
+        done = [reason is not None for reason in reasons]
+        if self.reason is None and all(done):
+            self.reason = reasons[0]
+        return torch.tensor(done, dtype=torch.bool, device=input_ids.device)
@@ -0,0 +1,215 @@
+import os
+import time
+import random
+import logging
+import threading
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Canned outputs in the shape SmolVLM produces for each document prompt
+CANNED_OUTPUTS = {
+    'id_card': (
+        "Name: TAN AH KOW\n"
+        "Race: CHINESE\n"
+        "Date of birth: 12-03-1985\n"
+        "Sex: M\n"
+        "Country/Place of birth: SINGAPORE\n"
+        "ID Number: S8512345I"
+    ),
+    'drivers_license': (
+        "Name: TAN AH KOW\n"
+        "License Number: S8512345I\n"
+        "Date of birth: 12-03-1985\n"
+        "Issue Date: 04-07-2005"
+    ),
+    'log_card': (
+        "Vehicle No.: SMB1234X\n"
+        "Make / Model: TOYOTA / COROLLA ALTIS 1.6A\n"
+        "Vehicle Type: Passenger Motor Car\n"
+        "Vehicle Attachment 1: -\n"
+        "Vehicle Scheme: Normal\n"
+        "Chassis No.: JTDBR32E720012345\n"
+        "Propellant: Petrol\n"
+        "Engine No.: 3ZZ1234567\n"
+        "Motor No: -\n"
+        "Engine Capacity: 1598 cc\n"
+        "Power Rating: -\n"
+        "Maximum Power Output: 81 kW\n"
+        "Maximum Laden Weight: 1640\n"
+        "Unladen Weight: 1225\n"
+        "Year Of Manufacture: 2019\n"
+        "Original Registration Date: 15 Mar 2019\n"
+        "Lifespan Expiry Date: -\n"
+        "COE Category: A\n"
+        "PQP Paid: 31,500.00\n"
+        "COE Expiry Date: 14 Mar 2029\n"
+        "Road Tax Expiry Date: 14 Sep 2025\n"
+        "PARF Eligibility Expiry Date: 14 Mar 2029\n"
+        "Inspection Due Date: 15 Mar 2025\n"
+        "Intended Transfer Date: -"
+    )
+}
+
+# Image metadata key (PNG text chunk, or "key=value" JPEG comment) naming the
+# document a test image shows; unmarked images read as nothing legible
+DOC_TYPE_MARKER = 'gobingo-doc-type'
+
+# Prompt environment variables used to tell which document is being asked for
+PROMPT_ENV_VARS = {
+    'ID_CARD_PROMPT': 'id_card',
+    'LICENSE_PROMPT': 'drivers_license',
+    'LOG_CARD_PROMPT': 'log_card'
+}
+
+# Rough number of tokens an image expands to after splitting
+STUB_IMAGE_TOKENS = 1088
+
+
+def marked_doc_type(image) -> Optional[str]:
+    """Document type a load generator marked an image with, if any"""
+    info = getattr(image, 'info', None) or {}
+    doc_type = info.get(DOC_TYPE_MARKER)
+    comment = info.get('comment')
+    if doc_type is None and comment:
+        if isinstance(comment, bytes):
+            comment = comment.decode('utf-8', 'replace')
+        key, _, value = comment.partition('=')
+        if key.strip() == DOC_TYPE_MARKER:
+            doc_type = value.strip()
+    return doc_type if doc_type in CANNED_OUTPUTS else None
+
+
+class StubInferenceError(RuntimeError):
+    """Injected failure raised by the stub model"""
+    pass
+
+
+class LatencyDistribution:
+    """Latency spec from a string such as "fixed:500", "uniform:200:800"
+    or "lognormal:3000:0.4" (median in ms, sigma)."""
+
+    def __init__(self, spec: str):
+        parts = spec.split(':')
+        self.kind = parts[0]
+        self.params = [float(p) for p in parts[1:]]
+        if self.kind not in ('fixed', 'uniform', 'lognormal'):
+            raise ValueError(f"Unknown latency distribution: {spec}")
+
+    def sample(self, rng: random.Random) -> float:
+        """Return a latency in seconds"""
+        if self.kind == 'fixed':
+            millis = self.params[0]
+        elif self.kind == 'uniform':
+            millis = rng.uniform(self.params[0], self.params[1])
+        else:
+            median, sigma = self.params[0], self.params[1]
+            millis = rng.lognormvariate(0, sigma) * median
+        return millis / 1000.0
+
+
+class StubShape:
+    """Just enough of a tensor for callers that read `.shape`"""
+
+    def __init__(self, length: int):
+        self.shape = (1, length)
+
+
+class StubInputs(dict):
+    def to(self, device):
+        return self
+
+
+class StubOutput(StubShape):
+    def __init__(self, text: str, length: int):
+        super().__init__(length)
+        self.text = text
+
+
+class StubProcessor:
+    """Stands in for the SmolVLM AutoProcessor.
+
+    What the stub model "reads" comes from the image's DOC_TYPE_MARKER. A
+    document prompt for another type, or an unmarked image, gets no fields
+    back; prompts that aren't document prompts (e.g. the targeted pass) get
+    the marked document's text.
+    """
+
+    # Streamers only hand the tokenizer on to their own decode step
+    tokenizer = None
+
+    def __init__(self):
+        self.prompt_types = {}
+        for env_var, doc_type in PROMPT_ENV_VARS.items():
+            prompt = os.getenv(env_var)
+            if prompt:
+                self.prompt_types[prompt] = doc_type
+
+    def __call__(self, text=None, images=None, return_tensors=None, padding=None, **kwargs):
+        prompt = text[0] if text else ""
+        doc_type = marked_doc_type(images[0]) if images else None
+        asked_for = self.prompt_types.get(prompt)
+        if asked_for is not None and asked_for != doc_type:
+            doc_type = None
+        length = len(prompt.split()) + STUB_IMAGE_TOKENS * len(images or [])
+        return StubInputs(input_ids=StubShape(length), doc_type=doc_type)
+
+    def batch_decode(self, outputs, skip_special_tokens=True):
+        return [outputs.text]
+
+
+class StubModel:
+    """Stands in for SmolVLM's generate with canned, document-appropriate text"""
+
+    def __init__(self, latency: Optional[str] = None, failure_rate: Optional[float] = None,
+                 partial_rate: Optional[float] = None, seed: Optional[int] = None):
+        self.latency = LatencyDistribution(latency or os.getenv('STUB_LATENCY', 'fixed:0'))
+        self.failure_rate = failure_rate if failure_rate is not None else float(os.getenv('STUB_FAILURE_RATE', '0'))
+        self.partial_rate = partial_rate if partial_rate is not None else float(os.getenv('STUB_PARTIAL_RATE', '0'))
+        self._rng = random.Random(seed if seed is not None else int(os.getenv('STUB_SEED', '0')))
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def to(self, device):
+        return self
+
+    def eval(self):
+        return self
+
+    def generate(self, input_ids=None, doc_type=None, max_new_tokens=256, **kwargs):
+        with self._lock:
+            self.calls += 1
+            delay = self.latency.sample(self._rng)
+            roll = self._rng.random()
+            drop_roll = self._rng.random()
+
+        if delay > 0:
+            time.sleep(delay)
+
+        if roll < self.failure_rate:
+            raise StubInferenceError(f"Injected failure for {doc_type or 'unmarked image'}")
+
+        lines = CANNED_OUTPUTS.get(doc_type, "").split('\n')
+        if roll < self.failure_rate + self.partial_rate:
+            # Drop a slice of fields, as when the model stops early or misreads
+            keep = max(1, int(len(lines) * drop_roll))
+            lines = lines[:keep]
+
+        text = "\n".join(lines)
+        streamer = kwargs.get('streamer')
+        if streamer is not None:
+            # Already-decoded text, so skip the streamer's token handling
+            for index, line in enumerate(lines):
+                streamer.on_finalized_text(line + "\n", stream_end=index == len(lines) - 1)
+        generated_tokens = min(len(text.split()), max_new_tokens)
+        return StubOutput(text, input_ids.shape[-1] + generated_tokens)
+
+
+def create_stub_backend() -> Dict:
+    """Build the processor/model pair used when MODEL_BACKEND=stub"""
+    logger.info(
+        f"Using stub model backend (latency={os.getenv('STUB_LATENCY', 'fixed:0')}, "
+        f"failure_rate={os.getenv('STUB_FAILURE_RATE', '0')}, "
+        f"partial_rate={os.getenv('STUB_PARTIAL_RATE', '0')})"
+    )
+    return {'processor': StubProcessor(), 'model': StubModel()}
@@ -1,16 +1,305 @@
-from PIL import Image
+import re
 import os
 import logging
+from datetime import date
+from typing import Callable, Dict, List, Optional
+
+from .document_image import DocumentImage
 
 logger = logging.getLogger(__name__)
 
-def validate_image(image_path):
+def validate_image(image_source):
+    """Validate a path, downloaded bytes or DocumentImage from its header alone"""
     try:
-        with Image.open(image_path) as img:
-            if img.size[0] < 100 or img.size[1] < 100:
-                return False, "Image is too small"
-            if os.path.getsize(image_path) < 1024:
-                return False, "Image file is too small"
-            return True, "Image is valid"
+        if isinstance(image_source, DocumentImage):
+            return image_source.validate()
+        with DocumentImage(image_source) as document:
+            return document.validate()
     except Exception as e:
-        return False, f"Invalid image: {str(e)}" 
\ No newline at end of file
+        return False, f"Invalid image: {str(e)}"
+
+# Formatter placeholders meaning a field was not extracted
+MISSING_VALUES = {'', '-', 'not found'}
+
+
+def parse_formatted_text(text: str) -> Dict[str, str]:
+    """Parse a processor's "Field: value" output back into a dict"""
+    fields = {}
+    for line in (text or '').split('\n'):
+        if ':' not in line:
+            continue
+        key, value = line.split(':', 1)
+        fields[key.strip()] = value.strip()
+    return fields
+
+
+def is_missing(value) -> bool:
+    return value is None or value.strip().lower() in MISSING_VALUES
+
+
+# NRIC/FIN check letters by prefix (weights 2,7,6,5,4,3,2 plus a prefix offset)
+NRIC_WEIGHTS = (2, 7, 6, 5, 4, 3, 2)
+NRIC_OFFSETS = {'S': 0, 'T': 4, 'F': 0, 'G': 4, 'M': 3}
+NRIC_CHECK_LETTERS = {
+    'S': "JZIHGFEDCBA",
+    'T': "JZIHGFEDCBA",
+    'F': "XWUTRQPNMLK",
+    'G': "XWUTRQPNMLK",
+    'M': "KLJNPQRTUWX"
+}
+NRIC_PATTERN = re.compile(r'^([STFGM])(\d{7})([A-Z])$')
+
+# Singapore plates: 1-3 letter prefix, up to 4 digits, check letter
+PLATE_WEIGHTS = (9, 4, 5, 4, 3, 2)
+PLATE_CHECK_LETTERS = "AZYXUTSRPMLKJHGEDCB"
+PLATE_PATTERN = re.compile(r'^([A-Z]{1,3})(\d{1,4})([A-Z])$')
+
+CHASSIS_PATTERN = re.compile(r'^[A-Z0-9][A-Z0-9-]{5,19}$')
+VIN_PATTERN = re.compile(r'^[A-HJ-NPR-Z0-9]{17}$')
+NUMBER_PATTERN = re.compile(r'(\d[\d,]*(?:\.\d+)?)')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+MONTHS = {
+    'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6,
+    'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12
+}
+# Day-first numeric dates, "22 Jun 1971"/"22-Jun-1971" and ISO dates
+DATE_DMY_PATTERN = re.compile(r'^(\d{1,2})[/.\-](\d{1,2})[/.\-](\d{4})$')
+DATE_DMONY_PATTERN = re.compile(r'^(\d{1,2})[\s\-]([A-Za-z]{3})[A-Za-z]*[\s\-,]+(\d{4})$')
+DATE_ISO_PATTERN = re.compile(r'^(\d{4})-(\d{1,2})-(\d{1,2})$')
+
+
+def nric_check_letter(prefix: str, digits: str) -> str:
+    total = sum(int(d) * w for d, w in zip(digits, NRIC_WEIGHTS)) + NRIC_OFFSETS[prefix]
+    return NRIC_CHECK_LETTERS[prefix][total % 11]
+
+
+def plate_check_letter(prefix: str, digits: str) -> str:
+    # Only the last two prefix letters count; a single letter pairs with a zero
+    letters = prefix[-2:].rjust(2, '@')
+    values = [0 if c == '@' else ord(c) - 64 for c in letters]
+    values += [int(d) for d in digits.rjust(4, '0')]
+    return PLATE_CHECK_LETTERS[sum(v * w for v, w in zip(values, PLATE_WEIGHTS)) % 19]
+
+
+def parse_date(value: str) -> Optional[date]:
+    """Parse the date formats the processors emit, without strptime"""
+    value = value.strip()
+    try:
+        match = DATE_DMONY_PATTERN.match(value)
+        if match:
+            month = MONTHS.get(match.group(2).lower())
+            if month is None:
+                return None
+            return date(int(match.group(3)), month, int(match.group(1)))
+        match = DATE_DMY_PATTERN.match(value)
+        if match:
+            return date(int(match.group(3)), int(match.group(2)), int(match.group(1)))
+        match = DATE_ISO_PATTERN.match(value)
+        if match:
+            return date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+    except ValueError:
+        return None
+    return None
+
+
+def check_nric(value: str) -> Optional[str]:
+    match = NRIC_PATTERN.match(WHITESPACE_PATTERN.sub('', value).upper())
+    if not match:
+        return "not an NRIC/FIN number"
+    prefix, digits, letter = match.groups()
+    if nric_check_letter(prefix, digits) != letter:
+        return "NRIC/FIN check letter mismatch"
+    return None
+
+
+def check_plate(value: str) -> Optional[str]:
+    match = PLATE_PATTERN.match(WHITESPACE_PATTERN.sub('', value).upper())
+    if not match:
+        return "not a vehicle plate number"
+    prefix, digits, letter = match.groups()
+    if plate_check_letter(prefix, digits) != letter:
+        return "plate check letter mismatch"
+    return None
+
+
+def check_chassis(value: str) -> Optional[str]:
+    value = WHITESPACE_PATTERN.sub('', value).upper()
+    if len(value) == 17 and not VIN_PATTERN.match(value):
+        return "VIN contains invalid characters"
+    if not CHASSIS_PATTERN.match(value):
+        return "not a chassis number"
+    return None
+
+
+def check_sex(value: str) -> Optional[str]:
+    if value.strip().upper() not in ('M', 'F', 'MALE', 'FEMALE'):
+        return "sex must be M or F"
+    return None
+
+
+def date_check(min_years_ago: Optional[int] = None, max_years_ahead: int = 0, earliest: int = 1900):
+    """Build a check accepting dates from `earliest` up to `max_years_ahead` from today.
+
+    `min_years_ago` additionally requires the date to be at least that far in the past.
+    """
+    def check(value: str) -> Optional[str]:
+        parsed = parse_date(value)
+        if parsed is None:
+            return "unrecognised date"
+        today = date.today()
+        if parsed.year < earliest:
+            return f"date before {earliest}"
+        if parsed.year > today.year + max_years_ahead:
+            return "date too far in the future"
+        if max_years_ahead == 0 and parsed > today:
+            return "date in the future"
+        if min_years_ago is not None and parsed.year > today.year - min_years_ago:
+            return f"date less than {min_years_ago} years ago"
+        return None
+    return check
+
+
+def number_check(low: float, high: float, label: str):
+    """Build a check for a number (units and thousands separators allowed) within a range"""
+    def check(value: str) -> Optional[str]:
+        match = NUMBER_PATTERN.search(value)
+        if not match:
+            return f"{label} is not a number"
+        number = float(match.group(1).replace(',', ''))
+        if not low <= number <= high:
+            return f"{label} {number:g} outside {low:g}-{high:g}"
+        return None
+    return check
+
+
+def year_check(earliest: int = 1950):
+    def check(value: str) -> Optional[str]:
+        value = value.strip()
+        if not value.isdigit() or len(value) != 4:
+            return "not a year"
+        if not earliest <= int(value) <= date.today().year + 1:
+            return "year out of range"
+        return None
+    return check
+
+
+class ValidationResult:
+    __slots__ = ('missing', 'invalid', 'decision')
+
+    def __init__(self, missing: List[str], invalid: Dict[str, str], decision: str):
+        self.missing = missing
+        self.invalid = invalid
+        self.decision = decision
+
+    @property
+    def accepted(self) -> bool:
+        return self.decision == ValidationEngine.ACCEPT
+
+    @property
+    def retry_fields(self) -> List[str]:
+        return self.missing + list(self.invalid)
+
+
+class ValidationEngine:
+    """Cheap per-field checks run on a parsed extraction before it is accepted.
+
+    Rules are built once per document type; validating a dict is a handful of
+    precompiled regex matches and integer arithmetic.
+    """
+
+    ACCEPT = 'accept'
+    RETRY = 'retry'
+    FALLBACK = 'fallback'
+
+    def __init__(self, rules: Dict[str, Callable[[str], Optional[str]]], required_fields: List[str],
+                 retry_limit: int = 4):
+        self.rules = rules
+        self.required_fields = required_fields
+        self.retry_limit = retry_limit
+
+    def check_fields(self, data: Dict[str, str], fields) -> Dict[str, str]:
+        """Run the rules for `fields` that have a value; returns field -> reason"""
+        invalid = {}
+        for field in fields:
+            rule = self.rules.get(field)
+            value = data.get(field)
+            if rule is None or is_missing(value):
+                continue
+            reason = rule(value)
+            if reason is not None:
+                invalid[field] = reason
+        return invalid
+
+    def validate(self, data: Dict[str, str], fields=(), optional_fields=()) -> ValidationResult:
+        """Decide whether to accept the extraction, retry some fields or fall back.
+
+        Required fields must be present; other `fields` count as missing unless
+        listed in `optional_fields`. Invalid values count wherever they are.
+        """
+        missing = [field for field in self.required_fields if is_missing(data.get(field))]
+        for field in fields:
+            if field not in self.required_fields and field not in optional_fields and \
+                    is_missing(data.get(field)):
+                missing.append(field)
+        invalid = self.check_fields(data, self.rules)
+
+        problems = len(missing) + len(invalid)
+        if problems == 0:
+            decision = self.ACCEPT
+        elif problems <= self.retry_limit:
+            decision = self.RETRY
+        else:
+            decision = self.FALLBACK
+        return ValidationResult(missing, invalid, decision)
+
+
+ID_CARD_RULES = {
+    "Name": lambda value: None if len(value.strip()) >= 2 else "name too short",
+    "Date of birth": date_check(min_years_ago=15),
+    "Sex": check_sex,
+    "ID Number": check_nric
+}
+
+DRIVERS_LICENSE_RULES = {
+    "Name": lambda value: None if len(value.strip()) >= 2 else "name too short",
+    "License Number": check_nric,
+    "Date of birth": date_check(min_years_ago=16),
+    "Issue Date": date_check(earliest=1950)
+}
+
+LOG_CARD_RULES = {
+    "Vehicle No": check_plate,
+    "Chassis No": check_chassis,
+    "Engine Capacity": number_check(50, 10000, "engine capacity"),
+    "Maximum Laden Weight": number_check(100, 60000, "laden weight"),
+    "Unladen Weight": number_check(100, 40000, "unladen weight"),
+    "Year Of Manufacture": year_check(),
+    "PQP Paid": number_check(0, 500000, "PQP"),
+    "Original Registration Date": date_check(earliest=1950),
+    "COE Expiry Date": date_check(earliest=1990, max_years_ahead=11),
+    "Road Tax Expiry Date": date_check(earliest=1990, max_years_ahead=2),
+    "PARF Eligibility Expiry Date": date_check(earliest=1990, max_years_ahead=11),
+    "Inspection Due Date": date_check(earliest=1990, max_years_ahead=3)
+}
+
+DOCUMENT_RULES = {
+    'id_card': ID_CARD_RULES,
+    'drivers_license': DRIVERS_LICENSE_RULES,
+    'log_card': LOG_CARD_RULES
+}
+
+_engines: Dict[str, ValidationEngine] = {}
+
+
+def get_validation_engine(doc_type: str, required_fields: List[str]) -> ValidationEngine:
+    """Shared engine per document type, built on first use"""
+    engine = _engines.get(doc_type)
+    if engine is None:
+        engine = ValidationEngine(
+            DOCUMENT_RULES.get(doc_type, {}),
+            required_fields,
+            int(os.getenv('VALIDATION_RETRY_LIMIT', '4'))
+        )
+        _engines[doc_type] = engine
+    return engine
@@ -0,0 +1,120 @@
+import os
+import json
+import mmap
+import glob
+import struct
+import logging
+from typing import Dict, List
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+# safetensors dtype tags to torch dtypes
+SAFETENSORS_DTYPES = {
+    "F64": torch.float64,
+    "F32": torch.float32,
+    "F16": torch.float16,
+    "BF16": torch.bfloat16,
+    "I64": torch.int64,
+    "I32": torch.int32,
+    "I16": torch.int16,
+    "I8": torch.int8,
+    "U8": torch.uint8,
+    "BOOL": torch.bool,
+}
+
+
+class WeightLoadError(Exception):
+    """Raised when weights cannot be memory-mapped into the model"""
+    pass
+
+
+def find_safetensors_files(model_id: str) -> List[str]:
+    """Locate the safetensors shards of a model, downloading them if needed"""
+    if os.path.isdir(model_id):
+        model_dir = model_id
+    else:
+        from huggingface_hub import snapshot_download
+        model_dir = snapshot_download(
+            model_id,
+            allow_patterns=["*.safetensors", "*.json"],
+            local_files_only=os.getenv('HF_HUB_OFFLINE', '0') == '1'
+        )
+
+    files = sorted(glob.glob(os.path.join(model_dir, "*.safetensors")))
+    if not files:
+        raise WeightLoadError(f"No safetensors files found for {model_id}")
+    return files
+
+
+def load_mmap_state_dict(paths: List[str]) -> Dict[str, torch.Tensor]:
+    """Build a state dict whose tensors point straight into mmapped files.
+
+    The mappings are private copy-on-write, so every worker process reading
+    the same checkpoint shares the page cache until a tensor is written to.
+    """
+    state_dict = {}
+    for path in paths:
+        with open(path, 'rb') as f:
+            header_size = struct.unpack('<Q', f.read(8))[0]
+            header = json.loads(f.read(header_size))
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+        data_start = 8 + header_size
+        for name, info in header.items():
+            if name == "__metadata__":
+                continue
+
+            dtype = SAFETENSORS_DTYPES.get(info['dtype'])
+            if dtype is None:
+                raise WeightLoadError(f"Unsupported dtype {info['dtype']} for {name}")
+
+            begin, end = info['data_offsets']
+            item_size = torch.empty((), dtype=dtype).element_size()
+            count = (end - begin) // item_size
+            if count == 0:
+                state_dict[name] = torch.empty(info['shape'], dtype=dtype)
+                continue
+
+            tensor = torch.frombuffer(buffer, dtype=dtype, count=count, offset=data_start + begin)
+            state_dict[name] = tensor.reshape(info['shape'])
+
+    return state_dict
+
+
+def load_model_mmap(model_id: str, model_class, torch_dtype=None, **kwargs):
+    """Instantiate `model_class` and assign memory-mapped weights to it.
+
+    Tensors keep the checkpoint dtype unless `torch_dtype` differs from it;
+    converting copies the weights into anonymous memory and loses the
+    sharing between workers.
+    """
+    from transformers import AutoConfig
+    from transformers.modeling_utils import no_init_weights
+
+    paths = find_safetensors_files(model_id)
+    state_dict = load_mmap_state_dict(paths)
+    dtype = next(iter(state_dict.values())).dtype
+
+    config = AutoConfig.from_pretrained(model_id, **kwargs)
+    with no_init_weights():
+        model = model_class.from_config(config, torch_dtype=dtype, **kwargs)
+
+    missing, unexpected = model.load_state_dict(state_dict, strict=False, assign=True)
+    model.tie_weights()
+
+    # Tied weights are reported missing even though tie_weights filled them
+    tied = {name for name, _ in model.named_parameters(remove_duplicate=False)} - \
+        {name for name, _ in model.named_parameters()}
+    missing = [key for key in missing if key not in tied]
+    if missing or unexpected:
+        raise WeightLoadError(
+            f"Checkpoint does not match model: {len(missing)} missing, {len(unexpected)} unexpected keys"
+        )
+
+    logger.info(f"Memory-mapped {len(state_dict)} {dtype} tensors from {len(paths)} file(s)")
+    if torch_dtype is not None and torch_dtype != dtype:
+        logger.warning(f"Converting memory-mapped {dtype} weights to {torch_dtype}; they are no longer shared")
+        model.to(torch_dtype)
+    return model
@@ -0,0 +1,232 @@
+import os
+import time
+import logging
+import threading
+from typing import Dict, List, Mapping, Optional
+
+from model.records import DocumentRecord, RecordSet, from_bytes, record_type
+from services import metrics
+from services.retry_scheduler import RetryableError, retry_scheduler as default_retry_scheduler
+
+logger = logging.getLogger(__name__)
+
+# Documents each applicant uploads, in the order the bot asks for them
+DOCUMENT_TYPES = ('id_card', 'drivers_license', 'log_card')
+
+APPLICANT_WRITES = metrics.registry.counter(
+    'gobingo_applicant_writes_total',
+    'Monday.com writes for merged applicant items, by operation and outcome'
+)
+APPLICANTS_PENDING = metrics.registry.gauge(
+    'gobingo_applicants_pending',
+    'Applicants with documents not yet written to Monday.com'
+)
+
+
+class ApplicantRecord:
+    def __init__(self, chat_id: str):
+        self.chat_id = chat_id
+        # Each upload's new fields as a binary record (model.records), in
+        # upload order, compact while the applicant is held for up to a day
+        self.records: List[bytes] = []
+        self.documents = set()
+        self.item_id: Optional[str] = None
+        # Set while the item's create is waiting in the retry scheduler
+        self.deferred = False
+        self.updated_at = time.time()
+
+    @property
+    def complete(self) -> bool:
+        return all(doc_type in self.documents for doc_type in DOCUMENT_TYPES)
+
+    @property
+    def fields(self) -> RecordSet:
+        """Every document's fields as one mapping, for the Monday mapper"""
+        return RecordSet(from_bytes(data) for data in self.records)
+
+    def merge(self, doc_type: str, fields: Mapping) -> DocumentRecord:
+        """Add a document's record or parsed fields, keeping values already
+        read; return the new fields as a record"""
+        held = self.fields
+        # from_fields drops placeholders like '-' and labels the document doesn't have
+        added = record_type(doc_type).from_fields(
+            {field: value for field, value in fields.items() if field not in held}
+        )
+        if added:
+            self.records.append(added.to_bytes())
+        self.documents.add(doc_type)
+        self.updated_at = time.time()
+        return added
+
+
+class ApplicantAggregator:
+    """Collect one applicant's fields across the ID card, licence and log card
+    uploads and write them to Monday.com as a single item.
+
+    In the default 'final' mode the item is created once all three documents
+    are in. 'incremental' mode creates the item on the first upload and adds
+    the later documents' columns with change_multiple_column_values, so the
+    board fills in as the applicant goes. Either way it is one item per
+    applicant, not one per document.
+
+    Documents are held, and handed to the Monday mapper, as the typed records
+    from model.records. Writes that fail transiently are handed to the retry
+    scheduler with those records in binary form, keyed by chat so later
+    documents coalesce into the same pending write.
+    """
+
+    def __init__(self, monday_service=None, mode: Optional[str] = None, ttl: Optional[float] = None,
+                 retry_scheduler=None):
+        self._monday_service = monday_service
+        self.retry_scheduler = retry_scheduler or default_retry_scheduler
+        # Registered up front so retries restored from disk have a handler
+        # before anything builds the Monday.com client; building it replaces
+        # these with its own handlers
+        self.retry_scheduler.register('monday_create', lambda payload: self.monday_service.retry_create(payload))
+        self.retry_scheduler.register('monday_update', lambda payload: self.monday_service.retry_update(payload))
+        self.retry_scheduler.on_success('monday_create', self._on_created)
+        self.mode = (mode or os.getenv('MONDAY_WRITE_MODE', 'final')).lower()
+        # Applicants who never finish are dropped after this long
+        self.ttl = ttl if ttl is not None else float(os.getenv('APPLICANT_TTL_SECONDS', str(24 * 3600)))
+        self._records: Dict[str, ApplicantRecord] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def monday_service(self):
+        if self._monday_service is None:
+            from services.monday_service import MondayService
+            self._monday_service = MondayService(self.retry_scheduler)
+        return self._monday_service
+
+    def _expire(self, now: float):
+        expired = [chat_id for chat_id, record in self._records.items() if now - record.updated_at > self.ttl]
+        for chat_id in expired:
+            logger.warning(f"Dropping incomplete applicant {chat_id} after {self.ttl:.0f}s")
+            del self._records[chat_id]
+
+    def pending_chats(self) -> List[str]:
+        """Chats with documents held here that are not yet written to Monday.com"""
+        with self._lock:
+            return list(self._records)
+
+    def get(self, chat_id: str) -> Optional[ApplicantRecord]:
+        with self._lock:
+            return self._records.get(chat_id)
+
+    def add_document(self, chat_id: str, doc_type: str, fields: Mapping) -> bool:
+        """Merge a processed document into the applicant's item; False if a write failed"""
+        with self._lock:
+            self._expire(time.time())
+            record = self._records.get(chat_id)
+            if record is None:
+                record = self._records[chat_id] = ApplicantRecord(chat_id)
+            added = record.merge(doc_type, fields)
+            APPLICANTS_PENDING.set(len(self._records))
+
+        if self.mode == 'incremental':
+            return self._write_incremental(record, RecordSet([added]))
+        if record.complete:
+            return self.flush(chat_id)
+        logger.info(f"Holding {doc_type} for {chat_id} until all documents are in ({sorted(record.documents)})")
+        return True
+
+    def _retry_key(self, chat_id: str) -> str:
+        return f"applicant:{chat_id}"
+
+    def _defer(self, operation: str, payload: Dict, chat_id: str, error: RetryableError):
+        logger.warning(f"Monday.com write for {chat_id} deferred: {str(error)}")
+        APPLICANT_WRITES.inc(operation=operation, outcome='deferred')
+        self.retry_scheduler.schedule(
+            operation, payload, key=self._retry_key(chat_id), retry_after=error.retry_after, error=str(error)
+        )
+
+    def _write_incremental(self, record: ApplicantRecord, added: RecordSet) -> bool:
+        if record.deferred:
+            # The pending create picks these fields up once it goes through
+            return True
+
+        if record.item_id is None:
+            try:
+                item_id = self.monday_service.create_policy_item_id(record.fields)
+            except RetryableError as e:
+                record.deferred = True
+                self._defer('monday_create', {'records': record.fields.to_json(), 'chat_id': record.chat_id},
+                            record.chat_id, e)
+                return True
+            APPLICANT_WRITES.inc(operation='create_item', outcome='success' if item_id else 'failure')
+            if item_id is None:
+                return False
+            record.item_id = item_id
+        elif added:
+            try:
+                updated = self.monday_service.update_policy_item(record.item_id, added)
+            except RetryableError as e:
+                self._defer('monday_update', {'item_id': record.item_id, 'records': added.to_json()},
+                            record.chat_id, e)
+                updated = True
+            else:
+                APPLICANT_WRITES.inc(operation='change_multiple_column_values',
+                                     outcome='success' if updated else 'failure')
+            if not updated:
+                return False
+
+        if record.complete:
+            self.discard(record.chat_id)
+        return True
+
+    def _on_created(self, job: Dict, item_id: str):
+        """A deferred create went through; send what arrived in the meantime"""
+        chat_id = job['payload'].get('chat_id')
+        with self._lock:
+            record = self._records.get(chat_id)
+            if record is None or not record.deferred:
+                return
+            record.item_id = item_id
+            record.deferred = False
+            sent = RecordSet.from_json(job['payload'].get('records', []))
+            extra = record.fields.without(sent)
+
+        if extra:
+            self._write_incremental(record, extra)
+        elif record.complete:
+            self.discard(chat_id)
+
+    def flush(self, chat_id: str) -> bool:
+        """Write whatever has been collected for an applicant as one item"""
+        record = self.get(chat_id)
+        if record is None:
+            return True
+
+        try:
+            if record.item_id is not None:
+                created = self.monday_service.update_policy_item(record.item_id, record.fields)
+                operation = 'change_multiple_column_values'
+            else:
+                record.item_id = self.monday_service.create_policy_item_id(record.fields)
+                created = record.item_id is not None
+                operation = 'create_item'
+        except RetryableError as e:
+            if record.item_id is not None:
+                self._defer('monday_update', {'item_id': record.item_id, 'records': record.fields.to_json()},
+                            chat_id, e)
+            else:
+                self._defer('monday_create', {'records': record.fields.to_json(), 'chat_id': chat_id}, chat_id, e)
+            # The retry scheduler owns the write from here
+            self.discard(chat_id)
+            return True
+        APPLICANT_WRITES.inc(operation=operation, outcome='success' if created else 'failure')
+
+        if created:
+            self.discard(chat_id)
+        else:
+            # Kept so the next upload or a later flush can try again
+            logger.error(f"Could not write applicant {chat_id} to Monday.com")
+        return created
+
+    def discard(self, chat_id: str):
+        with self._lock:
+            self._records.pop(chat_id, None)
+            APPLICANTS_PENDING.set(len(self._records))
+
+
+applicant_aggregator = ApplicantAggregator()
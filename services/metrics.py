@@ -0,0 +1,293 @@
+import os
+import time
+import bisect
+import threading
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds, from fast parsing steps up to slow CPU generation
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80)
+
+# Label buckets keep token counts and image sizes from exploding series cardinality
+TOKEN_LABEL_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048)
+PROMPT_TOKEN_BUCKETS = (256, 512, 1024, 2048, 4096, 8192, 16384)
+IMAGE_LABEL_BUCKETS = (256, 512, 768, 1024, 1536, 2048, 4096)
+
+
+def bucket_label(value: Optional[int], buckets: Tuple[int, ...]) -> str:
+    """Map a numeric value onto a bounded set of label values"""
+    if value is None:
+        return ""
+    for bound in buckets:
+        if value <= bound:
+            return f"le{bound}"
+    return f"gt{buckets[-1]}"
+
+
+def image_size_label(size) -> str:
+    """Label for an image (width, height) by its longest side"""
+    if not size:
+        return ""
+    return bucket_label(max(size), IMAGE_LABEL_BUCKETS)
+
+
+def token_count_label(count: Optional[int]) -> str:
+    """Label for a prompt or generated token count"""
+    return bucket_label(count, TOKEN_LABEL_BUCKETS)
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...], extra: str = "") -> str:
+    parts = [f'{key}="{value}"' for key, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def values(self) -> Dict[Tuple, float]:
+        with self._lock:
+            return dict(self._values)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in self._values.items():
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            for key, value in self._values.items():
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, description: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[Tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = [[0] * (len(self.buckets) + 1), 0.0, 0]
+                self._series[key] = series
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def totals(self) -> Dict[Tuple, Tuple[float, int]]:
+        """(sum, count) per label set"""
+        with self._lock:
+            return {key: (series[1], series[2]) for key, series in self._series.items()}
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in self._series.items():
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    le = 'le="%s"' % bound
+                    lines.append(f"{self.name}_bucket{_format_labels(key, le)} {cumulative}")
+                le = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{_format_labels(key, le)} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, description, *args):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = cls(name, description, *args)
+            return self._metrics[name]
+
+    def counter(self, name: str, description: str) -> Counter:
+        return self._get_or_create(Counter, name, description)
+
+    def gauge(self, name: str, description: str) -> Gauge:
+        return self._get_or_create(Gauge, name, description)
+
+    def histogram(self, name: str, description: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, description, buckets)
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.histogram(
+    'gobingo_stage_seconds',
+    'Time spent in each stage of the extraction pipeline'
+)
+GENERATED_TOKENS = registry.histogram(
+    'gobingo_generated_tokens',
+    'Tokens generated per model call',
+    TOKEN_LABEL_BUCKETS
+)
+PROMPT_TOKENS = registry.histogram(
+    'gobingo_prompt_tokens',
+    'Prompt tokens per model call, dominated by image tokens',
+    PROMPT_TOKEN_BUCKETS
+)
+
+_enabled = os.getenv('METRICS_ENABLED', 'false').lower() == 'true'
+_listeners: List[Callable[[str, float, Dict[str, str]], None]] = []
+# Listeners that need spans timed even with metrics disabled
+_always_listeners: List[Callable[[str, float, Dict[str, str]], None]] = []
+# How many of those are registered; span() only times when this or _enabled is set
+_listen_always = 0
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def add_listener(listener: Callable[[str, float, Dict[str, str]], None], always: bool = False):
+    """Receive every finished span as (stage, seconds, labels), e.g. for benchmarks.
+
+    With `always`, spans are timed for listeners even while metrics are
+    disabled; they are still only exported when enabled.
+    """
+    global _listen_always
+    _listeners.append(listener)
+    if always:
+        _always_listeners.append(listener)
+        _listen_always = len(_always_listeners)
+
+
+def remove_listener(listener: Callable[[str, float, Dict[str, str]], None]):
+    global _listen_always
+    if listener in _listeners:
+        _listeners.remove(listener)
+    if listener in _always_listeners:
+        _always_listeners.remove(listener)
+        _listen_always = len(_always_listeners)
+
+
+class _Span:
+    __slots__ = ('stage', 'labels', '_start')
+
+    def __init__(self, stage: str, labels: Dict[str, str]):
+        self.stage = stage
+        self.labels = labels
+        self._start = 0.0
+
+    def set(self, **labels):
+        """Attach labels only known once the stage has run, e.g. token counts"""
+        self.labels.update(labels)
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self._start
+        if exc_type is not None:
+            self.labels['error'] = exc_type.__name__
+        if _enabled:
+            STAGE_SECONDS.observe(elapsed, stage=self.stage, **self.labels)
+        for listener in _listeners:
+            try:
+                listener(self.stage, elapsed, self.labels)
+            except Exception as e:
+                logger.debug(f"Metrics listener failed: {str(e)}")
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def set(self, **labels):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(stage: str, **labels):
+    """Time a pipeline stage; a shared no-op object when metrics are disabled"""
+    if not _enabled and not _listen_always:
+        return _NULL_SPAN
+    return _Span(stage, labels)
+
+
+def observe_tokens(count: int, **labels):
+    if _enabled:
+        GENERATED_TOKENS.observe(count, **labels)
+
+
+def observe_prompt_tokens(count: int, **labels):
+    if _enabled:
+        PROMPT_TOKENS.observe(count, **labels)
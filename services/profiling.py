@@ -0,0 +1,188 @@
+import os
+import sys
+import time
+import uuid
+import random
+import logging
+import threading
+from collections import Counter
+from contextlib import contextmanager, ExitStack
+from typing import Dict, Optional
+
+from services import metrics
+from services.tracing import current_request_id
+
+logger = logging.getLogger(__name__)
+
+PROFILES_CAPTURED = metrics.registry.counter(
+    'gobingo_profiles_captured_total',
+    'Stack profiles saved, by operation and reason (slow or sampled)'
+)
+
+# Innermost frames kept per sample; deeper stacks are cut at the root end
+MAX_STACK_DEPTH = 128
+
+
+def _collapse(frame) -> str:
+    """One sample as a root-first "file:function;..." line, as flamegraph.pl reads"""
+    names = []
+    while frame is not None and len(names) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    names.reverse()
+    return ';'.join(names)
+
+
+class StackSampler:
+    """Samples the Python stacks of registered threads from one background thread.
+
+    Only threads inside a profiled() block are sampled, so the cost when
+    nothing is being profiled is one idle thread.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._targets: Dict[int, Counter] = {}
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, thread_id: int) -> bool:
+        with self._condition:
+            if thread_id in self._targets:
+                return False
+            self._targets[thread_id] = Counter()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+                self._thread.start()
+            self._condition.notify()
+            return True
+
+    def remove(self, thread_id: int) -> Counter:
+        with self._condition:
+            return self._targets.pop(thread_id, Counter())
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._targets:
+                    self._condition.wait()
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._condition:
+                for thread_id, samples in self._targets.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        samples[_collapse(frame)] += 1
+            del frames
+
+
+class Profiler:
+    """Opt-in profiling of whole requests (PROFILING_ENABLED=true).
+
+    Every profiled request's thread is stack-sampled every
+    PROFILE_INTERVAL_MS. The samples are kept when the request takes at least
+    PROFILE_SLOW_SECONDS, or for a PROFILE_SAMPLE_RATE fraction of requests,
+    and written to PROFILE_DIR as a collapsed-stack file (flamegraph.pl,
+    speedscope) named after the operation and request ID. Sampled requests
+    also record a torch profiler trace when PROFILE_TORCH=true; a slow request
+    can't, because the torch profiler has to be running from the start.
+
+    Once PROFILE_DIR holds more than PROFILE_MAX_MB, the oldest files are
+    deleted.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv('PROFILING_ENABLED', 'false').lower() == 'true'
+        self.directory = os.getenv('PROFILE_DIR', 'data/profiles')
+        self.slow_seconds = float(os.getenv('PROFILE_SLOW_SECONDS', '20'))
+        self.sample_rate = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))
+        self.torch_trace = os.getenv('PROFILE_TORCH', 'false').lower() == 'true'
+        self.max_bytes = int(float(os.getenv('PROFILE_MAX_MB', '200')) * 1024 * 1024)
+        self.sampler = StackSampler(float(os.getenv('PROFILE_INTERVAL_MS', '10')) / 1000)
+        self._prune_lock = threading.Lock()
+
+    @contextmanager
+    def profile(self, operation: str, request_id: Optional[str] = None):
+        thread_id = threading.get_ident()
+        # Nested profiled calls on the same thread belong to the outer profile
+        if not self.enabled or not self.sampler.add(thread_id):
+            yield
+            return
+
+        request_id = request_id or current_request_id() or uuid.uuid4().hex[:12]
+        sampled = random.random() < self.sample_rate
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                trace = self._start_torch_trace(stack) if sampled and self.torch_trace else None
+                yield
+        finally:
+            elapsed = time.perf_counter() - start
+            samples = self.sampler.remove(thread_id)
+            reason = 'slow' if elapsed >= self.slow_seconds else 'sampled' if sampled else None
+            if reason is not None:
+                self._save(operation, request_id, reason, elapsed, samples, trace)
+
+    def _start_torch_trace(self, stack: ExitStack):
+        try:
+            import torch
+            activities = [torch.profiler.ProfilerActivity.CPU]
+            if torch.cuda.is_available():
+                activities.append(torch.profiler.ProfilerActivity.CUDA)
+            return stack.enter_context(torch.profiler.profile(activities=activities))
+        except Exception as e:
+            logger.warning(f"Could not start torch profiler: {str(e)}")
+            return None
+
+    def _save(self, operation: str, request_id: str, reason: str, elapsed: float, samples: Counter, trace):
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{operation}-{request_id}")
+        try:
+            with open(base + '.collapsed', 'w') as f:
+                for stack, count in samples.most_common():
+                    f.write(f"{stack} {count}\n")
+            if trace is not None:
+                trace.export_chrome_trace(base + '.trace.json')
+        except Exception as e:
+            logger.error(f"Could not save profile {base}: {str(e)}")
+            return
+        PROFILES_CAPTURED.inc(operation=operation, reason=reason)
+        logger.info(f"Saved {reason} profile of {operation} {request_id} ({elapsed:.1f}s) to {base}.collapsed")
+        self._prune()
+
+    def _prune(self):
+        """Delete the oldest profiles until the directory is within PROFILE_MAX_MB"""
+        with self._prune_lock:
+            try:
+                entries = [entry for entry in os.scandir(self.directory) if entry.is_file()]
+            except OSError:
+                return
+            files = sorted((entry.stat().st_mtime, entry.stat().st_size, entry.path) for entry in entries)
+            total = sum(size for _, size, _ in files)
+            for _, size, path in files:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError as e:
+                    logger.warning(f"Could not delete old profile {path}: {str(e)}")
+
+
+_profiler = None
+_profiler_lock = threading.Lock()
+
+
+def get_profiler() -> Profiler:
+    global _profiler
+    if _profiler is None:
+        with _profiler_lock:
+            if _profiler is None:
+                _profiler = Profiler()
+    return _profiler
+
+
+def profiled(operation: str, request_id: Optional[str] = None):
+    """Profile the enclosed block if profiling is enabled; see Profiler"""
+    return get_profiler().profile(operation, request_id)
@@ -0,0 +1,270 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+from typing import Dict, Optional
+
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+CIRCUIT_STATE = metrics.registry.gauge(
+    'gobingo_circuit_state',
+    'Circuit breaker state per dependency: 0 closed, 1 half-open, 2 open'
+)
+BULKHEAD_IN_USE = metrics.registry.gauge(
+    'gobingo_bulkhead_in_use',
+    'Calls in flight per dependency'
+)
+DEPENDENCY_REJECTIONS = metrics.registry.counter(
+    'gobingo_dependency_rejections_total',
+    'Calls failed fast without reaching the dependency, by reason'
+)
+DEPENDENCY_CALLS = metrics.registry.counter(
+    'gobingo_dependency_calls_total',
+    'Calls that reached a dependency, by outcome'
+)
+
+
+class DependencyUnavailableError(Exception):
+    """Base for calls rejected before reaching the dependency"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(DependencyUnavailableError):
+    pass
+
+
+class BulkheadFullError(DependencyUnavailableError):
+    pass
+
+
+def _env(name: str, key: str, default: str) -> str:
+    return os.getenv(f"{name.upper()}_{key}", default)
+
+
+class Bulkhead:
+    """Cap on concurrent calls to one dependency, so a slow one can only tie
+    up its own share of worker threads"""
+
+    def __init__(self, name: str, max_concurrent: int, max_wait: float):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_wait = max_wait
+        self._semaphore = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self.in_use = 0
+
+    def acquire(self):
+        if not self._semaphore.acquire(timeout=self.max_wait):
+            raise BulkheadFullError(f"{self.name}: {self.max_concurrent} calls already in flight")
+        with self._lock:
+            self.in_use += 1
+            BULKHEAD_IN_USE.set(self.in_use, dependency=self.name)
+
+    def release(self):
+        with self._lock:
+            self.in_use -= 1
+            BULKHEAD_IN_USE.set(self.in_use, dependency=self.name)
+        self._semaphore.release()
+
+
+class CircuitBreaker:
+    """Trip on error rate or slow-call rate over the last `window` calls.
+
+    Open circuits reject calls immediately. After `open_seconds` a limited
+    number of probe calls are let through (half-open); a successful probe
+    closes the circuit and a failed one opens it again.
+    """
+
+    CLOSED = 'closed'
+    HALF_OPEN = 'half_open'
+    OPEN = 'open'
+    STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, name: str, window: int, min_calls: int, error_rate: float,
+                 slow_seconds: float, slow_rate: float, open_seconds: float, probes: int):
+        self.name = name
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_seconds = slow_seconds
+        self.slow_rate = slow_rate
+        self.open_seconds = open_seconds
+        self.probes = probes
+        self._outcomes = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._probes_in_flight = 0
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self.last_trip_reason: Optional[str] = None
+        CIRCUIT_STATE.set(0, dependency=name)
+
+    def _set_state(self, state: str):
+        if state != self.state:
+            logger.warning(f"Circuit for {self.name}: {self.state} -> {state}")
+        self.state = state
+        CIRCUIT_STATE.set(self.STATE_VALUES[state], dependency=self.name)
+
+    def _trip(self, reason: str):
+        self.opened_at = time.monotonic()
+        self.last_trip_reason = reason
+        self._outcomes.clear()
+        self._set_state(self.OPEN)
+
+    def retry_after(self) -> float:
+        return max(0.0, self.opened_at + self.open_seconds - time.monotonic())
+
+    def before_call(self) -> bool:
+        """Admit a call or raise CircuitOpenError; True if the call is a probe"""
+        with self._lock:
+            if self.state == self.OPEN:
+                if self.retry_after() > 0:
+                    raise CircuitOpenError(f"{self.name} circuit is open", self.retry_after())
+                self._set_state(self.HALF_OPEN)
+            if self.state == self.HALF_OPEN:
+                if self._probes_in_flight >= self.probes:
+                    raise CircuitOpenError(f"{self.name} circuit is half-open, probe in flight", self.open_seconds)
+                self._probes_in_flight += 1
+                return True
+            return False
+
+    def after_call(self, probe: bool, success: bool, seconds: float):
+        slow = seconds >= self.slow_seconds
+        with self._lock:
+            if probe:
+                self._probes_in_flight -= 1
+                if success and not slow:
+                    self._set_state(self.CLOSED)
+                else:
+                    self._trip('probe failed' if not success else 'probe slow')
+                return
+
+            if self.state != self.CLOSED:
+                return
+            self._outcomes.append((success, slow))
+            calls = len(self._outcomes)
+            if calls < self.min_calls:
+                return
+            failures = sum(1 for ok, _ in self._outcomes if not ok)
+            slow_calls = sum(1 for _, was_slow in self._outcomes if was_slow)
+            if failures / calls >= self.error_rate:
+                self._trip(f"error rate {failures}/{calls}")
+            elif slow_calls / calls >= self.slow_rate:
+                self._trip(f"slow calls {slow_calls}/{calls} over {self.slow_seconds}s")
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            calls = len(self._outcomes)
+            return {
+                'state': self.state,
+                'recent_calls': calls,
+                'recent_failures': sum(1 for ok, _ in self._outcomes if not ok),
+                'recent_slow_calls': sum(1 for _, slow in self._outcomes if slow),
+                'retry_after_seconds': round(self.retry_after(), 3) if self.state == self.OPEN else 0.0,
+                'last_trip_reason': self.last_trip_reason
+            }
+
+
+class _Call:
+    __slots__ = ('dependency', 'probe', 'success', '_start', '_admitted')
+
+    def __init__(self, dependency):
+        self.dependency = dependency
+        self.probe = False
+        self.success = True
+        self._start = 0.0
+        self._admitted = False
+
+    def failed(self):
+        """Count the call as failed without raising, e.g. for a 5xx response"""
+        self.success = False
+
+    def __enter__(self):
+        dependency = self.dependency
+        try:
+            self.probe = dependency.breaker.before_call()
+        except CircuitOpenError:
+            DEPENDENCY_REJECTIONS.inc(dependency=dependency.name, reason='circuit_open')
+            raise
+        if dependency.bulkhead is not None:
+            try:
+                dependency.bulkhead.acquire()
+            except BulkheadFullError:
+                if self.probe:
+                    dependency.breaker.after_call(True, False, 0.0)
+                DEPENDENCY_REJECTIONS.inc(dependency=dependency.name, reason='bulkhead_full')
+                raise
+        self._admitted = True
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if not self._admitted:
+            return False
+        elapsed = time.perf_counter() - self._start
+        if exc_type is not None:
+            self.success = False
+        if self.dependency.bulkhead is not None:
+            self.dependency.bulkhead.release()
+        self.dependency.breaker.after_call(self.probe, self.success, elapsed)
+        DEPENDENCY_CALLS.inc(dependency=self.dependency.name, outcome='success' if self.success else 'failure')
+        return False
+
+
+class Dependency:
+    """Bulkhead plus circuit breaker for one downstream service.
+
+    Settings come from <NAME>_MAX_CONCURRENCY, <NAME>_BULKHEAD_WAIT,
+    <NAME>_CIRCUIT_WINDOW, <NAME>_CIRCUIT_MIN_CALLS, <NAME>_CIRCUIT_ERROR_RATE,
+    <NAME>_CIRCUIT_SLOW_SECONDS, <NAME>_CIRCUIT_SLOW_RATE and
+    <NAME>_CIRCUIT_OPEN_SECONDS. A max concurrency of 0 disables the bulkhead.
+    """
+
+    def __init__(self, name: str, max_concurrent: int = 8, slow_seconds: float = 10.0):
+        self.name = name
+        max_concurrent = int(_env(name, 'MAX_CONCURRENCY', str(max_concurrent)))
+        self.bulkhead = Bulkhead(
+            name, max_concurrent, float(_env(name, 'BULKHEAD_WAIT', '0.5'))
+        ) if max_concurrent > 0 else None
+        self.breaker = CircuitBreaker(
+            name,
+            window=int(_env(name, 'CIRCUIT_WINDOW', '20')),
+            min_calls=int(_env(name, 'CIRCUIT_MIN_CALLS', '5')),
+            error_rate=float(_env(name, 'CIRCUIT_ERROR_RATE', '0.5')),
+            slow_seconds=float(_env(name, 'CIRCUIT_SLOW_SECONDS', str(slow_seconds))),
+            slow_rate=float(_env(name, 'CIRCUIT_SLOW_RATE', '0.8')),
+            open_seconds=float(_env(name, 'CIRCUIT_OPEN_SECONDS', '30')),
+            probes=1
+        )
+
+    def call(self) -> _Call:
+        """Guard one call: `with dependency.call() as call: ...`"""
+        return _Call(self)
+
+    def status(self) -> Dict:
+        status = self.breaker.snapshot()
+        if self.bulkhead is not None:
+            status['in_flight'] = self.bulkhead.in_use
+            status['max_concurrency'] = self.bulkhead.max_concurrent
+        return status
+
+
+# The model already has its own concurrency limit (InferenceResources), so
+# only its circuit breaker is used here
+dependencies = {
+    'whapi': Dependency('whapi', max_concurrent=8, slow_seconds=10.0),
+    'monday': Dependency('monday', max_concurrent=4, slow_seconds=15.0),
+    'model': Dependency('model', max_concurrent=0, slow_seconds=120.0)
+}
+
+
+def get_dependency(name: str) -> Dependency:
+    return dependencies[name]
+
+
+def status() -> Dict[str, Dict]:
+    return {name: dependency.status() for name, dependency in dependencies.items()}
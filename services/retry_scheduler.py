@@ -0,0 +1,309 @@
+import os
+import json
+import time
+import heapq
+import random
+import logging
+import itertools
+import threading
+from typing import Callable, Dict, List, Optional
+
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+RETRY_PENDING = metrics.registry.gauge(
+    'gobingo_retry_pending',
+    'Writes waiting in the retry scheduler'
+)
+RETRY_OLDEST_AGE = metrics.registry.gauge(
+    'gobingo_retry_oldest_age_seconds',
+    'Age of the oldest write still waiting to be retried'
+)
+RETRY_ATTEMPTS = metrics.registry.counter(
+    'gobingo_retry_attempts_total',
+    'Retried writes, by operation and outcome'
+)
+RETRY_DEAD_LETTERS = metrics.registry.counter(
+    'gobingo_retry_dead_letters_total',
+    'Writes given up on and moved to the dead-letter store'
+)
+
+
+class RetryableError(Exception):
+    """A failure worth retrying, optionally with the server's Retry-After"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RetryScheduler:
+    """Retry failed writes in the background instead of sleeping in the request.
+
+    Jobs sit in a heap ordered by due time. A single worker thread sleeps
+    until the earliest one is due and runs the handler registered for its
+    operation. A handler that raises RetryableError is rescheduled with
+    full-jitter exponential backoff, or after Retry-After if the server sent
+    one. Jobs that fail permanently or run out of attempts go to a dead-letter
+    file. Pending jobs are saved to disk on every change and reloaded on
+    first use (start, schedule or pending), so retries survive restarts.
+    Restored jobs whose handler is not registered yet stay pending.
+
+    Jobs scheduled with the same `key` are coalesced into the job already
+    waiting: dict entries of the payload (e.g. `fields`) are merged into its
+    own and list entries (e.g. `records`) appended.
+    """
+
+    def __init__(self, path: Optional[str] = None, dead_letter_path: Optional[str] = None,
+                 max_attempts: Optional[int] = None, base_delay: Optional[float] = None,
+                 max_delay: Optional[float] = None, seed: Optional[int] = None):
+        self.path = path or os.getenv('RETRY_STORE_PATH', 'data/retry_queue.json')
+        self.dead_letter_path = dead_letter_path or os.getenv('RETRY_DEAD_LETTER_PATH', 'data/dead_letters.jsonl')
+        self.max_attempts = max_attempts or int(os.getenv('RETRY_MAX_ATTEMPTS', '8'))
+        self.base_delay = base_delay if base_delay is not None else float(os.getenv('RETRY_BASE_DELAY', '2'))
+        self.max_delay = max_delay if max_delay is not None else float(os.getenv('RETRY_MAX_DELAY', '600'))
+        self._rng = random.Random(seed)
+        self._handlers: Dict[str, Callable[[Dict], object]] = {}
+        self._callbacks: Dict[str, List[Callable[[Dict, object], None]]] = {}
+        self._jobs: Dict[str, Dict] = {}
+        self._heap: List = []
+        self._ids = itertools.count(1)
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self._loaded = False
+
+    def register(self, operation: str, handler: Callable[[Dict], object]):
+        """Handler called with a job's payload; raise RetryableError to try again later"""
+        self._handlers[operation] = handler
+
+    def on_success(self, operation: str, callback: Callable[[Dict, object], None]):
+        """Called with the job and the handler's return value once a retry succeeds"""
+        self._callbacks.setdefault(operation, []).append(callback)
+
+    def backoff(self, attempts: int, retry_after: Optional[float] = None) -> float:
+        """Seconds until the next try"""
+        if retry_after is not None:
+            # Spread retries that got the same Retry-After so they don't land together
+            return retry_after + self._rng.uniform(0, self.base_delay)
+        return self._rng.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempts)))
+
+    def schedule(self, operation: str, payload: Dict, key: Optional[str] = None,
+                 retry_after: Optional[float] = None, error: Optional[str] = None) -> str:
+        """Queue a write that just failed once; return the job id"""
+        now = time.time()
+        with self._condition:
+            self._ensure_loaded()
+            if key is not None:
+                for job in self._jobs.values():
+                    if job['key'] == key and job['operation'] == operation and not job.get('running'):
+                        for name, value in payload.items():
+                            if isinstance(value, dict):
+                                job['payload'].setdefault(name, {}).update(value)
+                            elif isinstance(value, list):
+                                job['payload'].setdefault(name, []).extend(value)
+                        self._save()
+                        return job['id']
+
+            job = {
+                'id': f"{int(now * 1000)}-{next(self._ids)}",
+                'operation': operation,
+                'payload': payload,
+                'key': key,
+                'attempts': 1,
+                'created_at': now,
+                'due': now + self.backoff(1, retry_after),
+                'last_error': error
+            }
+            self._push(job)
+            self._save()
+            self._condition.notify_all()
+        logger.info(f"Scheduled {operation} retry {job['id']} in {job['due'] - now:.1f}s")
+        return job['id']
+
+    def _push(self, job: Dict):
+        self._jobs[job['id']] = job
+        heapq.heappush(self._heap, (job['due'], job['id']))
+        self._update_gauges()
+
+    def _update_gauges(self):
+        RETRY_PENDING.set(len(self._jobs))
+        oldest = min((job['created_at'] for job in self._jobs.values()), default=None)
+        RETRY_OLDEST_AGE.set(time.time() - oldest if oldest is not None else 0)
+
+    def _ensure_loaded(self):
+        """Restore saved jobs before the store is first read or written"""
+        if not self._loaded:
+            self._loaded = True
+            self._load()
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                jobs = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not read retry store {self.path}: {str(e)}")
+            return
+        for job in jobs:
+            job.pop('running', None)
+            self._push(job)
+        if jobs:
+            logger.info(f"Restored {len(jobs)} pending retries from {self.path}")
+
+    def _save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = self.path + '.tmp'
+        try:
+            with open(temp_path, 'w') as f:
+                json.dump([{k: v for k, v in job.items() if k != 'running'} for job in self._jobs.values()], f)
+            # Atomic replace so a crash mid-write never leaves a truncated store
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            logger.error(f"Could not save retry store {self.path}: {str(e)}")
+
+    def _dead_letter(self, job: Dict, reason: str):
+        RETRY_DEAD_LETTERS.inc(operation=job['operation'])
+        logger.error(f"Giving up on {job['operation']} {job['id']} after {job['attempts']} attempts: {reason}")
+        directory = os.path.dirname(self.dead_letter_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        try:
+            with open(self.dead_letter_path, 'a') as f:
+                record = {k: v for k, v in job.items() if k != 'running'}
+                f.write(json.dumps(dict(record, failed_at=time.time(), reason=reason)) + '\n')
+        except OSError as e:
+            logger.error(f"Could not write dead letter {job['id']}: {str(e)}")
+
+    def dead_letters(self) -> List[Dict]:
+        try:
+            with open(self.dead_letter_path) as f:
+                return [json.loads(line) for line in f if line.strip()]
+        except FileNotFoundError:
+            return []
+
+    def pending(self) -> List[Dict]:
+        with self._condition:
+            self._ensure_loaded()
+            return [dict(job) for job in self._jobs.values()]
+
+    def _next_due(self) -> Optional[Dict]:
+        """Pop the earliest job if it is due; stale heap entries are skipped"""
+        while self._heap:
+            due, job_id = self._heap[0]
+            job = self._jobs.get(job_id)
+            if job is None or job['due'] != due:
+                heapq.heappop(self._heap)
+                continue
+            if due > time.time():
+                return None
+            heapq.heappop(self._heap)
+            return job
+        return None
+
+    def _wait_seconds(self) -> float:
+        if not self._heap:
+            return 5.0
+        return max(0.0, min(5.0, self._heap[0][0] - time.time()))
+
+    def run_due(self) -> int:
+        """Run every job that is due now; return how many ran"""
+        ran = 0
+        while True:
+            with self._condition:
+                self._ensure_loaded()
+                job = self._next_due()
+                if job is None:
+                    self._update_gauges()
+                    return ran
+                job['running'] = True
+            self._run(job)
+            ran += 1
+
+    def _run(self, job: Dict):
+        operation = job['operation']
+        handler = self._handlers.get(operation)
+        if handler is None:
+            # e.g. restored before the service that handles it was set up;
+            # not an attempt, so it waits without counting towards max_attempts
+            logger.warning(f"No handler registered for {operation} yet, keeping {job['id']} pending")
+            with self._condition:
+                job['running'] = False
+                job['due'] = time.time() + self.backoff(job['attempts'])
+                heapq.heappush(self._heap, (job['due'], job['id']))
+                self._save()
+                self._update_gauges()
+            return
+
+        try:
+            result = handler(job['payload'])
+        except RetryableError as e:
+            RETRY_ATTEMPTS.inc(operation=operation, outcome='retry')
+            with self._condition:
+                job['running'] = False
+                job['attempts'] += 1
+                job['last_error'] = str(e)
+                if job['attempts'] > self.max_attempts:
+                    del self._jobs[job['id']]
+                    self._dead_letter(job, str(e))
+                else:
+                    job['due'] = time.time() + self.backoff(job['attempts'], e.retry_after)
+                    heapq.heappush(self._heap, (job['due'], job['id']))
+                self._save()
+                self._update_gauges()
+            return
+        except Exception as e:
+            RETRY_ATTEMPTS.inc(operation=operation, outcome='failure')
+            with self._condition:
+                self._jobs.pop(job['id'], None)
+                self._dead_letter(job, str(e))
+                self._save()
+                self._update_gauges()
+            return
+
+        RETRY_ATTEMPTS.inc(operation=operation, outcome='success')
+        with self._condition:
+            self._jobs.pop(job['id'], None)
+            self._save()
+            self._update_gauges()
+        logger.info(f"Retry {job['id']} of {operation} succeeded after {job['attempts']} attempts")
+        for callback in self._callbacks.get(operation, []):
+            try:
+                callback(job, result)
+            except Exception as e:
+                logger.error(f"Retry callback for {operation} failed: {str(e)}")
+
+    def _worker(self):
+        while True:
+            with self._condition:
+                if self._stopping:
+                    return
+                self._condition.wait(timeout=self._wait_seconds())
+                if self._stopping:
+                    return
+            try:
+                self.run_due()
+            except Exception as e:
+                logger.error(f"Retry worker error: {str(e)}")
+
+    def start(self):
+        with self._condition:
+            self._ensure_loaded()
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping = False
+            self._thread = threading.Thread(target=self._worker, name='retry-scheduler', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+retry_scheduler = RetryScheduler()
@@ -0,0 +1,230 @@
+import os
+import time
+import logging
+import itertools
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from services import metrics
+from services.token_bucket import TokenBucket
+from services.tracing import current_request
+
+logger = logging.getLogger(__name__)
+
+OUTBOUND_DEPTH = metrics.registry.gauge(
+    'gobingo_outbound_queue_depth',
+    'WhatsApp messages waiting to be sent'
+)
+OUTBOUND_LATENCY = metrics.registry.histogram(
+    'gobingo_outbound_send_latency_seconds',
+    'Time from queueing a WhatsApp message to Whapi accepting it'
+)
+OUTBOUND_MESSAGES = metrics.registry.counter(
+    'gobingo_outbound_messages_total',
+    'WhatsApp sends, by outcome (sent, retried, dropped, rate_limited)'
+)
+OUTBOUND_COALESCED = metrics.registry.counter(
+    'gobingo_outbound_coalesced_total',
+    'Messages merged into an earlier message to the same chat'
+)
+
+# Whapi rejects longer text bodies
+MAX_MESSAGE_LENGTH = 4096
+MESSAGE_SEPARATOR = "\n\n"
+# Default priority for queued messages; lower is sent first
+DEFAULT_PRIORITY = 2
+
+
+class SendResult:
+    __slots__ = ('ok', 'retryable', 'retry_after')
+
+    def __init__(self, ok: bool, retryable: bool = False, retry_after: Optional[float] = None):
+        self.ok = ok
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+
+class OutboundQueue:
+    """Send WhatsApp messages from a background worker at a steady rate.
+
+    Messages to the same chat that are queued within `coalesce_seconds` of
+    each other (e.g. "ID card processed" and "All documents uploaded") are
+    joined into one message. Sends are paced by a token bucket per Whapi
+    channel; a 429 pauses the bucket for the Retry-After time, and other
+    transient failures are retried with backoff up to `max_attempts`.
+    Messages to one chat are always delivered in the order they were queued.
+
+    Lower priorities are sent first, with the same aging as inference slots
+    so nothing waits forever.
+    """
+
+    def __init__(self, send: Callable[[str, str], SendResult], rate: Optional[float] = None,
+                 burst: Optional[float] = None, coalesce_seconds: Optional[float] = None,
+                 max_attempts: Optional[int] = None, aging_seconds: Optional[float] = None):
+        self._send = send
+        rate = rate if rate is not None else float(os.getenv('WHAPI_SEND_RATE', '5'))
+        burst = burst if burst is not None else float(os.getenv('WHAPI_SEND_BURST', str(rate)))
+        self.bucket = TokenBucket(rate, 1.0, burst)
+        self.coalesce_seconds = coalesce_seconds if coalesce_seconds is not None else \
+            float(os.getenv('WHAPI_SEND_COALESCE_MS', '150')) / 1000
+        self.max_attempts = max_attempts or int(os.getenv('WHAPI_SEND_MAX_ATTEMPTS', '4'))
+        self.aging_seconds = aging_seconds if aging_seconds is not None else \
+            float(os.getenv('WHAPI_SEND_AGING_SECONDS', '5'))
+        # chat_id -> batches in order; only the head of each chat is ever in flight
+        self._pending: Dict[str, List[Dict]] = {}
+        # Chats whose head batch is waiting to be sent, with its send rank
+        self._scheduled: Dict[str, Tuple[float, int]] = {}
+        self._in_flight = set()
+        self._seq = itertools.count()
+        self._depth = 0
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+
+    @property
+    def depth(self) -> int:
+        return self._depth
+
+    def _set_depth(self, change: int):
+        self._depth += change
+        OUTBOUND_DEPTH.set(self._depth)
+
+    def _schedule(self, chat_id: str):
+        """Queue a chat's head batch, unless it is already queued or sending"""
+        if chat_id in self._scheduled or chat_id in self._in_flight or not self._pending.get(chat_id):
+            return
+        batch = self._pending[chat_id][0]
+        self._scheduled[chat_id] = (batch['priority'] * self.aging_seconds + batch['due'], next(self._seq))
+        self._condition.notify()
+
+    def enqueue(self, chat_id: str, text: str, priority: int = DEFAULT_PRIORITY):
+        now = time.monotonic()
+        # The request this is a reply to; sending it finishes the request's trace
+        trace = current_request()
+        with self._condition:
+            batches = self._pending.setdefault(chat_id, [])
+            last = batches[-1] if batches else None
+            can_join = last is not None and not last['sending'] and \
+                len(last['text']) + len(MESSAGE_SEPARATOR) + len(text) <= MAX_MESSAGE_LENGTH
+            if can_join:
+                last['text'] += MESSAGE_SEPARATOR + text
+                last['priority'] = min(last['priority'], priority)
+                last['count'] += 1
+                last['traces'].append((trace, now))
+                OUTBOUND_COALESCED.inc()
+            else:
+                batches.append({
+                    'text': text,
+                    'priority': priority,
+                    'enqueued': now,
+                    'due': now + self.coalesce_seconds,
+                    'attempts': 0,
+                    'count': 1,
+                    'traces': [(trace, now)],
+                    'sending': False
+                })
+            self._set_depth(1)
+            self._schedule(chat_id)
+        self.start()
+
+    def _next_batch(self) -> Tuple[Optional[str], float]:
+        """Take the best-ranked chat that is due, or return how long until one is"""
+        now = time.monotonic()
+        best = None
+        wait = 1.0
+        for chat_id, rank in self._scheduled.items():
+            due = self._pending[chat_id][0]['due']
+            if due > now:
+                wait = min(wait, due - now)
+            elif best is None or rank < self._scheduled[best]:
+                best = chat_id
+        if best is None:
+            return None, wait
+        del self._scheduled[best]
+        return best, 0.0
+
+    def _wait_for_token(self) -> bool:
+        while True:
+            wait = self.bucket.try_acquire()
+            if wait is None:
+                return True
+            with self._condition:
+                if self._stopping:
+                    return False
+                self._condition.wait(wait)
+
+    def _finish(self, chat_id: str, batch: Dict, result: SendResult, send_started: float):
+        now = time.monotonic()
+        if result.ok or not result.retryable or batch['attempts'] >= self.max_attempts:
+            for trace, enqueued in batch['traces']:
+                if trace is not None:
+                    trace.add_stage('outbound_queue', send_started - enqueued)
+                    trace.add_stage('whatsapp_send', now - send_started)
+                    trace.finish('replied' if result.ok else 'dropped')
+        with self._condition:
+            self._in_flight.discard(chat_id)
+            batch['sending'] = False
+            if result.ok:
+                OUTBOUND_MESSAGES.inc(outcome='sent')
+                OUTBOUND_LATENCY.observe(now - batch['enqueued'])
+                self._drop_head(chat_id, batch)
+            elif result.retryable and batch['attempts'] < self.max_attempts:
+                OUTBOUND_MESSAGES.inc(outcome='rate_limited' if result.retry_after is not None else 'retried')
+                if result.retry_after is not None:
+                    self.bucket.pause(result.retry_after)
+                # Mark it so later messages don't join a batch that may have been half-delivered
+                batch['sending'] = True
+                batch['due'] = now + (result.retry_after or min(30.0, 0.5 * (2 ** batch['attempts'])))
+            else:
+                OUTBOUND_MESSAGES.inc(outcome='dropped')
+                logger.error(f"Dropping message to {chat_id} after {batch['attempts']} attempts")
+                self._drop_head(chat_id, batch)
+            self._schedule(chat_id)
+
+    def _drop_head(self, chat_id: str, batch: Dict):
+        batches = self._pending[chat_id]
+        batches.pop(0)
+        self._set_depth(-batch['count'])
+        if not batches:
+            del self._pending[chat_id]
+
+    def _worker(self):
+        while True:
+            with self._condition:
+                if self._stopping and not self._pending:
+                    return
+                chat_id, wait = self._next_batch()
+                if chat_id is None:
+                    if self._stopping and not self._scheduled:
+                        return
+                    self._condition.wait(wait)
+                    continue
+                batch = self._pending[chat_id][0]
+                batch['sending'] = True
+                batch['attempts'] += 1
+                self._in_flight.add(chat_id)
+
+            if not self._wait_for_token():
+                return
+            send_started = time.monotonic()
+            try:
+                result = self._send(chat_id, batch['text'])
+            except Exception as e:
+                logger.error(f"Sending to {chat_id} failed: {str(e)}")
+                result = SendResult(False, retryable=True)
+            self._finish(chat_id, batch, result, send_started)
+
+    def start(self):
+        with self._condition:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping = False
+                self._thread = threading.Thread(target=self._worker, name='whapi-sender', daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Send what is queued (within `timeout`) and stop the worker"""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
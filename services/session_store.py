@@ -0,0 +1,59 @@
+import threading
+from typing import Dict
+
+from services.applicant_aggregator import DOCUMENT_TYPES
+
+
+class SessionStore:
+    """Which documents each chat has uploaded so far.
+
+    Kept in memory with plain dict lookups so status queries can be answered
+    without touching anything else.
+    """
+
+    def __init__(self):
+        self._sessions: Dict[str, Dict[str, bool]] = {}
+        self._lock = threading.Lock()
+
+    def update_document_status(self, chat_id: str, doc_type: str):
+        with self._lock:
+            self._sessions.setdefault(chat_id, {})[doc_type] = True
+
+    def get_document_status(self, chat_id: str) -> Dict[str, bool]:
+        # A single dict read is atomic, so status lookups skip the lock
+        return self._sessions.get(chat_id, {})
+
+    def has_session(self, chat_id: str) -> bool:
+        return chat_id in self._sessions
+
+    def check_completion(self, chat_id: str) -> bool:
+        status = self._sessions.get(chat_id, {})
+        return all(status.get(doc_type) for doc_type in DOCUMENT_TYPES)
+
+    def clear_user(self, chat_id: str):
+        with self._lock:
+            self._sessions.pop(chat_id, None)
+
+
+class SharedSessionStore:
+    """SessionStore kept in the shared backend (services.work_queue), so every
+    web front end and model worker sees the same upload status"""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def update_document_status(self, chat_id: str, doc_type: str):
+        self.backend.session_set(chat_id, doc_type)
+
+    def get_document_status(self, chat_id: str) -> Dict[str, bool]:
+        return self.backend.session_get(chat_id)
+
+    def has_session(self, chat_id: str) -> bool:
+        return bool(self.backend.session_get(chat_id))
+
+    def check_completion(self, chat_id: str) -> bool:
+        status = self.backend.session_get(chat_id)
+        return all(status.get(doc_type) for doc_type in DOCUMENT_TYPES)
+
+    def clear_user(self, chat_id: str):
+        self.backend.session_clear(chat_id)
@@ -0,0 +1,242 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+SLOW_REQUESTS = metrics.registry.counter(
+    'gobingo_slow_requests_total',
+    'Requests slower than SLOW_REQUEST_SECONDS from receipt to reply, by document type'
+)
+
+# Stage name for the whole request, from webhook receipt to the reply
+END_TO_END = 'end_to_end'
+
+
+class LatencyHistogram:
+    """HDR-style histogram of durations in microseconds.
+
+    Buckets are linear within each power of two, 2**sub_bucket_bits of them,
+    so any recorded value is reported within 1/2**sub_bucket_bits of its
+    true value (about 1.6% by default) at any magnitude. Buckets are sparse,
+    so memory follows how spread out the values are, not the range.
+    """
+
+    def __init__(self, sub_bucket_bits: int = 6):
+        self.sub_bucket_bits = sub_bucket_bits
+        self.sub_bucket_count = 1 << sub_bucket_bits
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def _index(self, value: int) -> int:
+        if value < self.sub_bucket_count:
+            return value
+        shift = value.bit_length() - 1 - self.sub_bucket_bits
+        return ((shift + 1) << self.sub_bucket_bits) + (value >> shift) - self.sub_bucket_count
+
+    def _bounds(self, index: int) -> Tuple[int, int]:
+        """Lowest value in a bucket and the bucket's width"""
+        if index < self.sub_bucket_count:
+            return index, 1
+        shift = (index >> self.sub_bucket_bits) - 1
+        return ((index & (self.sub_bucket_count - 1)) + self.sub_bucket_count) << shift, 1 << shift
+
+    def record(self, seconds: float):
+        value = max(0, int(seconds * 1e6))
+        index = self._index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def merge(self, other: 'LatencyHistogram'):
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, percent: float) -> float:
+        """Value in seconds at or below which `percent` of recordings fall"""
+        if not self.count:
+            return 0.0
+        rank = max(1, int(round(percent / 100 * self.count)))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                low, width = self._bounds(index)
+                return min(low + width / 2, self.max) / 1e6
+        return self.max / 1e6
+
+    def fraction_within(self, seconds: float) -> float:
+        """Share of recordings no slower than `seconds`, to bucket precision"""
+        if not self.count:
+            return 1.0
+        limit = int(seconds * 1e6)
+        within = sum(count for index, count in self.counts.items() if self._bounds(index)[0] <= limit)
+        return within / self.count
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count / 1e6 if self.count else 0.0
+
+
+class RollingHistogram:
+    """A LatencyHistogram over the last `window` seconds, kept as one
+    histogram per `slice_seconds` and merged when read"""
+
+    def __init__(self, window: float, slice_seconds: float):
+        self.window = window
+        self.slice_seconds = slice_seconds
+        self._slices = deque()
+
+    def record(self, seconds: float, now: float):
+        start = now - now % self.slice_seconds
+        if not self._slices or self._slices[-1][0] != start:
+            self._slices.append((start, LatencyHistogram()))
+            self._expire(now)
+        self._slices[-1][1].record(seconds)
+
+    def _expire(self, now: float):
+        while self._slices and self._slices[0][0] + self.slice_seconds <= now - self.window:
+            self._slices.popleft()
+
+    def snapshot(self, now: float) -> LatencyHistogram:
+        self._expire(now)
+        merged = LatencyHistogram()
+        for _, histogram in self._slices:
+            merged.merge(histogram)
+        return merged
+
+
+class SloTracker:
+    """Rolling latency objectives per document type, and a log of slow requests.
+
+    A finished request adds its time from receipt to reply, and the time in
+    each stage, to histograms per (stage, document type) over the last
+    SLO_WINDOW_SECONDS. The objective is that SLO_TARGET of replies go out
+    within SLO_LATENCY_SECONDS; SLO_OBJECTIVES ('{"log_card": 90}') sets the
+    latency per document type. Requests over SLOW_REQUEST_SECONDS are kept,
+    with their stage breakdown, in a log of the last SLOW_REQUEST_LOG_SIZE.
+    Stage times other than the outbound queue's need REQUEST_STAGE_TRACING.
+    """
+
+    def __init__(self):
+        self.window = float(os.getenv('SLO_WINDOW_SECONDS', '3600'))
+        self.slice_seconds = max(1.0, self.window / 60)
+        self.objective = float(os.getenv('SLO_LATENCY_SECONDS', '60'))
+        self.target = float(os.getenv('SLO_TARGET', '0.95'))
+        self.objectives: Dict[str, float] = {}
+        try:
+            self.objectives = {key: float(value) for key, value in json.loads(os.getenv('SLO_OBJECTIVES', '{}')).items()}
+        except (ValueError, TypeError, AttributeError) as e:
+            logger.warning(f"Ignoring invalid SLO_OBJECTIVES: {str(e)}")
+        self.slow_seconds = float(os.getenv('SLOW_REQUEST_SECONDS', '30'))
+        self._histograms: Dict[Tuple[str, str], RollingHistogram] = {}
+        self._slow = deque(maxlen=int(os.getenv('SLOW_REQUEST_LOG_SIZE', '100')))
+        self._lock = threading.Lock()
+
+    def _histogram(self, stage: str, doc_type: str) -> RollingHistogram:
+        key = (stage, doc_type)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = RollingHistogram(self.window, self.slice_seconds)
+        return histogram
+
+    def record(self, request_id: str, kind: str, doc_type: str, total: float, stages: Dict[str, float],
+               outcome: str = 'replied'):
+        now = time.time()
+        with self._lock:
+            self._histogram(END_TO_END, doc_type).record(total, now)
+            for stage, seconds in stages.items():
+                self._histogram(stage, doc_type).record(seconds, now)
+            if total >= self.slow_seconds:
+                self._slow.append({
+                    'request_id': request_id,
+                    'kind': kind,
+                    'doc_type': doc_type,
+                    'outcome': outcome,
+                    'finished_at': now,
+                    'total_seconds': round(total, 3),
+                    'stages': {stage: round(seconds, 3) for stage, seconds in
+                               sorted(stages.items(), key=lambda item: -item[1])}
+                })
+        if total >= self.slow_seconds:
+            SLOW_REQUESTS.inc(doc_type=doc_type)
+            breakdown = ', '.join(f"{stage}={seconds:.1f}s" for stage, seconds in
+                                  sorted(stages.items(), key=lambda item: -item[1]))
+            logger.warning(f"Slow {kind} request {request_id} ({doc_type}): {total:.1f}s [{breakdown}]")
+
+    def slow_requests(self, limit: Optional[int] = None) -> List[Dict]:
+        """Logged slow requests, most recent first"""
+        with self._lock:
+            requests = list(reversed(self._slow))
+        return requests[:limit] if limit else requests
+
+    @staticmethod
+    def _summary(histogram: LatencyHistogram) -> Dict:
+        return {
+            'requests': histogram.count,
+            'mean': round(histogram.mean, 3),
+            'p50': round(histogram.percentile(50), 3),
+            'p95': round(histogram.percentile(95), 3),
+            'p99': round(histogram.percentile(99), 3),
+            'max': round(histogram.max / 1e6, 3)
+        }
+
+    def status(self) -> Dict:
+        """Latency and objective status per document type over the window"""
+        now = time.time()
+        with self._lock:
+            snapshots = {key: histogram.snapshot(now) for key, histogram in self._histograms.items()}
+
+        doc_types = {}
+        for (stage, doc_type), histogram in sorted(snapshots.items()):
+            if stage != END_TO_END:
+                continue
+            objective = self.objectives.get(doc_type, self.objective)
+            within = histogram.fraction_within(objective)
+            # Share of the allowed slow replies not yet used up
+            budget = 1.0 - (1.0 - within) / (1.0 - self.target) if self.target < 1 else float(within == 1.0)
+            doc_types[doc_type] = dict(
+                self._summary(histogram),
+                objective_seconds=objective,
+                within_objective=round(within, 4),
+                error_budget_remaining=round(budget, 4),
+                status='breached' if within < self.target else 'at_risk' if budget < 0.25 else 'ok',
+                stages={
+                    other_stage: self._summary(snapshot)
+                    for (other_stage, other_type), snapshot in sorted(snapshots.items())
+                    if other_type == doc_type and other_stage != END_TO_END
+                }
+            )
+        breached = [doc_type for doc_type, result in doc_types.items() if result['status'] == 'breached']
+        return {
+            'status': 'breached' if breached else 'ok',
+            'breached': breached,
+            'window_seconds': self.window,
+            'target': self.target,
+            'doc_types': doc_types
+        }
+
+
+_tracker = None
+_tracker_lock = threading.Lock()
+
+
+def get_tracker() -> SloTracker:
+    global _tracker
+    if _tracker is None:
+        with _tracker_lock:
+            if _tracker is None:
+                _tracker = SloTracker()
+    return _tracker
@@ -0,0 +1,33 @@
+import time
+import threading
+from typing import Optional
+
+
+class TokenBucket:
+    """Token bucket allowing `rate` requests per `per` seconds with bursts up to `burst` (default `rate`)"""
+
+    def __init__(self, rate: float, per: float = 1.0, burst: Optional[float] = None):
+        self.capacity = burst if burst is not None else rate
+        self.refill_rate = rate / per
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_rate)
+        self.updated = now
+
+    def try_acquire(self) -> Optional[float]:
+        """Take a token; return None on success or the seconds until one is available"""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return None
+            return (1 - self.tokens) / self.refill_rate
+
+    def pause(self, seconds: float):
+        """Hand out nothing for `seconds`, e.g. after the server answered 429"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.tokens, 1 - seconds * self.refill_rate)
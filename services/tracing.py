@@ -0,0 +1,116 @@
+import time
+import uuid
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from services import metrics
+from services.slo import get_tracker
+
+logger = logging.getLogger(__name__)
+
+# Inbound header whose value is used as the request ID when present
+REQUEST_ID_HEADER = 'X-Request-ID'
+
+
+class RequestTrace:
+    """One inbound message from webhook receipt to the reply it gets.
+
+    Stage times come from every metrics span finished on a thread inside
+    request_context() while stage tracing is on (see enable_stage_tracing),
+    plus what the outbound queue adds for the reply. The trace is finished by
+    the first reply sent for it, or by the webhook handler for requests
+    answered in the HTTP response.
+    """
+
+    def __init__(self, kind: str, request_id: Optional[str] = None, chat_id: Optional[str] = None,
+                 started: Optional[float] = None):
+        self.request_id = request_id or uuid.uuid4().hex[:16]
+        self.kind = kind
+        self.chat_id = chat_id
+        self.doc_type: Optional[str] = None
+        self.started = started if started is not None else time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.finished = False
+        self._lock = threading.Lock()
+
+    def add_stage(self, stage: str, seconds: float):
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def follow_up(self, kind: str) -> 'RequestTrace':
+        """A trace for later work on the same message, e.g. a deferred document,
+        timed from the original receipt"""
+        return RequestTrace(kind, self.request_id, self.chat_id, self.started)
+
+    def finish(self, outcome: str = 'replied'):
+        with self._lock:
+            if self.finished:
+                return
+            self.finished = True
+            stages = dict(self.stages)
+        get_tracker().record(self.request_id, self.kind, self.doc_type or 'unknown', self.elapsed(), stages, outcome)
+
+
+_local = threading.local()
+
+
+def current_request() -> Optional[RequestTrace]:
+    return getattr(_local, 'trace', None)
+
+
+def current_request_id() -> Optional[str]:
+    trace = current_request()
+    return trace.request_id if trace is not None else None
+
+
+@contextmanager
+def request_context(trace: Optional[RequestTrace]):
+    """Attribute work on this thread inside the block to `trace`"""
+    previous = current_request()
+    _local.trace = trace
+    try:
+        yield trace
+    finally:
+        _local.trace = previous
+
+
+def _record_span(stage: str, seconds: float, labels: Dict[str, str]):
+    trace = current_request()
+    if trace is not None:
+        trace.add_stage(stage, seconds)
+
+
+class RequestIdFilter(logging.Filter):
+    """Adds `request_id` to log records for format strings"""
+
+    def filter(self, record):
+        record.request_id = current_request_id() or '-'
+        return True
+
+
+_stage_tracing = False
+_stage_tracing_lock = threading.Lock()
+
+
+def enable_stage_tracing():
+    """Attribute span times to the current request, for the per-stage SLO
+    breakdowns. Spans are then timed even with metrics disabled, so this is
+    opt-in (REQUEST_STAGE_TRACING=true in bot.py)."""
+    global _stage_tracing
+    with _stage_tracing_lock:
+        if not _stage_tracing:
+            metrics.add_listener(_record_span, always=True)
+            _stage_tracing = True
+
+
+def disable_stage_tracing():
+    global _stage_tracing
+    with _stage_tracing_lock:
+        if _stage_tracing:
+            metrics.remove_listener(_record_span)
+            _stage_tracing = False
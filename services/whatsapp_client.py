@@ -1,22 +1,92 @@
 import requests
 import os
+import logging
+from requests.adapters import HTTPAdapter
+
+from services import metrics
+from services.resilience import get_dependency, DependencyUnavailableError
+from services.send_queue import OutboundQueue, SendResult, DEFAULT_PRIORITY
+from services.tracing import current_request
+
+logger = logging.getLogger(__name__)
 
 
 class WhatsAppClient:
     def __init__(self, api_url, token):
         self.api_url = api_url
         self.token = token
+        # Never wait forever on Whapi; the bulkhead only bounds how many calls wait
+        self.timeout = float(os.getenv('WHAPI_TIMEOUT', '15'))
+        self.dependency = get_dependency('whapi')
+        # One pooled session per channel instead of a new connection per call
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=int(os.getenv('WHAPI_POOL_SIZE', '8')))
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        # Replies go through a rate-limited queue unless WHAPI_SEND_QUEUE=false
+        self.outbound = OutboundQueue(self._post_message) \
+            if os.getenv('WHAPI_SEND_QUEUE', 'true').lower() == 'true' else None
 
     def download_media(self, media_url):
-        response = requests.get(media_url)
+        try:
+            with self.dependency.call() as call, metrics.span('media_download') as stage:
+                response = self.session.get(media_url, timeout=self.timeout)
+                stage.set(status=str(response.status_code))
+                if response.status_code >= 500:
+                    call.failed()
+        except DependencyUnavailableError as e:
+            logger.warning(f"Skipping media download: {str(e)}")
+            return None
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Media download failed: {str(e)}")
+            return None
         if response.status_code == 200:
             return response.content
         return None
 
-    def send_message(self, chat_id, message):
-        payload = {'chat_id': chat_id, 'text': message}
+    def send_message(self, chat_id, message, priority=DEFAULT_PRIORITY):
+        """Queue a text reply; messages to the same chat sent close together are joined"""
+        if self.outbound is None:
+            sent = self.send_message_now(chat_id, message)
+            trace = current_request()
+            if trace is not None:
+                trace.finish('replied' if sent else 'dropped')
+            return sent
+        self.outbound.enqueue(chat_id, message, priority)
+        return True
+
+    def send_message_now(self, chat_id, message):
+        return self._post_message(chat_id, message).ok
+
+    def _post_message(self, chat_id, message) -> SendResult:
         headers = {'Authorization': f'Bearer {self.token}', 'Content-Type': 'application/json'}
-        response = requests.post(f"{self.api_url}/send", json=payload, headers=headers)
-        return response.status_code == 200
+        payload = {'chat_id': chat_id, 'text': message}
+        try:
+            with self.dependency.call() as call, metrics.span('whatsapp_reply') as stage:
+                response = self.session.post(f"{self.api_url}/send", json=payload, headers=headers, timeout=self.timeout)
+                stage.set(status=str(response.status_code))
+                if response.status_code >= 500 or response.status_code == 429:
+                    call.failed()
+        except DependencyUnavailableError as e:
+            logger.warning(f"Not sending message to {chat_id}: {str(e)}")
+            return SendResult(False, retryable=True, retry_after=e.retry_after)
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Sending message to {chat_id} failed: {str(e)}")
+            return SendResult(False, retryable=True)
+
+        if response.status_code == 429:
+            return SendResult(False, retryable=True, retry_after=self._parse_retry_after(response.headers.get('Retry-After')))
+        if response.status_code >= 500:
+            return SendResult(False, retryable=True)
+        if response.status_code != 200:
+            logger.error(f"Whapi rejected message to {chat_id}: {response.status_code} {response.text}")
+        return SendResult(response.status_code == 200)
+
+    @staticmethod
+    def _parse_retry_after(value):
+        try:
+            return max(0.0, float(value))
+        except (TypeError, ValueError):
+            return 1.0
 
 whapi_client = WhatsAppClient(api_url=os.getenv('API_URL'), token=os.getenv('TOKEN'))
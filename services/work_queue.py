@@ -0,0 +1,392 @@
+import os
+import json
+import math
+import time
+import uuid
+import zlib
+import random
+import socket
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+QUEUE_JOBS = metrics.registry.counter(
+    'gobingo_work_queue_jobs_total',
+    'Jobs through the shared work queue, by outcome (enqueued, done, failed)'
+)
+QUEUE_WAIT = metrics.registry.histogram(
+    'gobingo_work_queue_wait_seconds',
+    'Time from a front end queueing a job to a worker taking it'
+)
+PARTITIONS_HELD = metrics.registry.gauge(
+    'gobingo_work_queue_partitions_held',
+    'Queue partitions this worker holds a lease on'
+)
+
+# A job handle from claim(): backend job id, chat id and the job's JSON payload
+Job = Tuple[object, str, str]
+
+
+def partition_for(chat_id: str, partitions: int) -> int:
+    """Stable partition for a chat, the same on every node"""
+    return zlib.crc32(chat_id.encode('utf-8')) % partitions
+
+
+class SqliteBackend:
+    """Shared sessions, jobs and partition leases in one SQLite file.
+
+    Stand-in for Redis in tests, simulations and single-host deployments with
+    several processes; every process opens the same file.
+    """
+
+    def __init__(self, path: str, partitions: int):
+        self.path = path
+        self.partitions = partitions
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        with self._transaction() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS sessions (chat_id TEXT, doc_type TEXT, PRIMARY KEY (chat_id, doc_type))")
+            db.execute("CREATE TABLE IF NOT EXISTS jobs (id INTEGER PRIMARY KEY AUTOINCREMENT, partition INTEGER, "
+                       "chat_id TEXT, payload TEXT, claimed_by TEXT)")
+            db.execute("CREATE INDEX IF NOT EXISTS jobs_partition ON jobs (partition, id)")
+            db.execute("CREATE TABLE IF NOT EXISTS leases (partition INTEGER PRIMARY KEY, worker TEXT, expires_at REAL)")
+            db.execute("CREATE TABLE IF NOT EXISTS workers (worker TEXT PRIMARY KEY, seen_at REAL)")
+
+    def _db(self) -> sqlite3.Connection:
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    @contextmanager
+    def _transaction(self):
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    def session_set(self, chat_id: str, doc_type: str):
+        self._db().execute("INSERT OR IGNORE INTO sessions VALUES (?, ?)", (chat_id, doc_type))
+
+    def session_get(self, chat_id: str) -> Dict[str, bool]:
+        rows = self._db().execute("SELECT doc_type FROM sessions WHERE chat_id = ?", (chat_id,))
+        return {doc_type: True for (doc_type,) in rows}
+
+    def session_clear(self, chat_id: str):
+        self._db().execute("DELETE FROM sessions WHERE chat_id = ?", (chat_id,))
+
+    def push(self, partition: int, chat_id: str, payload: str):
+        self._db().execute("INSERT INTO jobs (partition, chat_id, payload) VALUES (?, ?, ?)",
+                           (partition, chat_id, payload))
+
+    def heartbeat(self, worker: str, ttl: float) -> int:
+        """Mark the worker alive; returns how many workers are"""
+        now = time.time()
+        with self._transaction() as db:
+            db.execute("INSERT OR REPLACE INTO workers VALUES (?, ?)", (worker, now))
+            db.execute("DELETE FROM workers WHERE seen_at < ?", (now - ttl,))
+            return db.execute("SELECT COUNT(*) FROM workers").fetchone()[0]
+
+    def remove_worker(self, worker: str):
+        with self._transaction() as db:
+            db.execute("DELETE FROM workers WHERE worker = ?", (worker,))
+            db.execute("DELETE FROM leases WHERE worker = ?", (worker,))
+            db.execute("UPDATE jobs SET claimed_by = NULL WHERE claimed_by = ?", (worker,))
+
+    def acquire(self, worker: str, want: int, ttl: float) -> List[int]:
+        """Renew the worker's leases and take free or expired partitions up to `want`"""
+        now = time.time()
+        with self._transaction() as db:
+            db.execute("UPDATE leases SET expires_at = ? WHERE worker = ?", (now + ttl, worker))
+            held = [row[0] for row in db.execute("SELECT partition FROM leases WHERE worker = ?", (worker,))]
+            if len(held) < want:
+                taken = {row[0] for row in db.execute("SELECT partition FROM leases WHERE expires_at > ?", (now,))}
+                free = [partition for partition in range(self.partitions) if partition not in taken]
+                random.shuffle(free)
+                for partition in free[:want - len(held)]:
+                    # Jobs a dead worker had started go back to the head of the partition
+                    db.execute("UPDATE jobs SET claimed_by = NULL WHERE partition = ?", (partition,))
+                    db.execute("INSERT OR REPLACE INTO leases VALUES (?, ?, ?)", (partition, worker, now + ttl))
+                    held.append(partition)
+            return held
+
+    def release(self, worker: str, partition: int) -> bool:
+        """Give up a partition with no job in progress"""
+        with self._transaction() as db:
+            busy = db.execute("SELECT 1 FROM jobs WHERE partition = ? AND claimed_by IS NOT NULL LIMIT 1",
+                              (partition,)).fetchone()
+            if busy:
+                return False
+            db.execute("DELETE FROM leases WHERE partition = ? AND worker = ?", (partition, worker))
+            return True
+
+    def claim(self, worker: str, partitions: List[int]) -> Optional[Job]:
+        """Oldest job at the head of a held partition that has nothing in progress"""
+        if not partitions:
+            return None
+        placeholders = ','.join('?' * len(partitions))
+        with self._transaction() as db:
+            row = db.execute(
+                f"SELECT id, chat_id, payload FROM jobs j WHERE partition IN ({placeholders}) "
+                "AND claimed_by IS NULL AND NOT EXISTS "
+                "(SELECT 1 FROM jobs k WHERE k.partition = j.partition AND k.claimed_by IS NOT NULL) "
+                "AND EXISTS (SELECT 1 FROM leases l WHERE l.partition = j.partition AND l.worker = ?) "
+                "ORDER BY id LIMIT 1",
+                (*partitions, worker)
+            ).fetchone()
+            if row is not None:
+                db.execute("UPDATE jobs SET claimed_by = ? WHERE id = ?", (worker, row[0]))
+            return row
+
+    def ack(self, worker: str, job_id):
+        self._db().execute("DELETE FROM jobs WHERE id = ? AND claimed_by = ?", (job_id, worker))
+
+    def pending(self, partition: Optional[int] = None) -> int:
+        if partition is None:
+            return self._db().execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+        return self._db().execute("SELECT COUNT(*) FROM jobs WHERE partition = ?", (partition,)).fetchone()[0]
+
+
+class RedisBackend:
+    """The same operations on Redis (6.2+ for LMOVE), for nodes on different hosts.
+
+    Each partition is a list of jobs plus a one-item processing list for the
+    job in progress; leases are keys with a TTL and live workers a sorted set
+    of heartbeat times.
+    """
+
+    # Renew or delete a key only while it still holds our worker id
+    RENEW_SCRIPT = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('pexpire', KEYS[1], ARGV[2]) end return 0"
+    RELEASE_SCRIPT = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+
+    def __init__(self, url: str, partitions: int, prefix: str = 'gobingo:'):
+        if redis is None:
+            raise ValueError("SHARED_STORE_URL is a redis:// URL but the redis package is not installed")
+        self.client = redis.Redis.from_url(url)
+        self.partitions = partitions
+        self.prefix = prefix
+        self._renew = self.client.register_script(self.RENEW_SCRIPT)
+        self._release = self.client.register_script(self.RELEASE_SCRIPT)
+
+    def _key(self, *parts) -> str:
+        return self.prefix + ':'.join(str(part) for part in parts)
+
+    def session_set(self, chat_id: str, doc_type: str):
+        self.client.hset(self._key('session', chat_id), doc_type, 1)
+
+    def session_get(self, chat_id: str) -> Dict[str, bool]:
+        return {doc_type.decode('utf-8'): True for doc_type in self.client.hkeys(self._key('session', chat_id))}
+
+    def session_clear(self, chat_id: str):
+        self.client.delete(self._key('session', chat_id))
+
+    def push(self, partition: int, chat_id: str, payload: str):
+        self.client.rpush(self._key('jobs', partition), json.dumps([chat_id, payload]))
+
+    def heartbeat(self, worker: str, ttl: float) -> int:
+        now = time.time()
+        key = self._key('workers')
+        pipeline = self.client.pipeline()
+        pipeline.zadd(key, {worker: now})
+        pipeline.zremrangebyscore(key, '-inf', now - ttl)
+        pipeline.zcard(key)
+        return pipeline.execute()[-1]
+
+    def remove_worker(self, worker: str):
+        self.client.zrem(self._key('workers'), worker)
+        for partition in range(self.partitions):
+            self._requeue(partition)
+            self._release(keys=[self._key('lease', partition)], args=[worker])
+
+    def _requeue(self, partition: int):
+        while self.client.lmove(self._key('processing', partition), self._key('jobs', partition), 'RIGHT', 'LEFT'):
+            pass
+
+    def acquire(self, worker: str, want: int, ttl: float) -> List[int]:
+        ttl_ms = int(ttl * 1000)
+        owners = self.client.mget([self._key('lease', partition) for partition in range(self.partitions)])
+        held = []
+        for partition, owner in enumerate(owners):
+            if owner is not None and owner.decode('utf-8') == worker and \
+                    self._renew(keys=[self._key('lease', partition)], args=[worker, ttl_ms]):
+                held.append(partition)
+        free = [partition for partition, owner in enumerate(owners) if owner is None]
+        random.shuffle(free)
+        for partition in free:
+            if len(held) >= want:
+                break
+            if self.client.set(self._key('lease', partition), worker, nx=True, px=ttl_ms):
+                self._requeue(partition)
+                held.append(partition)
+        return held
+
+    def release(self, worker: str, partition: int) -> bool:
+        if self.client.llen(self._key('processing', partition)):
+            return False
+        return bool(self._release(keys=[self._key('lease', partition)], args=[worker]))
+
+    def claim(self, worker: str, partitions: List[int]) -> Optional[Job]:
+        for partition in random.sample(partitions, len(partitions)):
+            processing = self._key('processing', partition)
+            if self.client.llen(processing):
+                continue
+            item = self.client.lmove(self._key('jobs', partition), processing, 'LEFT', 'RIGHT')
+            if item is not None:
+                chat_id, payload = json.loads(item)
+                return partition, chat_id, payload
+        return None
+
+    def ack(self, worker: str, job_id):
+        self.client.lpop(self._key('processing', job_id))
+
+    def pending(self, partition: Optional[int] = None) -> int:
+        partitions = range(self.partitions) if partition is None else (partition,)
+        pipeline = self.client.pipeline()
+        for index in partitions:
+            pipeline.llen(self._key('jobs', index))
+            pipeline.llen(self._key('processing', index))
+        return sum(pipeline.execute())
+
+
+def open_backend(url: Optional[str] = None, partitions: Optional[int] = None):
+    """Backend for SHARED_STORE_URL: sqlite:///path/to/file.db or redis://host:port/db"""
+    url = url or os.getenv('SHARED_STORE_URL', 'sqlite:///data/shared.db')
+    partitions = partitions or int(os.getenv('WORK_QUEUE_PARTITIONS', '64'))
+    if url.startswith('sqlite:///'):
+        return SqliteBackend(url[len('sqlite:///'):], partitions)
+    if url.startswith(('redis://', 'rediss://')):
+        return RedisBackend(url, partitions)
+    raise ValueError(f"Unsupported SHARED_STORE_URL: {url}")
+
+
+class WorkQueue:
+    """Jobs shared between web front ends and model workers.
+
+    Jobs are partitioned by chat, and a partition is worked by one worker at
+    a time, one job at a time, so each chat's uploads are handled in the
+    order they arrived. Delivery is at least once: a job in progress on a
+    worker that dies is redone by the worker that takes its partition over.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    @property
+    def partitions(self) -> int:
+        return self.backend.partitions
+
+    def enqueue(self, chat_id: str, job: Dict):
+        job = dict(job, enqueued_at=time.time())
+        self.backend.push(partition_for(chat_id, self.partitions), chat_id, json.dumps(job))
+        QUEUE_JOBS.inc(outcome='enqueued')
+
+    def pending(self) -> int:
+        return self.backend.pending()
+
+
+class QueueWorker:
+    """Take jobs off a WorkQueue on a model worker node.
+
+    Each worker heartbeats and holds leases on up to its fair share of
+    partitions (partitions / live workers, rounded up), renewed every third
+    of WORK_QUEUE_LEASE_SECONDS. Partitions over the fair share are handed
+    back once they have nothing in progress and `can_release(partition)`
+    agrees, e.g. no applicant is half-way through on this node. Up to
+    WORKER_CONCURRENCY jobs run at once, from different partitions.
+    """
+
+    def __init__(self, queue: WorkQueue, handler: Callable[[str, Dict], None], worker_id: Optional[str] = None,
+                 concurrency: Optional[int] = None, lease_seconds: Optional[float] = None,
+                 poll_seconds: float = 0.1, can_release: Optional[Callable[[int], bool]] = None):
+        self.queue = queue
+        self.backend = queue.backend
+        self.handler = handler
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.concurrency = concurrency or int(os.getenv('WORKER_CONCURRENCY', '1'))
+        self.lease_seconds = lease_seconds or float(os.getenv('WORK_QUEUE_LEASE_SECONDS', '30'))
+        self.poll_seconds = poll_seconds
+        self.can_release = can_release
+        self.partitions: List[int] = []
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def _rebalance(self):
+        live = self.backend.heartbeat(self.worker_id, self.lease_seconds)
+        fair_share = math.ceil(self.queue.partitions / max(1, live))
+        held = self.backend.acquire(self.worker_id, fair_share, self.lease_seconds)
+        for partition in list(held[fair_share:]):
+            if (self.can_release is None or self.can_release(partition)) and \
+                    self.backend.release(self.worker_id, partition):
+                held.remove(partition)
+        self.partitions = held
+        PARTITIONS_HELD.set(len(held))
+
+    def _lease_loop(self):
+        while not self._stopping.wait(self.lease_seconds / 3):
+            try:
+                self._rebalance()
+            except Exception as e:
+                logger.error(f"Work queue lease renewal failed: {str(e)}")
+
+    def _work_loop(self):
+        while not self._stopping.is_set():
+            try:
+                job = self.backend.claim(self.worker_id, self.partitions)
+            except Exception as e:
+                logger.error(f"Work queue claim failed: {str(e)}")
+                job = None
+            if job is None:
+                self._stopping.wait(self.poll_seconds)
+                continue
+
+            job_id, chat_id, payload = job
+            payload = json.loads(payload)
+            QUEUE_WAIT.observe(max(0.0, time.time() - payload.get('enqueued_at', time.time())))
+            try:
+                self.handler(chat_id, payload)
+                QUEUE_JOBS.inc(outcome='done')
+            except Exception as e:
+                # Acked anyway; retrying a job that raises would block the chat's partition
+                logger.error(f"Queued job for {chat_id} failed: {str(e)}")
+                QUEUE_JOBS.inc(outcome='failed')
+            self.backend.ack(self.worker_id, job_id)
+
+    def start(self):
+        self._stopping.clear()
+        self._rebalance()
+        self._threads = [threading.Thread(target=self._lease_loop, name='work-queue-lease', daemon=True)]
+        self._threads += [
+            threading.Thread(target=self._work_loop, name=f'work-queue-{index}', daemon=True)
+            for index in range(self.concurrency)
+        ]
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"Worker {self.worker_id} started with {len(self.partitions)} partitions")
+
+    def stop(self, timeout: float = 30.0):
+        """Finish the jobs in progress and hand all partitions back"""
+        self._stopping.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self.backend.remove_worker(self.worker_id)
+        PARTITIONS_HELD.set(0)
@@ -1,5 +1,40 @@
+from itertools import product
+
+DOCUMENT_NAMES = {
+    'id_card': 'Identity Card',
+    'drivers_license': "Driver's License",
+    'log_card': 'Log Card'
+}
+
 
 class MessageView:
+    # Text commands and their help descriptions
+    commands = {
+        'HELP': 'Show this list of commands',
+        'CHECK_STATUS': 'See which documents you have uploaded',
+        'START': 'Show the welcome message and what to upload'
+    }
+
+    def __init__(self):
+        # Replies that never change are built once, not per message
+        self._welcome = ("Welcome to GoBingo WhatsApp AI Bot! 👋\n\n"
+                         "Please upload the following documents:\n"
+                         "1. Identity Card\n"
+                         "2. Driver's License\n"
+                         "3. Log Card\n\n"
+                         "Type 'CHECK_STATUS' to see your progress.\n"
+                         "Type 'HELP' for available commands.")
+        self._help = "Available commands:\n\n" + \
+            "\n".join(f"• {cmd}: {desc}" for cmd, desc in self.commands.items())
+        # One status reply per combination of uploaded documents
+        self._statuses = {
+            uploaded: self._render_status(dict(zip(DOCUMENT_NAMES, uploaded)))
+            for uploaded in product((False, True), repeat=len(DOCUMENT_NAMES))
+        }
+        self._successes = {
+            doc_type: f"✅ {name} processed successfully!" for doc_type, name in DOCUMENT_NAMES.items()
+        }
+
     def format_document_error(self, error_message):
         """Format document error message with details"""
         return (
@@ -10,46 +45,42 @@ class MessageView:
             "- The document is properly oriented\n"
             "- All required information is visible"
         )
-        
+
     def get_welcome_message(self):
         """Get welcome message"""
-        return ("Welcome to GoBingo WhatsApp AI Bot! 👋\n\n"
-                "Please upload the following documents:\n"
-                "1. Identity Card\n"
-                "2. Driver's License\n"
-                "3. Log Card\n\n"
-                "Type 'CHECK_STATUS' to see your progress.\n"
-                "Type 'HELP' for available commands.")
-                
+        return self._welcome
+
     def get_help_message(self):
         """Get help message"""
-        return "Available commands:\n\n" + \
-               "\n".join(f"• {cmd}: {desc}" for cmd, desc in self.commands.items())
-               
-    def format_status(self, status):
-        """Format document status message"""
+        return self._help
+
+    @staticmethod
+    def _render_status(status):
         return ("Document Upload Status:\n"
                 f"✅ Identity Card: {'Uploaded' if status.get('id_card') else 'Missing'}\n"
                 f"✅ Driver's License: {'Uploaded' if status.get('drivers_license') else 'Missing'}\n"
                 f"✅ Log Card: {'Uploaded' if status.get('log_card') else 'Missing'}")
-                
+
+    def format_status(self, status):
+        """Format document status message"""
+        return self._statuses[tuple(bool(status.get(doc_type)) for doc_type in DOCUMENT_NAMES)]
+
     def format_document_success(self, doc_type):
         """Format document success message"""
-        doc_names = {
-            'id_card': 'Identity Card',
-            'drivers_license': "Driver's License",
-            'log_card': 'Log Card'
-        }
-        return f"✅ {doc_names.get(doc_type)} processed successfully!"
-        
-    def format_document_error(self):
+        return self._successes.get(doc_type) or f"✅ {DOCUMENT_NAMES.get(doc_type)} processed successfully!"
+
+    def get_unidentified_document_message(self):
         """Format document error message"""
         return "❌ Could not identify document type. Please try again."
-        
+
+    def get_deferred_message(self):
+        """Get the reply for an upload accepted while the bot is busy"""
+        return "📥 Document received! We're busy right now and will reply shortly with the result."
+
     def get_completion_message(self):
         """Get completion message"""
         return "🎉 All required documents have been uploaded and processed!"
-        
+
     def get_unknown_type_message(self):
         """Get unknown message type response"""
-        return "Please send a document image or use one of the available commands. Type 'HELP' for more information."
\ No newline at end of file
+        return "Please send a document image or use one of the available commands. Type 'HELP' for more information."